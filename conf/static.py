@@ -1,9 +1,70 @@
 """
 Static GRC Configuration
 """
+import os
+
 DEBUG = True
 DEBUG_SCRIPT_NAME = 'google_analytics_traffic'
 
+# how main.py runs the active workflow.json items
+#   serial - one script.py subprocess at a time, in workflow.json order
+#   subprocess - up to MAX_WORKERS script.py subprocesses at the same time
+#   process - up to MAX_WORKERS pooled worker processes, each reusing its imports between items
+#   thread - up to MAX_WORKERS threads inside the main.py process
+WORKFLOW = {
+    'MODE': 'serial',
+    'MAX_WORKERS': 4
+}
+
+# connection pool sizing for the shared engine registry (per database, per process)
+DB_POOL = {
+    'POOL_SIZE': 5,
+    'MAX_OVERFLOW': 10,
+    'POOL_TIMEOUT': 30,
+    'POOL_RECYCLE': 1800
+}
+
+# credentials read from the applications database are cached for TTL seconds
+# SHARED also keeps them in memory, in a store main.py starts for the run, for the other workflow processes
+CREDENTIAL_CACHE = {
+    'TTL': 900,
+    'SHARED': False
+}
+
+# changed secrets_dat payloads (refreshed tokens) written within FLUSH_INTERVAL seconds of the last write
+# are held and written together, the rest of the run's buffer is written when the script finishes
+SECRETS_DAT = {
+    'FLUSH_INTERVAL': 60
+}
+
+# per stage / entity run metrics, appended as JSON lines to PATH (relative to the project root)
+# DATABASE_TABLE also saves them to grc_run_metrics in the client database
+INSTRUMENTATION = {
+    'ACTIVE': True,
+    'PATH': os.path.join('logs', 'run_metrics.jsonl'),
+    'DATABASE_TABLE': False
+}
+
+# rows per batch when a pull is renamed, typed and loaded in chunks (see utils/pipeline.py)
+PIPELINE = {
+    'CHUNK_SIZE': 50000
+}
+
+# raw API responses kept on disk (PATH, relative to the project root) as parquet or feather (needs pyarrow)
+# script.py --replay=1 re-processes them without calling the APIs
+RAW_CACHE = {
+    'ACTIVE': False,
+    'PATH': os.path.join('cache', 'raw'),
+    'FORMAT': 'parquet'
+}
+
+# completed items of a historical backfill (e.g. Moz Pro campaigns), kept under PATH (relative to the
+# project root) so an interrupted backfill resumes where it stopped
+BACKFILL = {
+    'PATH': os.path.join('cache', 'backfill'),
+    'MAX_WORKERS': 4
+}
+
 UPDATE_KEY = '32e58f63114435f643f2c88617a02a5ba03e1e91'
 UPDATE_USERNAME = 'jwschroeder330'
 UPDATE_REPOSITORY = 'GDS-Report-Compiler'
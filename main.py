@@ -3,14 +3,18 @@ Main Reporting Workflow Script
 """
 import os
 import sys
-import subprocess
-from utils import grc
+from conf import static
+from utils import credential_cache, grc, refresh_cache
 from utils.queue_manager import QueueManager
+from utils.workflow_executor import WorkflowExecutor
 
 
 def main(argv) -> None:
     workflow = QueueManager().get()
 
+    # scripts started by this run share its id, so a lookup table is refreshed at most once per run
+    refresh_cache.start_run()
+
     root = os.path.abspath(os.path.dirname(__file__))
     venv_path = grc.build_path_by_os(root=root)
     script_path = os.path.join(root, 'script.py')
@@ -27,7 +31,8 @@ def main(argv) -> None:
         expedited = None
         debug = None
 
-    # iterate and pull each script in workflow.json
+    # collect each active script in workflow.json
+    work_items = []
     for work_item in workflow:
         if work_item['active']:
             name = work_item['name']
@@ -41,8 +46,7 @@ def main(argv) -> None:
             debug = args['debug'] if use_args else debug
             
             # execute with the configured command line args
-            call_args = [
-                venv_path,
+            script_args = [
                 script_path,
                 name,
                 f'--pull={pull}',
@@ -51,11 +55,25 @@ def main(argv) -> None:
                 f'--expedited={expedited}',
                 f'--debug={debug}'
             ]
-            subprocess.call(
-                call_args
-            )
-    return
+            work_items.append({
+                'name': name,
+                'call_args': [venv_path] + script_args,
+                'script_args': script_args,
+                'expedited': expedited,
+                'depends_on': work_item.get('depends_on', [])
+            })
 
+    executor = WorkflowExecutor(
+        mode=static.WORKFLOW['MODE'],
+        max_workers=static.WORKFLOW['MAX_WORKERS']
+    )
+    # credentials are shared between the run's scripts in memory only, discarded when the run ends
+    credential_cache.start_shared_cache()
+    try:
+        executor.run(work_items=work_items)
+    finally:
+        credential_cache.stop_shared_cache()
+    return
 
 if __name__ == '__main__':
     main(argv=sys.argv)
@@ -3,8 +3,10 @@ Data Processing Script
 """
 import sys
 import traceback
-from utils import grc
+from utils import grc, instrumentation
 from conf import static
+from utils.credential_cache import get_secrets_dat_writer
+from utils.dbms_helpers import postgres_helpers
 from utils.cls.pltfm.gmail import send_error_email
 from utils.cls.pltfm.marketing_data import execute_post_processing_scripts_for_process
 
@@ -18,29 +20,43 @@ def main(argv) -> int:
         backfilter = 1
         expedited = 1
         debug = 1
+        replay = 0
     else:
         script_name = argv[1]
         pull, ingest, backfilter, expedited, debug = grc.get_args(argv=argv)
+        replay = grc.get_replay_from_args(argv=argv)
+
+    instrumentation.start_run(script_name=script_name)
 
     # run startup data source checks and initialize data source specific customizer
-    customizer = grc.setup(
-        script_name=script_name,
-        expedited=expedited
-    )
+    with instrumentation.stage('setup'):
+        customizer = grc.setup(
+            script_name=script_name,
+            expedited=expedited
+        )
 
     if debug:
         print("WARN: Error reporting disabled and expedited runtime mode activated")
 
+    if replay:
+        # re-process the cached raw API responses, no API calls are made
+        print("INFO: Replaying cached API responses")
+        customizer.replay = True
+
     try:
-        if pull:
-            customizer.pull()
+        if pull or replay:
+            with instrumentation.stage('pull'):
+                customizer.pull()
         if backfilter:
-            customizer.backfilter()
+            with instrumentation.stage('backfilter'):
+                customizer.backfilter()
         if ingest:
-            customizer.ingest()
+            with instrumentation.stage('ingest'):
+                customizer.ingest()
 
         # find post processing SQL scripts with this file's name as a search key and execute
-        post_processing_workflow(script_name=script_name)
+        with instrumentation.stage('post_processing'):
+            post_processing_workflow(script_name=script_name)
 
     except Exception as error:
         if not debug:
@@ -55,8 +71,16 @@ def main(argv) -> int:
 
         raise error
 
+    # write any refreshed tokens still held back by the secrets_dat buffer
+    get_secrets_dat_writer().flush()
+
     # todo: wait until data is fully backfilled to do this
-    customizer.audit()
+    with instrumentation.stage('audit'):
+        customizer.audit()
+
+    instrumentation.print_run_summary(records=instrumentation.finish_run(customizer=customizer))
+
+    postgres_helpers.print_postgresql_pool_statistics()
 
     return 0
 
@@ -0,0 +1,20 @@
+"""
+System Script :: Index Credentials DAT
+
+Adds the unique (client_name, name_value) index to public.gds_compiler_credentials_dat in the applications
+database, so secrets_dat write-backs use a single INSERT ... ON CONFLICT statement instead of SELECT then
+INSERT / UPDATE. Run once per applications database, any duplicate (client_name, name_value) rows must be
+removed first
+"""
+from utils import grc
+from utils.credential_cache import create_secrets_dat_unique_index
+
+
+def main() -> None:
+    create_secrets_dat_unique_index(engine=grc.create_application_sql_engine())
+    print('SUCCESS: gds_compiler_credentials_dat indexed.')
+    return
+
+
+if __name__ == '__main__':
+    main()
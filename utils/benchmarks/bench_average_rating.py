@@ -0,0 +1,104 @@
+"""
+Average Rating Benchmark
+
+Compares the cumulative average used by GoogleMyBusiness.assign_average_rating with the per-date
+loop it replaced
+
+    python -m utils.benchmarks.bench_average_rating --reviews 5000
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from utils.transforms import cumulative_average
+
+
+def legacy_assign_average_rating(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The per-date loop previously in GoogleMyBusiness.assign_average_rating
+    ====================================================================================================
+    :param df:
+    :return:
+    """
+    df.sort_values(
+        by='create_time',
+        ascending=False,
+        inplace=True
+    )
+    df['Average_Rating'] = None
+    first_review_date = df['create_time'].unique()[-1]
+    for date in df['create_time'].unique()[::-1]:
+        reviews = df.loc[df['create_time'] > first_review_date, ['create_time', 'star_rating']]
+        reviews = reviews.loc[reviews['create_time'] <= date, :]
+        average_rating = np.mean(list(reviews['star_rating']))
+        df.loc[df['create_time'] == date, 'Average_Rating'] = average_rating
+    df['Average_Rating'] = df['Average_Rating'].apply(lambda x: round(x, 2) if x else None)
+    df['Average_Rating'] = df['Average_Rating'].fillna(df['star_rating'])
+    return df
+
+
+def assign_average_rating(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    GoogleMyBusiness.assign_average_rating, without the API client the class needs to import
+    ====================================================================================================
+    :param df:
+    :return:
+    """
+    df.sort_values(
+        by='create_time',
+        ascending=False,
+        inplace=True
+    )
+    df['Average_Rating'] = cumulative_average(df=df, date_col='create_time', value_col='star_rating')
+    df['Average_Rating'] = df['Average_Rating'].apply(lambda x: round(x, 2) if x else None)
+    df['Average_Rating'] = df['Average_Rating'].fillna(df['star_rating'])
+    return df
+
+
+def generate_reviews(reviews: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Review frame for one listing, several reviews share a create_time
+    ====================================================================================================
+    :param reviews:
+    :param seed:
+    :return:
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2015-01-01', periods=max(reviews // 2, 1), freq='D')
+    return pd.DataFrame({
+        'reviewer': [f'reviewer {i}' for i in range(reviews)],
+        'star_rating': rng.integers(1, 6, reviews),
+        'create_time': rng.choice(times, reviews)
+    })
+
+
+def run(reviews: int) -> dict:
+    frame = generate_reviews(reviews=reviews)
+    timings = {}
+
+    started = time.perf_counter()
+    legacy_assign_average_rating(frame.copy())
+    timings['legacy_loop'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    assign_average_rating(frame.copy())
+    timings['vectorized'] = time.perf_counter() - started
+    return timings
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the GMB cumulative average rating')
+    parser.add_argument('--reviews', type=int, default=5000)
+    args = parser.parse_args(argv[1:])
+    timings = run(reviews=args.reviews)
+    for name, seconds in timings.items():
+        print(f'{name:>14}: {seconds:.3f}s')
+    print(f"{'speedup':>14}: {timings['legacy_loop'] / timings['vectorized']:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    main(argv=sys.argv)
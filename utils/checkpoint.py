@@ -0,0 +1,67 @@
+"""
+Checkpoint Module
+
+Completed items of a long-running backfill, saved as JSON after each one so an interrupted run can resume
+A checkpoint only applies to the same key (e.g. the historical date range), any other key starts over
+"""
+import os
+import json
+import threading
+
+from conf.static import BACKFILL
+from utils import stdlib
+
+
+def get_checkpoint_path(name: str) -> str:
+    path = BACKFILL['PATH']
+    root = path if os.path.isabs(path) else os.path.join(stdlib.get_base_path(), path)
+    return os.path.join(root, f'{name}.json')
+
+
+class Checkpoint:
+    """
+    Thread-safe set of completed items for one backfill, persisted on every add
+    """
+
+    def __init__(self, name: str, key: str):
+        self.path = get_checkpoint_path(name=name)
+        self.key = key
+        self._completed = set()
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                saved = json.load(file)
+            if saved.get('key') == key:
+                self._completed = set(saved.get('completed', []))
+
+    def __contains__(self, item) -> bool:
+        return str(item) in self._completed
+
+    def __len__(self) -> int:
+        return len(self._completed)
+
+    def add(self, item) -> None:
+        """
+        Mark item completed and save the checkpoint (atomically, so a crash never leaves a partial file)
+        ====================================================================================================
+        :param item:
+        :return:
+        """
+        with self._lock:
+            self._completed.add(str(item))
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w') as file:
+                json.dump({'key': self.key, 'completed': sorted(self._completed)}, file)
+            os.replace(temp_path, self.path)
+
+    def clear(self) -> None:
+        """
+        Remove the checkpoint once the backfill is complete
+        ====================================================================================================
+        :return:
+        """
+        with self._lock:
+            self._completed = set()
+            if os.path.exists(self.path):
+                os.remove(self.path)
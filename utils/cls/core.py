@@ -6,13 +6,26 @@ This script is where all reporting configuration takes place
 import os
 import re
 import json
+import time
 import pathlib
 
 import pandas as pd
 import sqlalchemy
 
-from utils.dbms_helpers.postgres_helpers import build_postgresql_engine
+from utils.dbms_helpers.postgres_helpers import (
+    build_postgresql_engine,
+    copy_postgresql_data,
+    create_postgresql_list_partition,
+    create_postgresql_month_partitions,
+    check_postgresql_table_partitioned,
+    get_postgresql_covered_partitions,
+    get_postgresql_date_bounds,
+    get_postgresql_partitioning,
+    truncate_postgresql_tables
+)
+from utils.credential_cache import get_credential_cache, get_secrets_dat_key, get_secrets_dat_writer
 from utils.tests import test_data_quality
+from utils.type_coercion import compile_schema
 from ..stdlib import module_from_file
 from conf.static import ENTITY_COLS
 
@@ -51,6 +64,8 @@ class Customizer:
     secrets_dat = {}
     application_engine = None
     application_database = 'applications'
+    # when set, pulls read raw API responses from the raw cache instead of calling the APIs
+    replay = False
     # columns used for entity mapping
     entity_cols = ENTITY_COLS
 
@@ -83,87 +98,230 @@ class Customizer:
             col for col in table[self.__columns_key] if col.get('backfilter')
         ]
 
-    def generate_set_statement_by_entity_columns(self, entity_columns: list) -> str:
-        statement = "SET\n"
-        count = len(entity_columns)
-        for col in enumerate(entity_columns, start=1):
-            if col[0] == count:
-                statement += f"{col[1]['name']} = LOOKUP.{col[1]['name']}\n"
+    def get_backfilter_date_window(self) -> tuple:
+        """
+        The report_date window loaded by this run (start, end), either end may be None when open
+        Returns None when no window is known, in which case the whole table is backfiltered
+        ====================================================================================================
+        :return:
+        """
+        if self.get_attribute(attrib='historical'):
+            return self.get_attribute(attrib='historical_start_date'), self.get_attribute(attrib='historical_end_date')
+        start_date = getattr(self, self.generate_attribute_prefix(attrib='start_date'), None)
+        end_date = getattr(self, self.generate_attribute_prefix(attrib='end_date'), None)
+        if start_date is None and end_date is None:
+            return None
+        return start_date, end_date
+
+    def create_backfilter_date_range_statement(self, alias: str = 'TARGET') -> str:
+        window = self.get_backfilter_date_window()
+        if window is None:
+            return ''
+        start_date, end_date = window
+        if start_date is not None and end_date is not None:
+            return f"AND {alias}.report_date BETWEEN '{start_date}' AND '{end_date}'"
+        elif start_date is not None:
+            return f"AND {alias}.report_date >= '{start_date}'"
+        return f"AND {alias}.report_date <= '{end_date}'"
+
+    def create_merged_backfilter_statement(self, table: dict, lookup_table: dict) -> str:
+        """
+        One UPDATE for the whole backfilter of a table, each entity column is resolved as
+            exact lookup match > fuzzy lookup match (see create_fuzzy_mapping_statement) > current value
+        and then defaulted with COALESCE, only rows in the run's date window whose values change are written
+        ====================================================================================================
+        :param table:
+        :param lookup_table:
+        :return:
+        """
+        backfilter_columns = self.get_backfilter_columns_by_table(table=table)
+        entity_columns = self.get_backfilter_entity_columns_by_table(table=table)
+        default_columns = [
+            col for col in table['columns'] if 'default' in col.keys()
+        ]
+        update_types = lookup_table.get('update_types') or []
+
+        # matches in precedence order, as (alias, backfilter column name)
+        matches = []
+        joins = ''
+        for update_type in ('exact', 'fuzzy'):
+            if update_type not in update_types:
+                continue
+            for column in backfilter_columns:
+                name = column['name']
+                alias = f"{update_type.upper()}_{name.upper()}"
+                if update_type == 'exact':
+                    # one lookup row per value, as with fuzzy matches
+                    source = f"""(
+                        SELECT DISTINCT ON ({name}) *
+                        FROM {lookup_table['schema']}.{lookup_table['name']}
+                        WHERE exact = 1
+                        ORDER BY {name}
+                    )"""
+                else:
+                    source = self.get_fuzzy_mapping_table_name(table=table, backfilter_column=column)
+                joins += f"""
+                    LEFT JOIN {source} {alias}
+                        ON TARGET.{name} = {alias}.{name}"""
+                matches.append((alias, name))
+
+        resolved_columns = []
+        for column in entity_columns:
+            name = column['name']
+            value = f"TARGET.{name}"
+            if matches:
+                cases = ''.join(
+                    f"\n                            WHEN {alias}.{match} IS NOT NULL THEN {alias}.{name}"
+                    for alias, match in matches
+                )
+                value = f"""CASE{cases}
+                            ELSE TARGET.{name}
+                        END"""
+            resolved_columns.append((name, value))
+        for column in default_columns:
+            name = column['name']
+            # a default configured as None is written as 'NULL', as the set default statements always did
+            default = str(column['default'] if column['default'] is not None else 'NULL').replace("'", "''")
+            resolved_names = [item[0] for item in resolved_columns]
+            if name in resolved_names:
+                idx = resolved_names.index(name)
+                resolved_columns[idx] = (name, f"COALESCE({resolved_columns[idx][1]}, '{default}')")
             else:
-                statement += f"{col[1]['name']} = LOOKUP.{col[1]['name']},\n"
-        return statement
-
-    def create_backfilter_statement(
-            self, table: dict, lookup_table: dict, backfilter_column: dict, entity_columns: list, update_type: str):
-        set_statement = self.generate_set_statement_by_entity_columns(entity_columns=entity_columns)
+                resolved_columns.append((name, f"COALESCE(TARGET.{name}, '{default}')"))
 
-        start_date = self.get_attribute(attrib='historical_start_date')
-        end_date = self.get_attribute(attrib='historical_end_date')
-        date_range = f"""
-                      AND report_date BETWEEN '{start_date}' AND '{end_date}'
-                      """
+        if not resolved_columns:
+            return ''
 
-        if update_type == 'exact':
-            exact_lookup = """AND LOOKUP.exact = 1;"""
+        select_statement = ''.join(
+            f",\n                        {value} AS {name}" for name, value in resolved_columns
+        )
+        set_statement = ',\n                    '.join(
+            f"{name} = RESOLVED.{name}" for name, _ in resolved_columns
+        )
+        changed_statement = '\n                    OR '.join(
+            f"TARGET.{name} IS DISTINCT FROM RESOLVED.{name}" for name, _ in resolved_columns
+        )
 
-            exact_stmt = f"""
+        return f"""
                 UPDATE {table['schema']}.{table['name']} TARGET
+                SET
                     {set_statement}
-                FROM {lookup_table['schema']}.{lookup_table['name']} LOOKUP
-                WHERE TARGET.{backfilter_column['name']} = LOOKUP.{backfilter_column['name']}
+                FROM (
+                    SELECT
+                        TARGET.ctid AS row_ctid{select_statement}
+                    FROM {table['schema']}.{table['name']} TARGET{joins}
+                    WHERE TRUE
+                    {self.create_backfilter_date_range_statement()}
+                ) RESOLVED
+                WHERE TARGET.ctid = RESOLVED.row_ctid
+                AND (
+                    {changed_statement}
+                );
                 """
 
-            if self.get_attribute(attrib='historical'):
-                exact_stmt += date_range
+    @staticmethod
+    def get_fuzzy_mapping_table_name(table: dict, backfilter_column: dict) -> str:
+        return f"{table['name']}_{backfilter_column['name']}_fuzzy_map"
 
-            exact_stmt += exact_lookup
-
-            return exact_stmt
-
-        # we want to be able to use indexes to optimize fuzzy updates
-        elif update_type == 'fuzzy':
-            fuzzy_lookup = """AND LOOKUP.exact = 0;"""
+    def create_fuzzy_mapping_statement(
+            self, table: dict, lookup_table: dict, backfilter_column: dict, entity_columns: list) -> str:
+        """
+        Resolve each distinct backfilter value to a single fuzzy lookup row, the longest matching
+        lookup value wins, in a temporary table dropped at the end of the backfilter transaction
+        ====================================================================================================
+        :param table:
+        :param lookup_table:
+        :param backfilter_column:
+        :param entity_columns:
+        :return:
+        """
+        column = backfilter_column['name']
+        select_columns = ''.join(f",\n                    LOOKUP.{col['name']}" for col in entity_columns)
 
-            fuzzy_stmt = f"""
-                UPDATE {table['schema']}.{table['name']} TARGET
-                    {set_statement}
+        return f"""
+                CREATE TEMPORARY TABLE {self.get_fuzzy_mapping_table_name(table, backfilter_column)}
+                ON COMMIT DROP AS
+                SELECT DISTINCT ON (TARGET.{column})
+                    TARGET.{column}{select_columns}
                 FROM {lookup_table['schema']}.{lookup_table['name']} LOOKUP
-                WHERE TARGET.{backfilter_column['name']} ILIKE CONCAT('%', LOOKUP.{backfilter_column['name']}, '%')
+                JOIN {table['schema']}.{table['name']} TARGET
+                    ON TARGET.{column} ILIKE CONCAT('%', LOOKUP.{column}, '%')
+                WHERE LOOKUP.exact = 0
+                {self.create_backfilter_date_range_statement()}
+                ORDER BY TARGET.{column}, LENGTH(LOOKUP.{column}) DESC NULLS LAST, LOOKUP.{column};
                 """
 
-            if self.get_attribute(attrib='historical'):
-                fuzzy_stmt += date_range
-
-            fuzzy_stmt += fuzzy_lookup
-
-            return fuzzy_stmt
-
-        else:
-            raise AssertionError(
-                f"GRC: Unsupported update_type, {update_type}"
-            )
-
-    def create_set_default_statements(self, table: dict) -> list:
-        default_cols = [
-            col for col in table['columns'] if 'default' in col.keys()
-        ]
-        statements = []
-        for col in default_cols:
+    def create_trigram_index_statements(self, table: dict) -> list:
+        """
+        pg_trgm GIN indexes let the ILIKE '%value%' fuzzy joins probe the reporting table by index
+        ====================================================================================================
+        :param table:
+        :return:
+        """
+        statements = ["CREATE EXTENSION IF NOT EXISTS pg_trgm;"]
+        for column in self.get_backfilter_columns_by_table(table=table):
             statements.append(
                 f"""
-                UPDATE {table['schema']}.{table['name']}
-                SET {col['name']} = '{col['default'] if col['default'] is not None else 'NULL'}'
-                WHERE {col['name']} IS NULL;
+                CREATE INDEX IF NOT EXISTS {table['name']}_{column['name']}_trgm_idx
+                ON {table['schema']}.{table['name']} USING gin ({column['name']} gin_trgm_ops);
                 """
             )
         return statements
 
+    def ensure_trigram_indexes(self, table: dict) -> None:
+        for statement in self.create_trigram_index_statements(table=table):
+            try:
+                with self.engine.connect() as con:
+                    con.execute(sqlalchemy.text(statement))
+            except sqlalchemy.exc.SQLAlchemyError as error:
+                # fuzzy backfilters still work without the index, only slower
+                print(f"WARN: Unable to create trigram index for {table['name']}: {error.__class__.__name__}")
+                return
+
     def get_table_dictionary_by_name(self, table_name: str) -> dict:
         return [
             table for table in self.configuration_workbook['sheets']
             if table['table']['name'] == table_name
         ][0]['table']
 
+    def type(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Type columns for safe storage (respecting data type and if needed, length)
+        The casts are compiled once per table schema and reused for every frame
+        ====================================================================================================
+        :param df:
+        :return:
+        """
+        return compile_schema(columns=self.get_attribute('schema')['columns'])(df)
+
+    def bulk_load(self, con, df, table: str = None) -> int:
+        """
+        Load df into the customizer's table (or the given table) with COPY on an open connection
+        Column order follows the workbook schema when the table is configured there
+        df may also be an iterable of frames (see utils/pipeline.py), each is loaded as it is produced
+        ====================================================================================================
+        :param con:
+        :param df:
+        :param table:
+        :return:
+        """
+        table = table or self.get_attribute('table')
+        table_sheets = [
+            sheet['table'] for sheet in self.configuration_workbook['sheets']
+            if sheet['table']['name'] == table
+        ]
+        frames = [df] if isinstance(df, pd.DataFrame) else df
+        return sum(
+            copy_postgresql_data(
+                con=con,
+                df=frame,
+                table=table,
+                schema=table_sheets[0]['schema'] if table_sheets else 'public',
+                columns=table_sheets[0]['columns'] if table_sheets else None
+            )
+            for frame in frames
+        )
+
     def build_backfilter_statements(self) -> list:
         table = self.get_table_dictionary_by_name(self.get_attribute('table'))
         lookup_table = self.get_lookup_table_by_tablespace(
@@ -173,18 +331,19 @@ class Customizer:
         entity_columns = self.get_backfilter_entity_columns_by_table(table=table)
 
         statements = []
-        for column in backfilter_columns:
-            for update_type in lookup_table['update_types']:
+        if 'fuzzy' in (lookup_table.get('update_types') or []):
+            for column in backfilter_columns:
                 statements.append(
-                    self.create_backfilter_statement(
+                    self.create_fuzzy_mapping_statement(
                         table=table,
                         lookup_table=lookup_table,
                         backfilter_column=column,
-                        entity_columns=entity_columns,
-                        update_type=update_type
+                        entity_columns=entity_columns
                     )
                 )
-        statements.extend(self.create_set_default_statements(table=table))
+        merged_statement = self.create_merged_backfilter_statement(table=table, lookup_table=lookup_table)
+        if merged_statement:
+            statements.append(merged_statement)
         return statements
 
     def __construct_mv_select_statement(
@@ -633,6 +792,13 @@ class Customizer:
     def __get_secrets(self) -> None:
         name_value = getattr(self, 'credential_name')
         assert name_value, f"Invalid name_value {name_value} provided"
+        self.secrets = get_credential_cache().get_or_load(
+            key=('gds_compiler_credentials', name_value),
+            load=lambda: self.__query_secrets(name_value=name_value)
+        )
+        return
+
+    def __query_secrets(self, name_value: str):
         with self.application_engine.connect() as con:
             result = con.execute(
                 sqlalchemy.text(
@@ -644,12 +810,23 @@ class Customizer:
                 ),
                 name_value=name_value
             ).first()
-        self.secrets = result['content_value'] if result else {}
-        return
+        return result['content_value'] if result else {}
 
     def __get_secrets_dat(self) -> None:
         name_value = getattr(self, 'secrets_name')
         assert name_value, f"Invalid name_value {name_value} provided"
+        self.secrets_dat = get_credential_cache().get_or_load(
+            key=get_secrets_dat_key(client_name=self.client, name_value=name_value),
+            load=lambda: self.__query_secrets_dat(name_value=name_value)
+        )
+        get_secrets_dat_writer().record_loaded(
+            client_name=self.client,
+            name_value=name_value,
+            content_value=self.secrets_dat
+        )
+        return
+
+    def __query_secrets_dat(self, name_value: str):
         with self.application_engine.connect() as con:
             result = con.execute(
                 sqlalchemy.text(
@@ -666,8 +843,7 @@ class Customizer:
                 client_name=self.client,  # camel-case client name
                 name_value=name_value
             ).first()
-        self.secrets_dat = json.dumps(result['content_value']) if result else {}
-        return
+        return json.dumps(result['content_value']) if result else {}
 
     def set_customizer_secrets_dat(self) -> None:
         client_name = getattr(self, 'client')  # camel-case client name
@@ -676,55 +852,13 @@ class Customizer:
         content_value = getattr(self, 'secrets_dat', '')
         assert content_value, f"Invalid content_value {content_value} provided"
         content_value = json.dumps(content_value) if type(content_value) == dict else content_value
-        with self.application_engine.connect() as con:
-            count_result = con.execute(
-                sqlalchemy.text(
-                    """
-                    SELECT COUNT(*) as count_value
-                    FROM public.gds_compiler_credentials_dat
-                    WHERE client_name = :client_name
-                    AND name_value = :name_value;
-                    """
-                ),
-                client_name=client_name,
-                name_value=name_value
-            ).first()
-            if count_result['count_value'] == 0:
-                con.execute(
-                    sqlalchemy.text(
-                        """
-                        INSERT INTO public.gds_compiler_credentials_dat
-                        (
-                            client_name,
-                            name_value,
-                            content_value
-                        )
-                        VALUES
-                        (
-                            :client_name, 
-                            :name_value,
-                            :content_value
-                        );
-                        """
-                    ),
-                    client_name=client_name,
-                    name_value=name_value,
-                    content_value=content_value
-                )
-            else:
-                con.execute(
-                    sqlalchemy.text(
-                        """
-                        UPDATE public.gds_compiler_credentials_dat
-                        SET content_value = :content_value
-                        WHERE client_name = :client_name
-                        AND name_value = :name_value;
-                        """
-                    ),
-                    client_name=client_name,
-                    name_value=name_value,
-                    content_value=content_value
-                )
+        # only changed payloads (refreshed tokens) reach the database
+        get_secrets_dat_writer().write(
+            engine=self.application_engine,
+            client_name=client_name,
+            name_value=name_value,
+            content_value=content_value
+        )
         return
 
     def backfilter_statement(self):
@@ -735,10 +869,21 @@ class Customizer:
         assert len(target_sheets) == 1
         sheet = target_sheets[0]
         assert sheet['table']['type'] == 'reporting'
+        table = self.get_table_dictionary_by_name(self.get_attribute('table'))
+        lookup_table = self.get_lookup_table_by_tablespace(tablespace=table['tablespace'])
+        if 'fuzzy' in lookup_table['update_types']:
+            self.ensure_trigram_indexes(table=table)
         statements = self.build_backfilter_statements()
-        with self.engine.connect() as con:
+        start = time.monotonic()
+        updated = 0
+        # one transaction, the fuzzy mapping tables only live until it commits
+        with self.engine.begin() as con:
             for statement in statements:
-                con.execute(sqlalchemy.text(statement))
+                result = con.execute(sqlalchemy.text(statement))
+            if statements:
+                # the merged UPDATE is always the last statement
+                updated = result.rowcount
+        print(f"SUCCESS: Backfilter updated {updated} rows of {table['name']} in {time.monotonic() - start:.2f}s.")
 
     def ingest_statement(self):
         master_columns = []
@@ -752,10 +897,80 @@ class Customizer:
             sheet for sheet in self.configuration_workbook['sheets']
             if sheet['table']['name'] == self.get_attribute('table')]
         ingest_procedure = self.create_ingest_statement(master_columns, target_sheets)
+        if get_postgresql_partitioning(schema=self.marketing_data):
+            with self.engine.connect() as con:
+                partitioned = check_postgresql_table_partitioned(
+                    con=con,
+                    table=self.marketing_data['table']['name'],
+                    schema=self.marketing_data['table']['schema']
+                )
+            if partitioned:
+                return self.partitioned_ingest(ingest_procedure=ingest_procedure, target_sheets=target_sheets)
+            # partitioning only applies when the table is created, an existing table is loaded as before
+            print(f"WARN: {self.marketing_data['table']['name']} is not partitioned, ingesting without partitions")
         with self.engine.connect() as con:
             for statement in ingest_procedure:
                 con.execute(statement)
 
+    def partitioned_ingest(self, ingest_procedure: list, target_sheets: list) -> None:
+        """
+        Ingest into a partitioned marketing_data table in one transaction
+            - partitions needed for the rows being loaded are created first
+            - a full (non historical) reload truncates this data source's partition instead of deleting
+            - a historical reload truncates the months it fully covers, the rolling DELETE handles the rest
+            - rows outside every month partition (e.g. a NULL report_date) land in the DEFAULT partition
+        ====================================================================================================
+        :param ingest_procedure: [delete statement, insert statement] from create_ingest_statement
+        :param target_sheets:
+        :return:
+        """
+        delete_statement, insert_statement = ingest_procedure
+        partitioning = get_postgresql_partitioning(schema=self.marketing_data)
+        target_columns = target_sheets[0]['table']['columns']
+        ingest_indicator = [column['name'] for column in target_columns if 'ingest_indicator' in column][0]
+        historical = self.get_attribute(attrib='historical')
+        start_date = self.get_attribute(attrib='historical_start_date') if historical else None
+        end_date = self.get_attribute(attrib='historical_end_date') if historical else None
+
+        with self.engine.begin() as con:
+            parent = self.marketing_data['table']['name']
+            truncate_tables = []
+            if partitioning.get('list_column'):
+                parent = create_postgresql_list_partition(
+                    con=con,
+                    schema=self.marketing_data,
+                    value=self.get_attribute(attrib=ingest_indicator)
+                )
+                if not historical:
+                    truncate_tables.append(parent)
+
+            if partitioning.get('range_column'):
+                min_date, max_date = get_postgresql_date_bounds(
+                    con=con,
+                    table=self.get_attribute('table'),
+                    date_col=partitioning['range_column'],
+                    start_date=start_date,
+                    end_date=end_date
+                )
+                if min_date is not None:
+                    # aggregated ingests may shift dates back a month ('1 month interval')
+                    months = create_postgresql_month_partitions(
+                        con=con,
+                        schema=self.marketing_data,
+                        parent=parent,
+                        start_date=pd.Timestamp(min_date) - pd.DateOffset(months=1),
+                        end_date=max_date
+                    )
+                    if historical and partitioning.get('list_column'):
+                        truncate_tables.extend(
+                            get_postgresql_covered_partitions(partitions=months, start_date=start_date, end_date=end_date)
+                        )
+
+            truncate_postgresql_tables(con=con, tables=truncate_tables, schema=self.marketing_data['table']['schema'])
+            if historical or not partitioning.get('list_column'):
+                con.execute(delete_statement)
+            con.execute(insert_statement)
+
     def audit(self):
         data_test = test_data_quality.TestDataQuality()
 
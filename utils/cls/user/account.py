@@ -1,10 +1,9 @@
 import pandas as pd
 import sqlalchemy
-import calendar
-import datetime
 
 from utils.dbms_helpers import postgres_helpers
 from utils.cls.core import Customizer
+from utils.transforms import spread_over_dates
 
 TABLE_SCHEMA = 'public'
 DATE_COL = 'report_date'
@@ -49,13 +48,7 @@ class AccountCost(Customizer):
                 )
             )
 
-            df.to_sql(
-                table,
-                con=con,
-                if_exists='append',
-                index=False,
-                index_label=None
-            )
+            self.bulk_load(con=con, df=df)
 
     def pull_account_cost(self):
         engine = postgres_helpers.build_postgresql_engine(customizer=self)
@@ -73,56 +66,19 @@ class AccountCost(Customizer):
             ] if results else []
 
     def get_account_cost_meta_data(self, cost_data):
-        data = []
-        for row in cost_data:
-            start_date = row[0]
-            mapped_location = row[2]
-            end_date = row[1]
-            medium = row[5]
-            total_cost = float(row[4].replace('$', '').replace(',', ''))
-
-            if end_date is None:
-                end_date = ''
-
-            if end_date == '':
-                end_date = datetime.date.today().strftime('%Y-%m-%d')
-            # historical, iterate over a range of dates
-            for iter_date in pd.date_range(start_date, end_date):
-                month = iter_date.month
-                year = iter_date.year
-                max_days = calendar.monthrange(year=year, month=month)[1]
-                daily_cost = (total_cost / max_days)
-                data.append({
-                    'Date': iter_date,
-                    'Property': mapped_location,
-                    'Medium': medium,
-                    'Daily_Cost': daily_cost
-                })
-        return pd.DataFrame(data)
-
-    def type(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Type columns for safe storage (respecting data type and if needed, length)
-        :param df:
-        :return: df
-        """
-        for column in self.get_attribute('schema')['columns']:
-            if column['name'] in df.columns:
-                if column['type'] == 'character varying':
-                    assert 'length' in column.keys()
-                    df[column['name']] = df[column['name']].apply(lambda x: str(x)[:column['length']] if x else None)
-                elif column['type'] == 'bigint':
-                    df[column['name']] = df[column['name']].apply(lambda x: int(x) if x else None)
-                elif column['type'] == 'double precision':
-                    df[column['name']] = df[column['name']].apply(lambda x: float(x) if x else None)
-                elif column['type'] == 'date':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'timestamp without time zone':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'datetime with time zone':
-                    # TODO(jschroeder) how better to interpret timezone data?
-                    df[column['name']] = pd.to_datetime(df[column['name']], utc=True)
-        return df
+        if not cost_data:
+            return pd.DataFrame()
+        # source_account_cost columns by position: start date, end date, location, ..., cost, medium
+        df = pd.DataFrame([tuple(row) for row in cost_data])
+        # monthly costs, spread evenly over the days of each month up to the end date (or today)
+        return spread_over_dates(
+            df=df,
+            start_col=0,
+            end_col=1,
+            amount_col=4,
+            columns={2: 'Property', 5: 'Medium'},
+            per='month'
+        )
 
     def post_processing(self) -> None:
         """
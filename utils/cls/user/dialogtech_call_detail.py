@@ -5,6 +5,8 @@ Dialogtech Call Detail Customizer Module
 import datetime
 
 # PLATFORM IMPORTS
+from utils import raw_cache
+from utils.concurrency import fetch_concurrently
 from utils.cls.user.dt import Dialogtech
 from dialogtech.reporting.client.call_detail import CallDetailReporting
 
@@ -48,17 +50,31 @@ class DialogtechCallDetailCustomizer(Dialogtech):
         self.set_attribute('start_date', datetime.datetime.strftime(start_date, '%Y-%m-%d'))
         self.set_attribute('end_date', datetime.datetime.strftime(end_date, '%Y-%m-%d'))
 
-        dialog_tech = CallDetailReporting(vertical=self.vertical)
+        dialog_tech = CallDetailReporting(vertical=self.vertical) if not self.replay else None
 
-        phone_labels = self.pull_dialogtech_labels()
+        # a label mapped more than once is fetched once, with its last mapping
+        phone_labels = list({
+            phone_label['phone_label']: phone_label for phone_label in self.pull_dialogtech_labels()
+        }.values())
 
-        for phone_label in phone_labels:
-            df = dialog_tech.get_call_detail_report(
+        def get_call_detail_report(phone_label: dict):
+            return raw_cache.cached_frame(
+                customizer=self,
+                entity_id=phone_label['phone_label'],
+                fetch=lambda: dialog_tech.get_call_detail_report(
+                    start_date=start_date,
+                    end_date=end_date,
+                    phone_label=phone_label['phone_label']
+                ),
                 start_date=start_date,
-                end_date=end_date,
-                phone_label=phone_label['phone_label']
+                end_date=end_date
             )
 
+        # every label is fetched concurrently, then the window is replaced and loaded in a single transaction
+        frames = []
+        pulled_labels = []
+        results = fetch_concurrently(func=get_call_detail_report, items=phone_labels, max_workers=self.max_workers)
+        for phone_label, df in results:
             if df.shape[0]:
                 df['data_source'] = DATA_SOURCE
                 df['property'] = phone_label['property']
@@ -83,13 +99,16 @@ class DialogtechCallDetailCustomizer(Dialogtech):
                     'client_id'
                 ]]
 
-                self.ingest_by_phone_label(
-                    df=df,
-                    phone_label=phone_label['phone_label'],
-                    start_date=start_date,
-                    end_date=end_date
-                )
+                frames.append(df)
+                pulled_labels.append(phone_label['phone_label'])
 
             else:
                 print('INFO: No data returned for ' + str(phone_label['phone_label']))
 
+        if frames:
+            self.ingest_by_phone_labels(
+                df=frames,
+                phone_labels=pulled_labels,
+                start_date=start_date,
+                end_date=end_date
+            )
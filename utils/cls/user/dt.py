@@ -2,6 +2,7 @@ import pandas as pd
 import sqlalchemy
 import datetime
 
+from utils import instrumentation
 from utils.dbms_helpers import postgres_helpers
 from utils.cls.core import Customizer, get_configured_item_by_key
 
@@ -22,6 +23,9 @@ class Dialogtech(Customizer):
 
     post_processing_sql_list = []
 
+    # concurrent call detail requests in flight
+    max_workers = 4
+
     def __get_post_processing_sql_list(self) -> list:
         """
         If you wish to execute post-processing on the SOURCE table, enter sql commands in the list
@@ -37,33 +41,37 @@ class Dialogtech(Customizer):
         self.set_attribute('table_schema', TABLE_SCHEMA)
         self.set_attribute('date_col', DATE_COL)
 
-    def ingest_by_phone_label(self, df: pd.DataFrame, phone_label: str, start_date: datetime.datetime, end_date: datetime.datetime) -> None:
+    def ingest_by_phone_labels(self, df, phone_labels: list, start_date: datetime.datetime, end_date: datetime.datetime) -> None:
+        """
+        Replace the date range for every given phone label and load df (a frame or an iterable of frames)
+        in one transaction
+        ====================================================================================================
+        :param df:
+        :param phone_labels:
+        :param start_date:
+        :param end_date:
+        :return:
+        """
         table_schema = self.get_attribute('table_schema')
         table = self.get_attribute('table')
         date_col = self.get_attribute('date_col')
 
-        with self.engine.begin() as con:
+        with instrumentation.stage('load', entity=f'phone_labels={len(phone_labels)}'), self.engine.begin() as con:
             con.execute(
                 sqlalchemy.text(
                     f"""
                     DELETE FROM
                     {table_schema}.{table}
                     WHERE {date_col} BETWEEN :start_date AND :end_date
-                    AND phone_label = :phone_label;
+                    AND phone_label = ANY(:phone_labels);
                     """
                 ),
                 start_date=start_date,
                 end_date=end_date,
-                phone_label=phone_label
+                phone_labels=list(phone_labels)
             )
 
-            df.to_sql(
-                table,
-                con=con,
-                if_exists='append',
-                index=False,
-                index_label=None
-            )
+            self.bulk_load(con=con, df=df)
 
     @staticmethod
     def get_date_range(start_date: datetime.datetime, end_date: datetime.datetime) -> list:
@@ -103,30 +111,6 @@ class Dialogtech(Customizer):
                 for result in results
             ] if results else []
 
-    def type(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Type columns for safe storage (respecting data type and if needed, length)
-        :param df:
-        :return: df
-        """
-        for column in self.get_attribute('schema')['columns']:
-            if column['name'] in df.columns:
-                if column['type'] == 'character varying':
-                    assert 'length' in column.keys()
-                    df[column['name']] = df[column['name']].apply(lambda x: str(x)[:column['length']] if x else None)
-                elif column['type'] == 'bigint':
-                    df[column['name']] = df[column['name']].apply(lambda x: int(x) if x else None)
-                elif column['type'] == 'double precision':
-                    df[column['name']] = df[column['name']].apply(lambda x: float(x) if x else None)
-                elif column['type'] == 'date':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'timestamp without time zone':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'datetime with time zone':
-                    # TODO(jschroeder) how better to interpret timezone data?
-                    df[column['name']] = pd.to_datetime(df[column['name']], utc=True)
-        return df
-
     def post_processing(self) -> None:
         """
         Handles custom SQL statements for the SOURCE table due to bad / mismatched data (if any)
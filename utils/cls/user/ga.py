@@ -1,13 +1,16 @@
-from time import sleep
 import pandas as pd
 import sqlalchemy
 import datetime
+import threading
 import pathlib
 import os
 
+from utils import instrumentation, pipeline, raw_cache
 from utils.dbms_helpers import postgres_helpers
+from utils.concurrency import TokenBucket, fetch_concurrently, is_retryable_http_error
 from utils.cls.core import Customizer, get_configured_item_by_key
 
+from googleapiclient.errors import HttpError
 from googleanalyticspy.reporting.client.reporting import GoogleAnalytics as GoogleAnalyticsClient
 TABLE_SCHEMA = 'public'
 DATE_COL = 'report_date'
@@ -41,6 +44,11 @@ class GoogleAnalytics(Customizer):
 
     post_processing_sql_list = []
 
+    # concurrent reporting requests in flight and the sustained request rate (GA quota is per view / user)
+    max_workers = 4
+    requests_per_second = 5
+    request_retries = 3
+
     def __get_post_processing_sql_list(self) -> list:
         """
         If you wish to execute post-processing on the SOURCE table, enter sql commands in the list
@@ -62,7 +70,7 @@ class GoogleAnalytics(Customizer):
         table_schema = self.get_attribute('table_schema')
         table = self.get_attribute('table')
         date_col = self.get_attribute('date_col')
-        with self.engine.begin() as con:
+        with instrumentation.stage('load', entity=f'view_id={view_id}'), self.engine.begin() as con:
             con.execute(
                 sqlalchemy.text(
                     f"""
@@ -76,13 +84,7 @@ class GoogleAnalytics(Customizer):
                 end_date=end_date,
                 view_id=view_id
             )
-            df.to_sql(
-                table,
-                con=con,
-                if_exists='append',
-                index=False,
-                index_label=None
-            )
+            self.bulk_load(con=con, df=df)
 
     @staticmethod
     def get_date_range(start_date: datetime.datetime, end_date: datetime.datetime) -> list:
@@ -117,31 +119,6 @@ class GoogleAnalytics(Customizer):
             dict(result) for result in results
         ] if results else []
 
-    # noinspection PyMethodMayBeStatic
-    def type(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Type columns for safe storage (respecting data type and if needed, length)
-        ====================================================================================================
-        :param df:
-        :return:
-        """
-        for column in self.get_attribute('schema')['columns']:
-            if column['name'] in df.columns:
-                if column['type'] == 'character varying':
-                    assert 'length' in column.keys()
-                    df[column['name']] = df[column['name']].apply(lambda x: str(x)[:column['length']] if x else None)
-                elif column['type'] == 'bigint':
-                    df[column['name']] = df[column['name']].apply(lambda x: int(x) if x else None)
-                elif column['type'] == 'double precision':
-                    df[column['name']] = df[column['name']].apply(lambda x: float(x) if x else None)
-                elif column['type'] == 'date':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'timestamp without time zone':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'datetime with time zone':
-                    df[column['name']] = pd.to_datetime(df[column['name']], utc=True)
-        return df
-
     def post_processing(self) -> None:
         """
         Handles custom SQL statements for the SOURCE table due to bad / mismatched data (if any)
@@ -167,53 +144,81 @@ class GoogleAnalytics(Customizer):
         self.set_attribute('start_date', start_date.date())
         self.set_attribute('end_date', end_date.date())
 
-        # initialize the client module for connecting to GA
-        ga_client = GoogleAnalyticsClient(
-            customizer=self
-        )
         # get all view that are configured
         views = self.get_views()
         assert views, "No " + self.__class__.__name__ + " views setup!"
-        # iterate over each date to pull, process and ingest to prevent sampling
-        date_idx = 0
+        # each (date, view) pair is its own request to prevent sampling
         date_range = self.get_date_range(start_date=start_date, end_date=end_date)
-        for _ in date_range:
-            if date_idx != 0:
-                start = date_range[date_idx - 1].strftime('%Y-%m-%d')
-                end = date_range[date_idx].strftime('%Y-%m-%d')
-                # for each, pull according to the dates, metrics and dimensions configured
-                for view in views:
-                    view_id = view['view_id']
-                    prop = view['property']
-                    dimensions = self.__get_dimensions(view_id=view_id)
-                    metrics = self.__get_metrics(view_id=view_id)
-                    rename_map = self.__get_rename_map(view_id=view_id)
-                    assert dimensions and metrics, \
-                        "Dimensions and metrics not properly configured for " + self.__class__.__name__
-                    df = ga_client.query(
+        requests = []
+        for date_idx in range(1, len(date_range)):
+            start = date_range[date_idx - 1].strftime('%Y-%m-%d')
+            end = date_range[date_idx].strftime('%Y-%m-%d')
+            for view in views:
+                requests.append((start, end, view))
+
+        # fetch concurrently under the GA quota and ingest each result as soon as it arrives
+        self.__ga_clients = threading.local()
+        results = fetch_concurrently(
+            func=self.__query_view,
+            items=requests,
+            max_workers=self.max_workers,
+            rate_limiter=TokenBucket(rate=self.requests_per_second, capacity=self.max_workers),
+            retries=self.request_retries,
+            retry_exceptions=(HttpError,),
+            retry_if=is_retryable_http_error
+        )
+        for (start, end, view), df in results:
+            view_id = view['view_id']
+            prop = view['property']
+
+            self.set_customizer_secrets_dat()
+
+            if df.shape[0]:
+                # renamed, typed and loaded a chunk at a time inside the ingest transaction
+                chunks = pipeline.pipe(
+                    pipeline.iter_chunks(df=df),
+                    pipeline.rename(columns=self.__get_rename_map(view_id=view_id)),
+                    self.type,
+                    pipeline.assign(
                         view_id=view_id,
-                        raw_dimensions=dimensions,
-                        raw_metrics=metrics,
-                        start_date=start,
-                        end_date=end
+                        property=prop,
+                        community=None,
+                        data_source=self.get_attribute('data_source')
                     )
+                )
+                self.ingest_by_view_id(view_id=view_id, df=chunks, start_date=start, end_date=end)
+            else:
+                print(f'WARN: No data returned for {start} for view {view_id} for property {prop}')
+
+    def __query_view(self, request: tuple) -> pd.DataFrame:
+        """
+        Query one view for one date window, each worker thread keeps its own client
+        ====================================================================================================
+        :param request: (start, end, view)
+        :return:
+        """
+        start, end, view = request
+        view_id = view['view_id']
+        dimensions = self.__get_dimensions(view_id=view_id)
+        metrics = self.__get_metrics(view_id=view_id)
+        assert dimensions and metrics, \
+            "Dimensions and metrics not properly configured for " + self.__class__.__name__
+
+        def fetch() -> pd.DataFrame:
+            # initialize the client module for connecting to GA
+            if not hasattr(self.__ga_clients, 'client'):
+                self.__ga_clients.client = GoogleAnalyticsClient(
+                    customizer=self
+                )
+            return self.__ga_clients.client.query(
+                view_id=view_id,
+                raw_dimensions=dimensions,
+                raw_metrics=metrics,
+                start_date=start,
+                end_date=end
+            )
 
-                    self.set_customizer_secrets_dat()
-
-                    if df.shape[0]:
-                        df.rename(columns=rename_map, inplace=True)
-                        df = self.type(df=df)
-                        df['view_id'] = view_id
-                        df['property'] = prop
-                        df['community'] = None
-                        df['data_source'] = self.get_attribute('data_source')
-                        self.ingest_by_view_id(view_id=view_id, df=df, start_date=start, end_date=end)
-                    else:
-                        print(f'WARN: No data returned for {start} for view {view_id} for property {prop}')
-                        sleep(10)  # If no data available, sleep to avoid API quota error
-
-            # always increments the date_range idx
-            date_idx += 1
+        return raw_cache.cached_frame(customizer=self, entity_id=view_id, fetch=fetch, start_date=start, end_date=end)
 
     def backfilter(self):
         self.backfilter_statement()
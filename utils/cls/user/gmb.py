@@ -1,13 +1,17 @@
 import pandas as pd
-import numpy as np
 import sqlalchemy
 import datetime
+import threading
 import pathlib
 import os
 
+from utils import instrumentation
 from utils.dbms_helpers import postgres_helpers
+from utils.transforms import cumulative_average
+from utils.concurrency import TokenBucket, fetch_concurrently, is_retryable_http_error
 from utils.cls.core import Customizer, get_configured_item_by_key
 
+from googleapiclient.errors import HttpError
 from googlemybusiness.reporting.client.listing_report import GoogleMyBusinessReporting
 TABLE_SCHEMA = 'public'
 DATE_COL = 'report_date'
@@ -27,6 +31,11 @@ class GoogleMyBusiness(Customizer):
 
     post_processing_sql_list = []
 
+    # concurrent listing requests in flight and the sustained request rate (GMB quota is per project)
+    max_workers = 4
+    requests_per_second = 5
+    request_retries = 3
+
     def __get_post_processing_sql_list(self) -> list:
         """
         If you wish to execute post-processing on the SOURCE table, enter sql commands in the list
@@ -43,35 +52,71 @@ class GoogleMyBusiness(Customizer):
         self.get_secrets(include_dat=True)
         self.set_attribute('table_schema', TABLE_SCHEMA)
         self.set_attribute('date_col', DATE_COL)
+        self.__gmb_clients = threading.local()
+
+    def get_gmb_client(self) -> GoogleMyBusinessReporting:
+        """
+        Each thread builds its own client on first use (so a replay, which never calls the API, builds none)
+        ====================================================================================================
+        :return:
+        """
+        if not hasattr(self.__gmb_clients, 'client'):
+            self.__gmb_clients.client = GoogleMyBusinessReporting(
+                customizer=self
+            )
+        return self.__gmb_clients.client
+
+    def fetch_listings(self, func, listings: list):
+        """
+        Run func over every listing under the GMB rate limit, retrying API errors,
+        and yield (listing, result) as each completes
+        ====================================================================================================
+        :param func:
+        :param listings:
+        :return:
+        """
+        return fetch_concurrently(
+            func=func,
+            items=listings,
+            max_workers=self.max_workers,
+            rate_limiter=TokenBucket(rate=self.requests_per_second, capacity=self.max_workers),
+            retries=self.request_retries,
+            retry_exceptions=(HttpError,),
+            retry_if=is_retryable_http_error
+        )
 
-    def ingest_by_listing_id(self, listing_id: str, df: pd.DataFrame, start_date: str, end_date: str) -> None:
+    def ingest_by_listing_ids(self, listing_ids: list, df, start_date: str, end_date: str) -> None:
+        """
+        Replace the date range for every given listing and load df (a frame or an iterable of frames)
+        in one transaction
+        ====================================================================================================
+        :param listing_ids:
+        :param df:
+        :param start_date:
+        :param end_date:
+        :return:
+        """
         table_schema = self.get_attribute('table_schema')
         table = self.get_attribute('table')
         date_col = self.get_attribute('date_col')
 
-        with self.engine.begin() as con:
+        with instrumentation.stage('load', entity=f'listings={len(listing_ids)}'), self.engine.begin() as con:
             con.execute(
                 sqlalchemy.text(
                     f"""
                     DELETE FROM
                     {table_schema}.{table}
                     WHERE {date_col} BETWEEN :start_date AND :end_date
-                    AND listing_id = :listing_id;
+                    AND listing_id = ANY(:listing_ids);
                     """
                 ),
                 start_date=start_date,
                 end_date=end_date,
-                listing_id=listing_id
-            )
-            df.to_sql(
-                table,
-                con=con,
-                if_exists='append',
-                index=False,
-                index_label=None
+                listing_ids=list(listing_ids)
             )
+            self.bulk_load(con=con, df=df)
 
-        print(f'Data pulled for {start_date} and {end_date} for listing_id: {listing_id}.')
+        print(f'Data pulled for {start_date} and {end_date} for {len(listing_ids)} listings.')
 
     @staticmethod
     def get_date_range(start_date: datetime.datetime, end_date: datetime.datetime) -> list:
@@ -109,26 +154,19 @@ class GoogleMyBusiness(Customizer):
         Rather than use a rolling average
         Compute the historical to date average
         For each review in the dataset
+
+        Reviews from the first date are left out of the average and keep their own star_rating
         """
         df.sort_values(
             by='create_time',
             ascending=False,
             inplace=True
         )
-        df['Average_Rating'] = None
-        first_review_date = df['create_time'].unique()[-1]
-        for date in df['create_time'].unique()[::-1]:
-            # get all reviews up to and including the ones on this date
-            reviews = df.loc[df['create_time'] > first_review_date, ['create_time', 'star_rating']]
-            reviews = reviews.loc[reviews['create_time'] <= date, :]
-            # compute the mean
-            average_rating = np.mean(list(reviews['star_rating']))
-            # assign the mean for this date
-            df['Average_Rating'][df['create_time'] == date] = average_rating
+        df['Average_Rating'] = cumulative_average(df=df, date_col='create_time', value_col='star_rating')
         # round to double precision
         df['Average_Rating'] = df['Average_Rating'].apply(lambda x: round(x, 2) if x else None)
         # fill empty cells with star_rating value
-        df['Average_Rating'].fillna(df['star_rating'], inplace=True)
+        df['Average_Rating'] = df['Average_Rating'].fillna(df['star_rating'])
 
         return df
 
@@ -140,30 +178,6 @@ class GoogleMyBusiness(Customizer):
             if account['account_name'] in conf_accounts
         ]
 
-    def type(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Type columns for safe storage (respecting data type and if needed, length)
-        :param df:
-        :return: df
-        """
-        for column in self.get_attribute('schema')['columns']:
-            if column['name'] in df.columns:
-                if column['type'] == 'character varying':
-                    assert 'length' in column.keys()
-                    df[column['name']] = df[column['name']].apply(lambda x: str(x)[:column['length']] if x else None)
-                elif column['type'] == 'bigint':
-                    df[column['name']] = df[column['name']].apply(lambda x: int(x) if x else None)
-                elif column['type'] == 'double precision':
-                    df[column['name']] = df[column['name']].apply(lambda x: float(x) if x else None)
-                elif column['type'] == 'date':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'timestamp without time zone':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'datetime with time zone':
-                    # TODO(jschroeder) how better to interpret timezone data?
-                    df[column['name']] = pd.to_datetime(df[column['name']], utc=True)
-        return df
-
     def post_processing(self) -> None:
         """
         Handles custom SQL statements for the SOURCE table due to bad / mismatched data (if any)
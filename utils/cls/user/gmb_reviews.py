@@ -6,8 +6,8 @@ import datetime
 import pandas as pd
 
 # PLATFORM IMPORTS
+from utils import raw_cache
 from utils.cls.user.gmb import GoogleMyBusiness
-from googlemybusiness.reporting.client.listing_report import GoogleMyBusinessReporting
 
 # CUSTOM IMPORTS
 IS_CLASS = True
@@ -54,22 +54,36 @@ class GoogleMyBusinessReviewsCustomizer(GoogleMyBusiness):
 
     def pull(self):
 
-        gmb_client = GoogleMyBusinessReporting(
-            customizer=self
+        accounts = raw_cache.cached_records(
+            customizer=self,
+            entity_id='accounts',
+            fetch=lambda: self.get_filtered_accounts(gmb_client=self.get_gmb_client())
         )
-        accounts = self.get_filtered_accounts(gmb_client=gmb_client)
+        pulled_dates = []
         for account in accounts:
             # get account name using first key (account human name) to access API Name
             account_name = account['name']
 
             # get all listings
-            listings = gmb_client.get_listings(account=account_name)
-
-            # for each listing, get review data
-            for listing in listings:
+            listings = raw_cache.cached_records(
+                customizer=self,
+                entity_id=f'listings:{account_name}',
+                fetch=lambda: self.get_gmb_client().get_listings(account=account_name)
+            )
+
+            def get_reviews(listing: dict) -> list:
+                return raw_cache.cached_records(
+                    customizer=self,
+                    entity_id=listing['store_code'],
+                    fetch=lambda: self.get_gmb_client().get_reviews(
+                        location=listing)
+                )
+
+            # review data for every listing is requested concurrently and loaded in one transaction per account
+            frames = []
+            listing_ids = []
+            for listing, report in self.fetch_listings(func=get_reviews, listings=listings):
                 listing_id = listing['store_code']
-                report = gmb_client.get_reviews(
-                    location=listing)
 
                 self.set_customizer_secrets_dat()
 
@@ -93,11 +107,17 @@ class GoogleMyBusinessReviewsCustomizer(GoogleMyBusiness):
                              'data_source',
                              'property']]
 
-                    start_date, end_date = self.__calculate_date_range(df=df)
-                    self.set_attribute('start_date', start_date)
-                    self.set_attribute('end_date', end_date)
-
-                    self.ingest_by_listing_id(listing_id=listing_id, df=df, start_date=start_date, end_date=end_date)
+                    frames.append(df)
+                    listing_ids.append(listing_id)
                 else:
                     print('INFO: No data returned for ' + str(listing))
 
+            if frames:
+                # every listing returns all of its reviews, so the account's range covers each listing's range
+                start_date, end_date = self.__calculate_date_range(df=pd.concat(frames))
+                self.ingest_by_listing_ids(listing_ids=listing_ids, df=frames, start_date=start_date, end_date=end_date)
+                pulled_dates.extend([start_date, end_date])
+
+        if pulled_dates:
+            self.set_attribute('start_date', min(pulled_dates))
+            self.set_attribute('end_date', max(pulled_dates))
@@ -2,7 +2,9 @@ import pandas as pd
 import sqlalchemy
 import datetime
 
+from utils import instrumentation, raw_cache
 from utils.dbms_helpers import postgres_helpers
+from utils.concurrency import fetch_concurrently
 from utils.cls.core import Customizer, get_configured_item_by_key
 
 # LMPY PACKAGES
@@ -28,6 +30,9 @@ class GoogleAds(Customizer):
 
     post_processing_sql_list = []
 
+    # customer reports in flight at the same time, spread across every manager account
+    max_workers = 8
+
     def __get_post_processing_sql_list(self) -> list:
         """
         If you wish to execute post-processing on the SOURCE table, enter sql commands in the list
@@ -59,33 +64,83 @@ class GoogleAds(Customizer):
         self.set_attribute('table_schema', TABLE_SCHEMA)
         self.set_attribute('date_col', DATE_COL)
 
-    def ingest_by_account_id(self, df: pd.DataFrame, account_id: str, start_date: str, end_date: str) -> None:
+    def build_manager_clients(self, account_pairs: list) -> dict:
+        """
+        One client per manager account, shared by every customer account under it
+        ====================================================================================================
+        :param account_pairs: as returned by get_account_ids
+        :return: {manager_account_id: GoogleAdsReporting}
+        """
+        manager_account_ids = {pair['manager_account_id'] for pair in account_pairs}
+        if self.replay:
+            return dict.fromkeys(manager_account_ids)
+        return {
+            manager_account_id: self.build_client(manager_customer_id=manager_account_id)
+            for manager_account_id in manager_account_ids
+        }
+
+    def fetch_accounts(self, report: str, account_pairs: list, start_date: str, end_date: str):
+        """
+        Request one report for every customer account concurrently (at most max_workers in flight)
+        and yield (account_id, df) as each completes
+        ====================================================================================================
+        :param report: the GoogleAdsReporting method, e.g. campaign_performance
+        :param account_pairs: as returned by get_account_ids
+        :param start_date:
+        :param end_date:
+        :return:
+        """
+        clients = self.build_manager_clients(account_pairs=account_pairs)
+
+        def fetch_account(pair: dict) -> pd.DataFrame:
+            account_id = pair['account_id']
+            return raw_cache.cached_frame(
+                customizer=self,
+                entity_id=account_id,
+                fetch=lambda: getattr(clients[pair['manager_account_id']], report)(
+                    start_date=start_date,
+                    end_date=end_date,
+                    customer_id=account_id
+                ),
+                start_date=start_date,
+                end_date=end_date
+            )
+
+        results = fetch_concurrently(func=fetch_account, items=account_pairs, max_workers=self.max_workers)
+        for pair, df in results:
+            yield pair['account_id'], df
+
+    def ingest_by_account_ids(self, df, account_ids: list, start_date: str, end_date: str) -> None:
+        """
+        Replace the date range for every given account and load df (a frame or an iterable of frames)
+        in one transaction
+        ====================================================================================================
+        :param df:
+        :param account_ids:
+        :param start_date:
+        :param end_date:
+        :return:
+        """
         table_schema = self.get_attribute('table_schema')
         table = self.get_attribute('table')
         date_col = self.get_attribute('date_col')
 
-        with self.engine.begin() as con:
+        with instrumentation.stage('load', entity=f'accounts={len(account_ids)}'), self.engine.begin() as con:
             con.execute(
                 sqlalchemy.text(
                     f"""
                     DELETE FROM
                     {table_schema}.{table}
                     WHERE {date_col} BETWEEN :start_date AND :end_date
-                    AND account_id = :account_id;
+                    AND account_id = ANY(:account_ids);
                     """
                 ),
                 start_date=start_date,
                 end_date=end_date,
-                account_id=account_id
+                account_ids=list(account_ids)
             )
 
-            df.to_sql(
-                table,
-                con=con,
-                if_exists='append',
-                index=False,
-                index_label=None
-            )
+            self.bulk_load(con=con, df=df)
 
     @staticmethod
     def get_date_range(start_date: datetime.datetime, end_date: datetime.datetime) -> list:
@@ -118,30 +173,6 @@ class GoogleAds(Customizer):
                 dict(result) for result in results
             ] if results else []
 
-    def type(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Type columns for safe storage (respecting data type and if needed, length)
-        :param df:
-        :return: df
-        """
-        for column in self.get_attribute('schema')['columns']:
-            if column['name'] in df.columns:
-                if column['type'] == 'character varying':
-                    assert 'length' in column.keys()
-                    df[column['name']] = df[column['name']].apply(lambda x: str(x)[:column['length']] if x else None)
-                elif column['type'] == 'bigint':
-                    df[column['name']] = df[column['name']].apply(lambda x: int(x) if x else None)
-                elif column['type'] == 'double precision':
-                    df[column['name']] = df[column['name']].apply(lambda x: float(x) if x else None)
-                elif column['type'] == 'date':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'timestamp without time zone':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'datetime with time zone':
-                    # TODO(jschroeder) how better to interpret timezone data?
-                    df[column['name']] = pd.to_datetime(df[column['name']], utc=True)
-        return df
-
     def post_processing(self) -> None:
         """
         Handles custom SQL statements for the SOURCE table due to bad / mismatched data (if any)
@@ -55,16 +55,15 @@ class GoogleAdsCampaignCustomizer(GoogleAds):
 
         account_pairs = self.get_account_ids()
 
-        for pair in account_pairs:
-            manager_account_id = pair['manager_account_id']
-            account_id = pair['account_id']
-            client = self.build_client(manager_customer_id=manager_account_id)
-            df = client.campaign_performance(
+        # every account is fetched concurrently, then replaced and loaded in a single transaction
+        frames = []
+        account_ids = []
+        for account_id, df in self.fetch_accounts(
+                report='campaign_performance',
+                account_pairs=account_pairs,
                 start_date=start_date,
-                end_date=end_date,
-                customer_id=account_id
-            )
-
+                end_date=end_date
+        ):
             if df.shape[0]:
                 df['data_source'] = DATA_SOURCE
                 df['property'] = None
@@ -74,12 +73,16 @@ class GoogleAdsCampaignCustomizer(GoogleAds):
                 rename_map = self.get_rename_map(account_id=account_id)
                 df.rename(columns=rename_map, inplace=True)
 
-                self.ingest_by_account_id(
-                    df=df,
-                    account_id=account_id,
-                    start_date=start_date,
-                    end_date=end_date
-                )
+                frames.append(df)
+                account_ids.append(account_id)
 
             else:
                 print('INFO: No data returned for ' + str(account_id))
+
+        if frames:
+            self.ingest_by_account_ids(
+                df=frames,
+                account_ids=account_ids,
+                start_date=start_date,
+                end_date=end_date
+            )
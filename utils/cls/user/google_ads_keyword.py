@@ -50,16 +50,15 @@ class GoogleAdsKeywordCustomizer(GoogleAds):
 
         account_pairs = self.get_account_ids()
 
-        for pair in account_pairs:
-            manager_account_id = pair['manager_account_id']
-            account_id = pair['account_id']
-            client = self.build_client(manager_customer_id=manager_account_id)
-            df = client.keyword_performance(
+        # every account is fetched concurrently, then replaced and loaded in a single transaction
+        frames = []
+        account_ids = []
+        for account_id, df in self.fetch_accounts(
+                report='keyword_performance',
+                account_pairs=account_pairs,
                 start_date=start_date,
-                end_date=end_date,
-                customer_id=account_id
-            )
-
+                end_date=end_date
+        ):
             if df.shape[0]:
                 df['data_source'] = DATA_SOURCE
                 df['property'] = None
@@ -72,16 +71,20 @@ class GoogleAdsKeywordCustomizer(GoogleAds):
                 df = self.__parse_medium(df=df)
                 df = self.__parse_device(df=df)
 
-                self.ingest_by_account_id(
-                    df=df,
-                    account_id=account_id,
-                    start_date=start_date,
-                    end_date=end_date
-                )
+                frames.append(df)
+                account_ids.append(account_id)
 
             else:
                 print('INFO: No data returned for ' + str(account_id))
 
+        if frames:
+            self.ingest_by_account_ids(
+                df=frames,
+                account_ids=account_ids,
+                start_date=start_date,
+                end_date=end_date
+            )
+
     @staticmethod
     def __parse_medium(df):
         """
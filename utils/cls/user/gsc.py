@@ -5,6 +5,7 @@ import datetime
 import pathlib
 import os
 
+from utils import pipeline, raw_cache
 from utils.dbms_helpers import postgres_helpers
 from utils.cls.core import Customizer, get_configured_item_by_key
 
@@ -65,13 +66,7 @@ class GoogleSearchConsole(Customizer):
                 report_date=datetime.datetime.strftime(report_date, '%Y-%m-%d'),
                 property_url=property_url
             )
-            df.to_sql(
-                table,
-                con=con,
-                if_exists='append',
-                index=False,
-                index_label=None
-            )
+            self.bulk_load(con=con, df=df)
 
     @staticmethod
     def get_date_range(start_date: datetime.datetime, end_date: datetime.datetime) -> list:
@@ -136,31 +131,6 @@ class GoogleSearchConsole(Customizer):
                 dict(result) for result in results
             ] if results else []
 
-    # noinspection PyMethodMayBeStatic
-    def type(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Type columns for safe storage (respecting data type and if needed, length)
-        ====================================================================================================
-        :param df:
-        :return:
-        """
-        for column in self.get_attribute('schema')['columns']:
-            if column['name'] in df.columns:
-                if column['type'] == 'character varying':
-                    assert 'length' in column.keys()
-                    df[column['name']] = df[column['name']].apply(lambda x: str(x)[:column['length']] if x else None)
-                elif column['type'] == 'bigint':
-                    df[column['name']] = df[column['name']].apply(lambda x: int(x) if x else None)
-                elif column['type'] == 'double precision':
-                    df[column['name']] = df[column['name']].apply(lambda x: float(x) if x else None)
-                elif column['type'] == 'date':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'timestamp without time zone':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'datetime with time zone':
-                    df[column['name']] = pd.to_datetime(df[column['name']], utc=True)
-        return df
-
     def post_processing(self) -> None:
         """
         Handles custom SQL statements for the SOURCE table due to bad / mismatched data (if any)
@@ -184,7 +154,7 @@ class GoogleSearchConsole(Customizer):
         # initialize the client module for connecting to GSC
 
         if report_date:
-            gsc_client = SearchAnalyticsClient()
+            gsc_client = SearchAnalyticsClient() if not self.replay else None
 
             # get all property_urls that are configured
             property_urls = self.get_property_urls()
@@ -195,19 +165,30 @@ class GoogleSearchConsole(Customizer):
                 property_url = property_url['property_url']
                 rename_map = self.__get_rename_map(property_url=property_url)
 
-                df = gsc_client.get_monthly_search_analytics(
-                    report_date=report_date,
-                    property_url=property_url
+                df = raw_cache.cached_frame(
+                    customizer=self,
+                    entity_id=property_url,
+                    fetch=lambda: gsc_client.get_monthly_search_analytics(
+                        report_date=report_date,
+                        property_url=property_url
+                    ),
+                    start_date=report_date
                 )
 
                 if df.shape[0]:
-                    df.rename(columns=rename_map, inplace=True)
-                    df = self.type(df=df)
-                    df['property_url'] = property_url
-                    df['data_source'] = self.get_attribute('data_source')
-                    df['property'] = None
-                    df['community'] = None
-                    self.ingest_by_property_url(property_url=property_url, df=df, report_date=report_date)
+                    # renamed, typed and loaded a chunk at a time inside the ingest transaction
+                    chunks = pipeline.pipe(
+                        pipeline.iter_chunks(df=df),
+                        pipeline.rename(columns=rename_map),
+                        self.type,
+                        pipeline.assign(
+                            property_url=property_url,
+                            data_source=self.get_attribute('data_source'),
+                            property=None,
+                            community=None
+                        )
+                    )
+                    self.ingest_by_property_url(property_url=property_url, df=chunks, report_date=report_date)
 
                 else:
                     print(f'WARN: No data returned for {report_date} for property_url {property_url}.')
@@ -1,11 +1,11 @@
 import pandas as pd
 import sqlalchemy
-import datetime
 
 from utils import grc
 from utils.dbms_helpers import postgres_helpers
 from utils.gs_manager import GoogleSheetsManager
 from utils.cls.core import Customizer, get_configured_item_by_key
+from utils.transforms import spread_over_dates
 
 TABLE_SCHEMA = 'public'
 DATE_COL = 'report_date'
@@ -38,10 +38,8 @@ class Inquiry(Customizer):
         self.set_attribute('date_col', DATE_COL)
 
     @staticmethod
-    def create_gs_object():
-        gs = grc.get_customizer_secrets(GoogleSheetsManager(), include_dat=False)
-
-        return gs
+    def create_gs_object() -> GoogleSheetsManager:
+        return grc.get_sheets_manager()
 
     def ingest_all(self, df: pd.DataFrame) -> None:
         table_schema = self.get_attribute('table_schema')
@@ -57,72 +55,30 @@ class Inquiry(Customizer):
                 ),
             )
 
-            df.to_sql(
-                table,
-                con=con,
-                if_exists='append',
-                index=False,
-                index_label=None
-            )
+            self.bulk_load(con=con, df=df)
 
     @staticmethod
     def calculate_inquiry_web_goals(raw_web_goals):
-        data = []
-        for row in raw_web_goals.iterrows():
-            start_date = datetime.datetime.strptime(row[1]['Date Start'], '%Y-%m-%d')
-            end_date = datetime.datetime.strptime(row[1]['Date End'], '%Y-%m-%d')
-            mapped_property = row[1]['Property']
-            mapped_community = row[1]['Community']
-            ownership_group = row[1]['Ownership Group']
-            region = row[1]['Region']
-            inquiry_goal = float(row[1]['Inquiry Goal'].replace('$', '').replace(',', ''))
-
-            if end_date is None:
-                end_date = ''
-
-            if end_date == '':
-                end_date = datetime.date.today()
-
-            # historical, iterate over a range of dates
-            for iter_date in pd.date_range(start_date, end_date):
-                start = datetime.date(start_date.year, start_date.month, start_date.day)
-                end = datetime.date(end_date.year, end_date.month, end_date.day)
-                max_days = (end - start).days
-
-                daily_cost = (inquiry_goal / max_days)
-                data.append({
-                    'Date': iter_date,
-                    'Property': mapped_property,
-                    'Community': mapped_community,
-                    'Ownership_Group': ownership_group,
-                    'Region': region,
-                    'Daily_Cost': daily_cost
-                })
-        return pd.DataFrame(data)
-
-    def type(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Type columns for safe storage (respecting data type and if needed, length)
-        :param df:
-        :return: df
-        """
-        for column in self.get_attribute('schema')['columns']:
-            if column['name'] in df.columns:
-                if column['type'] == 'character varying':
-                    assert 'length' in column.keys()
-                    df[column['name']] = df[column['name']].apply(lambda x: str(x)[:column['length']] if x else None)
-                elif column['type'] == 'bigint':
-                    df[column['name']] = df[column['name']].apply(lambda x: int(x) if x else None)
-                elif column['type'] == 'double precision':
-                    df[column['name']] = df[column['name']].apply(lambda x: float(x) if x else None)
-                elif column['type'] == 'date':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'timestamp without time zone':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'datetime with time zone':
-                    # TODO(jschroeder) how better to interpret timezone data?
-                    df[column['name']] = pd.to_datetime(df[column['name']], utc=True)
-        return df
+        if raw_web_goals.empty:
+            return pd.DataFrame()
+        raw_web_goals = raw_web_goals.assign(**{
+            'Date Start': pd.to_datetime(raw_web_goals['Date Start'], format='%Y-%m-%d'),
+            'Date End': pd.to_datetime(raw_web_goals['Date End'], format='%Y-%m-%d')
+        })
+        # the goal covers the whole range, split over the number of days after the start date
+        return spread_over_dates(
+            df=raw_web_goals,
+            start_col='Date Start',
+            end_col='Date End',
+            amount_col='Inquiry Goal',
+            columns={
+                'Property': 'Property',
+                'Community': 'Community',
+                'Ownership Group': 'Ownership_Group',
+                'Region': 'Region'
+            },
+            per='range'
+        )
 
     def post_processing(self) -> None:
         """
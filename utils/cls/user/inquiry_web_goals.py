@@ -6,6 +6,7 @@ Inquiry Web Goals Customizer Module
 from utils.cls.user.inquiry import Inquiry
 
 # CUSTOM IMPORTS
+IS_CLASS = True
 HISTORICAL = False
 HISTORICAL_START_DATE = '2020-01-01'
 HISTORICAL_END_DATE = '2020-07-01'
@@ -47,7 +48,7 @@ class InquiryWebGoals(Inquiry):
         self.set_attribute('historical_start_date', HISTORICAL_START_DATE)
         self.set_attribute('historical_end_date', HISTORICAL_END_DATE)
         self.set_attribute('table', self.prefix)
-        self.set_attribute('class', True)
+        self.set_attribute('class', IS_CLASS)
         self.set_attribute('data_source', DATA_SOURCE)
         self.set_attribute('schema', {'columns': []})
 
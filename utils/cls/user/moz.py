@@ -1,10 +1,18 @@
 import pandas as pd
 import sqlalchemy
 import datetime
+import itertools
+import threading
 
+from conf.static import BACKFILL
+from utils import instrumentation, pipeline, raw_cache
+from utils.checkpoint import Checkpoint
+from utils.concurrency import fetch_concurrently
 from utils.dbms_helpers import postgres_helpers
 from utils.cls.core import Customizer, get_configured_item_by_key
 
+from mozpy.reporting.client.pro.seo_reporting import SEOReporting
+
 TABLE_SCHEMA = 'public'
 DATE_COL = 'report_date'
 
@@ -34,6 +42,18 @@ class Moz(Customizer):
         super().__init__()
         self.set_attribute('table_schema', TABLE_SCHEMA)
         self.set_attribute('date_col', DATE_COL)
+        self.__directory_exclusions = None
+        self.__seo_clients = threading.local()
+
+    def get_seo_client(self) -> SEOReporting:
+        """
+        Each thread builds its own client on first use (so a replay, which never calls the API, builds none)
+        ====================================================================================================
+        :return:
+        """
+        if not hasattr(self.__seo_clients, 'client'):
+            self.__seo_clients.client = SEOReporting()
+        return self.__seo_clients.client
 
     # formatted so method can be utilized by both moz pro and moz local
     def ingest_by_custom_indicator(self, df: pd.DataFrame, id_value: str, report_date=None) -> None:
@@ -69,14 +89,153 @@ class Moz(Customizer):
                     id_value=id_value
                 )
 
-            df.to_sql(
-                table,
-                con=con,
-                if_exists='append',
-                index=False,
-                index_label=None
+            self.bulk_load(con=con, df=df)
+
+    def ingest_by_listing_ids(self, df, listing_ids: list) -> None:
+        """
+        Replace every given Moz Local listing and load df (a frame or an iterable of frames) in one transaction
+        ====================================================================================================
+        :param df:
+        :param listing_ids:
+        :return:
+        """
+        table_schema = self.get_attribute('table_schema')
+        table = self.get_attribute('table')
+
+        with instrumentation.stage('load', entity=f'listings={len(listing_ids)}'), self.engine.begin() as con:
+            con.execute(
+                sqlalchemy.text(
+                    f"""
+                    DELETE FROM
+                    {table_schema}.{table}
+                    WHERE listing_id = ANY(:listing_ids);
+                    """
+                ),
+                listing_ids=[str(listing_id) for listing_id in listing_ids]
             )
 
+            self.bulk_load(con=con, df=df)
+
+    def ingest_by_campaign_report_dates(self, df, campaign_id: str, report_dates: list) -> None:
+        """
+        Replace the given report dates of one Moz Pro campaign and load df (a frame or an iterable of frames)
+        in one transaction, report dates without new data are left as they are
+        ====================================================================================================
+        :param df:
+        :param campaign_id:
+        :param report_dates:
+        :return:
+        """
+        table_schema = self.get_attribute('table_schema')
+        table = self.get_attribute('table')
+        date_col = self.get_attribute('date_col')
+
+        with instrumentation.stage('load', entity=f'campaign_id={campaign_id}'), self.engine.begin() as con:
+            con.execute(
+                sqlalchemy.text(
+                    f"""
+                    DELETE FROM
+                    {table_schema}.{table}
+                    WHERE {date_col} = ANY(:report_dates)
+                    AND campaign_id = :campaign_id;
+                    """
+                ),
+                report_dates=list(report_dates),
+                campaign_id=campaign_id
+            )
+
+            self.bulk_load(con=con, df=df)
+
+    @staticmethod
+    def plan_backfill(campaign_ids: list, date_range) -> list:
+        """
+        The (campaign_id, report_date) grid of a historical backfill, one report date per month,
+        ordered by campaign so each campaign completes as early as possible
+        ====================================================================================================
+        :param campaign_ids: as returned by pull_moz_pro_accounts
+        :param date_range: month ends, as returned by get_date_range
+        :return:
+        """
+        report_dates = sorted({datetime.date(date.year, date.month, 1) for date in date_range})
+        return [
+            (campaign_id['campaign_id'], report_date)
+            for campaign_id in campaign_ids
+            for report_date in report_dates
+        ]
+
+    def backfill_moz_pro(self, report: str, campaign_ids: list, date_range, values: dict) -> None:
+        """
+        Fetch every campaign x month of a historical backfill with a worker pool, one SEOReporting client
+        per worker. Each campaign's months with data are replaced in one transaction as soon as they are all
+        fetched and the campaign is checkpointed, so an interrupted backfill resumes with the campaigns not
+        yet loaded
+        ====================================================================================================
+        :param report: the SEOReporting method, e.g. get_ranking_performance
+        :param campaign_ids: as returned by pull_moz_pro_accounts
+        :param date_range: month ends, as returned by get_date_range
+        :param values: columns assigned to every row
+        :return:
+        """
+        grid = self.plan_backfill(campaign_ids=campaign_ids, date_range=date_range)
+        if not grid:
+            print('INFO: Nothing to backfill')
+            return
+        start_date = min(report_date for _, report_date in grid)
+        end_date = max(report_date for _, report_date in grid)
+        self.set_attribute('start_date', start_date.strftime('%Y-%m-%d'))
+        self.set_attribute('end_date', end_date.strftime('%Y-%m-%d'))
+
+        total_campaigns = len({campaign_id for campaign_id, _ in grid})
+        checkpoint = Checkpoint(name=self.prefix, key=f'{start_date}_{end_date}')
+        pending = [(campaign_id, report_date) for campaign_id, report_date in grid if campaign_id not in checkpoint]
+        if len(checkpoint):
+            print(f'INFO: Resuming backfill, {len(checkpoint)} campaigns already loaded')
+
+        def get_report(item: tuple):
+            campaign_id, report_date = item
+            return raw_cache.cached_frame(
+                customizer=self,
+                entity_id=campaign_id,
+                fetch=lambda: getattr(self.get_seo_client(), report)(
+                    report_date=report_date,
+                    campaign_id=campaign_id),
+                start_date=report_date
+            )
+
+        remaining = {}
+        for campaign_id, _ in pending:
+            remaining[campaign_id] = remaining.get(campaign_id, 0) + 1
+        frames = {campaign_id: [] for campaign_id in remaining}
+
+        results = fetch_concurrently(func=get_report, items=pending, max_workers=BACKFILL['MAX_WORKERS'])
+        for (campaign_id, report_date), df in results:
+            if df.shape[0]:
+                frames[campaign_id].append((report_date, df))
+            else:
+                print(f'INFO: No data returned for {campaign_id} for {report_date}')
+
+            remaining[campaign_id] -= 1
+            if remaining[campaign_id]:
+                continue
+
+            # every month of the campaign is fetched, load them together
+            campaign_frames = frames.pop(campaign_id)
+            if campaign_frames:
+                chunks = itertools.chain.from_iterable(
+                    pipeline.pipe(pipeline.iter_chunks(df=frame), pipeline.assign(**values), self.type)
+                    for _, frame in campaign_frames
+                )
+                # a month that returned nothing keeps whatever was loaded for it before
+                self.ingest_by_campaign_report_dates(
+                    df=chunks,
+                    campaign_id=campaign_id,
+                    report_dates=[report_date for report_date, _ in campaign_frames]
+                )
+            checkpoint.add(campaign_id)
+            print(f'INFO: Backfilled campaign {campaign_id} ({len(checkpoint)} of {total_campaigns})')
+
+        checkpoint.clear()
+
     def get_date_range(self) -> datetime:
         if self.get_attribute('historical'):
             start = datetime.datetime.strptime(self.get_attribute('historical_start_date'), '%Y-%m-%d')
@@ -145,54 +304,29 @@ class Moz(Customizer):
 
             return campaign_ids
 
-    def exclude_moz_directories(self, df):
-        engine = postgres_helpers.build_postgresql_engine(customizer=self)
-        with engine.connect() as con:
-            sql = sqlalchemy.text(
-                """
-                SELECT *
-                FROM public.source_moz_directoryexclusions;
-                """
-            )
-
-            result = con.execute(sql)
-            exclusions_raw = result.fetchall()
-
-            exclusion_list = [exclusion[0] for exclusion in exclusions_raw]
-
-            if exclusion_list:
-                df_cleaned = df.loc[
-                             ~(df['directory'].isin(exclusion_list))
-                             ,
-                             :
+    def get_moz_directory_exclusions(self) -> set:
+        """
+        Directories excluded from Moz Local reports, queried once per run
+        ====================================================================================================
+        :return:
+        """
+        if self.__directory_exclusions is None:
+            with self.engine.connect() as con:
+                sql = sqlalchemy.text(
+                    """
+                    SELECT *
+                    FROM public.source_moz_directoryexclusions;
+                    """
+                )
 
-                             ]
+                result = con.execute(sql)
+                self.__directory_exclusions = {exclusion[0] for exclusion in result.fetchall()}
 
-            return df_cleaned if True else df
+        return self.__directory_exclusions
 
-    def type(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Type columns for safe storage (respecting data type and if needed, length)
-        :param df:
-        :return: df
-        """
-        for column in self.get_attribute('schema')['columns']:
-            if column['name'] in df.columns:
-                if column['type'] == 'character varying':
-                    assert 'length' in column.keys()
-                    df[column['name']] = df[column['name']].apply(lambda x: str(x)[:column['length']] if x else None)
-                elif column['type'] == 'bigint':
-                    df[column['name']] = df[column['name']].apply(lambda x: int(x) if x else None)
-                elif column['type'] == 'double precision':
-                    df[column['name']] = df[column['name']].apply(lambda x: float(x) if x else None)
-                elif column['type'] == 'date':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'timestamp without time zone':
-                    df[column['name']] = pd.to_datetime(df[column['name']])
-                elif column['type'] == 'datetime with time zone':
-                    # TODO(jschroeder) how better to interpret timezone data?
-                    df[column['name']] = pd.to_datetime(df[column['name']], utc=True)
-        return df
+    def exclude_moz_directories(self, df):
+        exclusions = self.get_moz_directory_exclusions()
+        return df.loc[~(df['directory'].isin(exclusions)), :] if exclusions else df
 
     def post_processing(self) -> None:
         """
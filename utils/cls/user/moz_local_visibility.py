@@ -5,6 +5,8 @@ Moz Local Visibility Customizer Module
 import pandas as pd
 
 # PLATFORM IMPORTS
+from utils import raw_cache
+from utils.concurrency import fetch_concurrently
 from utils.cls.user.moz import Moz
 from mozpy.reporting.client.local.llm_reporting import LLMReporting
 
@@ -27,6 +29,9 @@ class MozLocalVisibilityCustomizer(Moz):
         }
     }
 
+    # concurrent visibility report requests in flight
+    max_workers = 4
+
     def __init__(self):
         super().__init__()
         self.set_attribute('class', IS_CLASS)
@@ -42,21 +47,28 @@ class MozLocalVisibilityCustomizer(Moz):
         moz_local_accounts = self.pull_moz_local_accounts()
         moz = LLMReporting(
             account_label_pairs=moz_local_accounts
-        )
+        ) if not self.replay else None
 
-        df_listings = moz.get_listings()
+        df_listings = raw_cache.cached_frame(customizer=self, entity_id='listings', fetch=lambda: moz.get_listings())
 
         # pull report from Linkmedia360 database
         listing_ids = df_listings.loc[:, ['listing_id', 'account_name']].drop_duplicates().to_dict(orient='records')
-        count = 1
-        total = len(listing_ids)
 
-        for listing_id in listing_ids:
-            df = moz.get_visibility_report(
-                listing_id=listing_id['listing_id'],
-                account_name=listing_id['account_name']
+        def get_visibility_report(listing_id: dict) -> pd.DataFrame:
+            return raw_cache.cached_frame(
+                customizer=self,
+                entity_id=listing_id['listing_id'],
+                fetch=lambda: moz.get_visibility_report(
+                    listing_id=listing_id['listing_id'],
+                    account_name=listing_id['account_name']
+                )
             )
 
+        # every listing is requested concurrently, then replaced and loaded in a single transaction
+        frames = []
+        pulled_listing_ids = []
+        results = fetch_concurrently(func=get_visibility_report, items=listing_ids, max_workers=self.max_workers)
+        for listing_id, df in results:
             if df.shape[0]:
                 # add data source
                 df['data_source'] = DATA_SOURCE
@@ -72,17 +84,12 @@ class MozLocalVisibilityCustomizer(Moz):
                 # noinspection PyUnresolvedReferences
                 df['report_date'] = pd.to_datetime(df['report_date']).dt.date
                 df = self.type(df=df)
-                self.ingest_by_custom_indicator(
-                    id_value=str(listing_id['listing_id']),
-                    df=df,
-                )
-
-                print('INFO: Ingest complete.')
+                frames.append(df)
+                pulled_listing_ids.append(listing_id['listing_id'])
 
             else:
                 print('INFO: No data returned for listing id' + str(listing_id))
 
-            print(listing_id, count, total)
-            count += 1
-
-
+        if frames:
+            self.ingest_by_listing_ids(df=frames, listing_ids=pulled_listing_ids)
+            print(f'INFO: Ingest complete for {len(pulled_listing_ids)} of {len(listing_ids)} listings.')
@@ -2,9 +2,8 @@
 Moz Pro SERP Customizer Module
 """
 
-import datetime
-
 # PLATFORM IMPORTS
+from utils import pipeline, raw_cache
 from utils.cls.user.moz import Moz
 from mozpy.reporting.client.pro.seo_reporting import SEOReporting
 
@@ -44,28 +43,13 @@ class MozProSerpCustomizer(Moz):
         moz_pro_accounts = self.pull_moz_pro_accounts()
 
         if HISTORICAL:
-            for campaign_id in moz_pro_accounts:
-                for date in date_range:
-                    report_date = datetime.date(date.year, date.month, 1)
-
-                    # pull report from Linkmedia360 database
-                    print(f'Pulling data for: {report_date}...')
-                    df = SEOReporting().get_serp_performance(
-                        report_date=report_date,
-                        campaign_id=campaign_id['campaign_id'])
-
-                    if df.shape[0]:
-                        df['data_source'] = DATA_SOURCE
-                        df['property'] = None
-                        df = self.type(df=df)
-                        self.ingest_by_custom_indicator(
-                            id_value=campaign_id['campaign_id'],
-                            df=df,
-                            report_date=report_date
-                        )
-
-                    else:
-                        print('INFO: No data returned for ' + str(campaign_id))
+            # the whole campaign x month grid is fetched concurrently and loaded a campaign at a time
+            self.backfill_moz_pro(
+                report='get_serp_performance',
+                campaign_ids=moz_pro_accounts,
+                date_range=date_range,
+                values=dict(data_source=DATA_SOURCE, property=None)
+            )
 
         else:
             self.set_attribute('start_date', date_range.strftime('%Y-%m-%d'))
@@ -73,18 +57,24 @@ class MozProSerpCustomizer(Moz):
 
             for campaign_id in moz_pro_accounts:
                 # pull report from Linkmedia360 database
-                df = SEOReporting().get_serp_performance(
-                    report_date=date_range,
-                    campaign_id=campaign_id['campaign_id'])
+                df = raw_cache.cached_frame(
+                    customizer=self,
+                    entity_id=campaign_id['campaign_id'],
+                    fetch=lambda: SEOReporting().get_serp_performance(
+                        report_date=date_range,
+                        campaign_id=campaign_id['campaign_id']),
+                    start_date=date_range
+                )
 
                 if df.shape[0]:
-                    df['data_source'] = DATA_SOURCE
-                    df['property'] = None
-                    df['community'] = None
-                    df = self.type(df=df)
+                    chunks = pipeline.pipe(
+                        pipeline.iter_chunks(df=df),
+                        pipeline.assign(data_source=DATA_SOURCE, property=None, community=None),
+                        self.type
+                    )
                     self.ingest_by_custom_indicator(
                         id_value=campaign_id['campaign_id'],
-                        df=df,
+                        df=chunks,
                         report_date=date_range
                     )
 
@@ -0,0 +1,141 @@
+"""
+Concurrency Module
+
+Bounded, rate limited fan-out for API pulls, yielding results as they complete
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils import instrumentation
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows bursts of up to capacity requests, refilled at rate tokens per second
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        assert rate > 0, f"Invalid rate {rate} provided"
+        self.rate = float(rate)
+        self.capacity = max(int(capacity), 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Block until a token is available and take it
+        ====================================================================================================
+        :return:
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+# a 403 is only retried when the API reports an exhausted quota
+QUOTA_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded', 'dailyLimitExceeded')
+
+
+def is_retryable_http_error(error: Exception) -> bool:
+    """
+    True for a Google API HttpError worth retrying (429, 5xx or a quota 403), False for e.g. a 400 or 404
+    ====================================================================================================
+    :param error: a googleapiclient HttpError
+    :return:
+    """
+    resp = getattr(error, 'resp', None)
+    try:
+        status = int(getattr(resp, 'status', 0))
+    except (TypeError, ValueError):
+        return False
+    if status == 429 or status >= 500:
+        return True
+    if status == 403:
+        content = getattr(error, 'content', b'') or b''
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', errors='replace')
+        return any(reason in content for reason in QUOTA_REASONS)
+    return False
+
+
+def call_with_retry(func, item, rate_limiter: TokenBucket = None, retries: int = 0,
+                    retry_exceptions: tuple = (), backoff: float = 1.0, retry_if=None):
+    """
+    Call func(item) under the rate limiter, retrying retry_exceptions with exponential backoff
+    ====================================================================================================
+    :param func:
+    :param item:
+    :param rate_limiter:
+    :param retries:
+    :param retry_exceptions:
+    :param backoff: seconds before the first retry, doubled for each retry after
+    :param retry_if: optional predicate, a retry_exceptions error it returns False for is raised at once
+    :return:
+    """
+    attempt = 0
+    while True:
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            return func(item)
+        except retry_exceptions as error:
+            if attempt >= retries or (retry_if is not None and not retry_if(error)):
+                raise
+            wait_seconds = backoff * (2 ** attempt)
+            print(f'WARN: {error.__class__.__name__} for {item}, retrying in {wait_seconds}s')
+            time.sleep(wait_seconds)
+            attempt += 1
+
+
+def fetch_concurrently(func, items: list, max_workers: int = 4, rate_limiter: TokenBucket = None,
+                       retries: int = 0, retry_exceptions: tuple = (), backoff: float = 1.0, retry_if=None):
+    """
+    Run func over items with at most max_workers in flight and yield (item, result) as each completes
+    Any unrecoverable error cancels the outstanding work and is raised to the caller
+    ====================================================================================================
+    :param func:
+    :param items:
+    :param max_workers:
+    :param rate_limiter:
+    :param retries:
+    :param retry_exceptions:
+    :param backoff:
+    :param retry_if:
+    :return:
+    """
+    # counts made by the workers belong to the stages open where the fetch was started
+    stages = instrumentation.current_stages()
+
+    def call_in_stages(*args, **kwargs):
+        with instrumentation.activate(stages):
+            return call_with_retry(*args, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=max(int(max_workers), 1)) as pool:
+        futures = {
+            pool.submit(
+                call_in_stages,
+                func,
+                item,
+                rate_limiter=rate_limiter,
+                retries=retries,
+                retry_exceptions=retry_exceptions,
+                backoff=backoff,
+                retry_if=retry_if
+            ): item
+            for item in items
+        }
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
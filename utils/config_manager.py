@@ -3,11 +3,11 @@ Configuration Manager Module
 """
 import os
 import json
+import random
 import gspread
 import pathlib
 import webbrowser
 from time import sleep
-import gspread_formatting as gsf
 
 from conf.static import SHEETS
 
@@ -40,55 +40,98 @@ class ConfigManager:
         wb_config['config_sheet_name'] = sh.title
         self.write_workbook_config(config=wb_config, workbook_name=self.workbook_name)
 
-        # for each sheet in workbook
+        # every missing lookup / source sheet is added, given its header row and formatted in one request
         worksheets = sh.worksheets()
         sheet_titles = [sheet.title for sheet in worksheets]
-        for sheet in wb_config.get('sheets', []):
-            sleep(15)
-            if sheet['table'].get('type') in ('lookup', 'source'):
-                sheet_name = sheet['sheet']
-                columns = sheet['table']['columns']
-                num_cols = len(columns)
-                num_rows = sheet['table'].get('max_rows') or self.rows_default
-                if sheet['sheet'] not in sheet_titles:
-                    print(f"Now creating {sheet['sheet']}")
-                    ws = sh.add_worksheet(
-                        title=sheet_name,
-                        rows=num_rows,
-                        cols=num_cols
-                    )
-                    idx = 1
-                    for col in columns:
-                        value = col['name']
-                        sleep(15)
-                        ws.update_cell(1, idx, value)
-                        zero_idx = idx - 1
-                        ltr = self._letter_from_idx(idx=zero_idx)
-                        address = f'{ltr.upper()}1'
-                        fmt = gsf.CellFormat(
-                            textFormat=gsf.TextFormat(
-                                bold=True,
-                                foregroundColor=gsf.Color(0, 0, 0),
-                                fontSize=18
-                            )
-                        )
-                        gsf.format_cell_range(
-                            worksheet=ws,
-                            name=address,
-                            cell_format=fmt
-                        )
-                        gsf.set_column_width(ws, ltr, 150)
-                        idx += 1
+        new_sheets = [
+            sheet for sheet in wb_config.get('sheets', [])
+            if sheet['table'].get('type') in ('lookup', 'source') and sheet['sheet'] not in sheet_titles
+        ]
+        if new_sheets:
+            print(f"Now creating {', '.join(sheet['sheet'] for sheet in new_sheets)}")
+            requests = self.build_worksheet_requests(
+                sheets=new_sheets,
+                first_sheet_id=max([sheet.id for sheet in worksheets] + [0]) + 1
+            )
+            self._call_with_backoff(sh.batch_update, {'requests': requests})
         return
 
-    project_root_idx = 1
+    header_format = {
+        'textFormat': {
+            'bold': True,
+            'foregroundColor': {'red': 0, 'green': 0, 'blue': 0},
+            'fontSize': 18
+        }
+    }
 
-    # the ASCII base to start from when converting a number to a letter
-    base_ord = 97
+    column_width = 150
 
-    @staticmethod
-    def _letter_from_idx(idx: int) -> str:
-        return chr(idx + 97)
+    def build_worksheet_requests(self, sheets: list, first_sheet_id: int) -> list:
+        """
+        Spreadsheet batchUpdate requests adding each sheet (with ids from first_sheet_id) and writing its
+        bold header row and column widths
+        ====================================================================================================
+        :param sheets: workbook sheet configurations
+        :param first_sheet_id: must not be used by an existing sheet
+        :return:
+        """
+        requests = []
+        for offset, sheet in enumerate(sheets):
+            sheet_id = first_sheet_id + offset
+            columns = sheet['table']['columns']
+            requests.append({
+                'addSheet': {
+                    'properties': {
+                        'sheetId': sheet_id,
+                        'title': sheet['sheet'],
+                        'gridProperties': {
+                            'rowCount': sheet['table'].get('max_rows') or self.rows_default,
+                            'columnCount': len(columns)
+                        }
+                    }
+                }
+            })
+            requests.append({
+                'updateCells': {
+                    'start': {'sheetId': sheet_id, 'rowIndex': 0, 'columnIndex': 0},
+                    'rows': [{
+                        'values': [
+                            {'userEnteredValue': {'stringValue': col['name']}, 'userEnteredFormat': self.header_format}
+                            for col in columns
+                        ]
+                    }],
+                    'fields': 'userEnteredValue,userEnteredFormat.textFormat'
+                }
+            })
+            requests.append({
+                'updateDimensionProperties': {
+                    'range': {'sheetId': sheet_id, 'dimension': 'COLUMNS', 'startIndex': 0, 'endIndex': len(columns)},
+                    'properties': {'pixelSize': self.column_width},
+                    'fields': 'pixelSize'
+                }
+            })
+        return requests
+
+    # rate limited (429) and transient server errors are retried with exponential backoff
+    retry_status_codes = (429, 500, 503)
+    max_retries = 6
+    backoff_seconds = 2
+
+    def _call_with_backoff(self, func, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except gspread.exceptions.APIError as api_err:
+                status_code = getattr(api_err.response, 'status_code', None)
+                if status_code not in self.retry_status_codes or attempt >= self.max_retries:
+                    raise api_err
+                wait_seconds = self.backoff_seconds * (2 ** attempt) + random.uniform(0, 1)
+                print(f'WARN: Sheets API returned {status_code}, retrying in {wait_seconds:.1f}s')
+                sleep(wait_seconds)
+                attempt += 1
+
+    project_root_idx = 1
 
     def get_project_root(self):
         """
@@ -144,29 +187,22 @@ class ConfigManager:
 
     def _share_workbook_with_whitelist(self, sh: gspread.Spreadsheet) -> None:
         for email in self.whitelist_emails:
-            sh.share(
+            self._call_with_backoff(
+                sh.share,
                 email,
                 perm_type='user',
                 role='writer'
             )
 
     def create_workbook(self, client_name: str, release_version: str, client: gspread.client) -> gspread.Spreadsheet:
-        tries = 3
-        while True:
-            try:
-                sh = client.create(
-                    self._get_spreadsheet_title(client_name=client_name, release_version=release_version)
-                )
-                self._share_workbook_with_whitelist(sh=sh)
-                return sh
-            except gspread.exceptions.APIError as api_err:
-                print(api_err)
-                sleep(tries * 10)
-                tries -= 1
-                if tries == 0:
-                    raise api_err
+        sh = self._call_with_backoff(
+            client.create,
+            self._get_spreadsheet_title(client_name=client_name, release_version=release_version)
+        )
+        self._share_workbook_with_whitelist(sh=sh)
+        return sh
 
     def update_workbook(self, key: str, client: gspread.client) -> gspread.Spreadsheet:
-        sh = client.open_by_key(key=key)
+        sh = self._call_with_backoff(client.open_by_key, key=key)
         self._share_workbook_with_whitelist(sh=sh)
         return sh
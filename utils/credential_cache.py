@@ -0,0 +1,419 @@
+"""
+Credential Cache Module
+
+Caches credential rows from the applications database for the length of a workflow run, so every
+Customizer (and every account it pulls for) does not query the credential tables again, and buffers
+secrets_dat writes so only changed token payloads are written back
+"""
+import os
+import copy
+import time
+import atexit
+import threading
+from multiprocessing.managers import BaseManager, DictProxy
+
+import sqlalchemy
+
+from conf.static import CREDENTIAL_CACHE, SECRETS_DAT
+
+
+class CredentialCache:
+    """
+    Thread-safe TTL cache of credential values by key
+
+    When shared is given (the run's shared entries, see start_shared_cache) the entries are also kept
+    there, in memory, so other processes in the same workflow run can reuse them
+    """
+
+    def __init__(self, ttl: float, shared=None):
+        self.ttl = float(ttl)
+        self.shared = shared
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(key: tuple) -> str:
+        return '|'.join(str(part) for part in key)
+
+    def get_or_load(self, key: tuple, load):
+        """
+        Return a copy of the cached value for key, calling load() and caching its result when missing or expired
+        ====================================================================================================
+        :param key:
+        :param load:
+        :return:
+        """
+        key = self._key(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['expires'] <= time.time():
+                entry = self._read_shared(key=key)
+            if entry is None or entry['expires'] <= time.time():
+                entry = {'value': load(), 'expires': time.time() + self.ttl}
+                self._write_shared(key=key, entry=entry)
+            self._entries[key] = entry
+            # callers may change what they are given (e.g. a refreshed token), keep the cached value intact
+            return copy.deepcopy(entry['value'])
+
+    def set(self, key: tuple, value) -> None:
+        """
+        Replace the cached value for key (e.g. with a refreshed token not written back yet)
+        ====================================================================================================
+        :param key:
+        :param value:
+        :return:
+        """
+        key = self._key(key)
+        with self._lock:
+            entry = {'value': copy.deepcopy(value), 'expires': time.time() + self.ttl}
+            self._entries[key] = entry
+            self._write_shared(key=key, entry=entry)
+
+    def invalidate(self, key: tuple) -> None:
+        key = self._key(key)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._write_shared(key=key, entry=None)
+
+    def _read_shared(self, key: str):
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.get(key)
+        except (OSError, EOFError):
+            # the workflow run finished sharing, treat as a miss
+            return None
+
+    def _write_shared(self, key: str, entry) -> None:
+        if self.shared is None:
+            return
+        try:
+            if entry is None:
+                self.shared.pop(key, None)
+            else:
+                self.shared[key] = entry
+        except (OSError, EOFError):
+            pass
+
+
+# address and key of the shared entries, set by start_shared_cache for every process the run starts
+SHARED_CACHE_ADDRESS_ENV = 'GRC_CREDENTIAL_CACHE_ADDRESS'
+SHARED_CACHE_AUTHKEY_ENV = 'GRC_CREDENTIAL_CACHE_AUTHKEY'
+
+# held by the manager process only
+_shared_entries = {}
+
+
+def _get_shared_entries() -> dict:
+    return _shared_entries
+
+
+class SharedCacheManager(BaseManager):
+    """
+    Serves the run's shared credential entries from memory to the workflow processes, nothing is written to disk
+    """
+
+
+SharedCacheManager.register('get_entries', callable=_get_shared_entries, proxytype=DictProxy)
+
+_shared_manager = None
+
+
+def start_shared_cache() -> None:
+    """
+    Start the in-memory store the scripts of a workflow run share credentials through (CREDENTIAL_CACHE['SHARED']),
+    its address and a random key are passed on to the scripts in the environment
+    ====================================================================================================
+    :return:
+    """
+    global _shared_manager
+    if not CREDENTIAL_CACHE['SHARED'] or _shared_manager is not None:
+        return
+    authkey = os.urandom(32)
+    _shared_manager = SharedCacheManager(authkey=authkey)
+    _shared_manager.start()
+    os.environ[SHARED_CACHE_ADDRESS_ENV] = _shared_manager.address
+    os.environ[SHARED_CACHE_AUTHKEY_ENV] = authkey.hex()
+
+
+def stop_shared_cache() -> None:
+    """
+    Stop the run's shared store (discarding every credential it held), called once the workflow run is finished
+    ====================================================================================================
+    :return:
+    """
+    global _shared_manager
+    os.environ.pop(SHARED_CACHE_ADDRESS_ENV, None)
+    os.environ.pop(SHARED_CACHE_AUTHKEY_ENV, None)
+    if _shared_manager is not None:
+        _shared_manager.shutdown()
+        _shared_manager = None
+
+
+def get_shared_cache_address():
+    if not CREDENTIAL_CACHE['SHARED'] or not os.environ.get(SHARED_CACHE_AUTHKEY_ENV):
+        return None
+    return os.environ.get(SHARED_CACHE_ADDRESS_ENV) or None
+
+
+def connect_shared_cache(address: str):
+    """
+    The run's shared entries, None when they cannot be reached (the cache is then kept per process)
+    ====================================================================================================
+    :param address:
+    :return:
+    """
+    manager = SharedCacheManager(address=address, authkey=bytes.fromhex(os.environ[SHARED_CACHE_AUTHKEY_ENV]))
+    try:
+        manager.connect()
+        return manager.get_entries()
+    except (OSError, EOFError) as error:
+        print(f'WARN: Unable to reach the shared credential cache ({error.__class__.__name__}), caching per process')
+        return None
+
+
+_credential_cache = None
+_credential_cache_address = None
+_credential_cache_lock = threading.Lock()
+
+
+def get_credential_cache() -> CredentialCache:
+    """
+    The process wide credential cache for the current workflow run
+    ====================================================================================================
+    :return:
+    """
+    global _credential_cache, _credential_cache_address
+    with _credential_cache_lock:
+        address = get_shared_cache_address()
+        if _credential_cache is None or _credential_cache_address != address:
+            shared = connect_shared_cache(address=address) if address else None
+            _credential_cache = CredentialCache(ttl=CREDENTIAL_CACHE['TTL'], shared=shared)
+            _credential_cache_address = address
+        return _credential_cache
+
+
+def get_secrets_dat_key(client_name: str, name_value: str) -> tuple:
+    return 'gds_compiler_credentials_dat', client_name, name_value
+
+
+SECRETS_DAT_INDEX = 'gds_compiler_credentials_dat_client_name_value_uindex'
+
+# engines (by url) where gds_compiler_credentials_dat has the unique index ON CONFLICT needs
+_upsert_support = {}
+_upsert_support_lock = threading.Lock()
+
+
+def create_secrets_dat_unique_index(engine) -> None:
+    """
+    Add the unique (client_name, name_value) index letting secrets_dat writes use ON CONFLICT
+    Run once per applications database by sys_index_credentials_dat.py, never as part of a write
+    ====================================================================================================
+    :param engine: applications database engine
+    :return:
+    """
+    with engine.connect() as con:
+        con.execute(
+            sqlalchemy.text(
+                f"""
+                CREATE UNIQUE INDEX IF NOT EXISTS {SECRETS_DAT_INDEX}
+                ON public.gds_compiler_credentials_dat (client_name, name_value);
+                """
+            )
+        )
+    with _upsert_support_lock:
+        _upsert_support.pop(str(engine.url), None)
+
+
+def _supports_secrets_dat_upsert(engine) -> bool:
+    """
+    True when gds_compiler_credentials_dat already has a unique index on (client_name, name_value),
+    checked once per engine
+    ====================================================================================================
+    :param engine:
+    :return:
+    """
+    key = str(engine.url)
+    with _upsert_support_lock:
+        if key not in _upsert_support:
+            with engine.connect() as con:
+                result = con.execute(
+                    sqlalchemy.text(
+                        """
+                        SELECT EXISTS (
+                            SELECT 1
+                            FROM pg_catalog.pg_indexes
+                            WHERE schemaname = 'public'
+                            AND tablename = 'gds_compiler_credentials_dat'
+                            AND indexdef LIKE 'CREATE UNIQUE INDEX %'
+                            AND (
+                                indexdef LIKE '%(client_name, name_value)'
+                                OR indexdef LIKE '%(name_value, client_name)'
+                            )
+                        );
+                        """
+                    )
+                ).scalar()
+            _upsert_support[key] = bool(result)
+        return _upsert_support[key]
+
+
+def write_secrets_dat(engine, client_name: str, name_value: str, content_value: str) -> None:
+    """
+    Insert or update one secrets_dat row, in a single statement where the table allows it
+    ====================================================================================================
+    :param engine: applications database engine
+    :param client_name:
+    :param name_value:
+    :param content_value:
+    :return:
+    """
+    if _supports_secrets_dat_upsert(engine=engine):
+        with engine.connect() as con:
+            con.execute(
+                sqlalchemy.text(
+                    """
+                    INSERT INTO public.gds_compiler_credentials_dat
+                    (
+                        client_name,
+                        name_value,
+                        content_value
+                    )
+                    VALUES
+                    (
+                        :client_name,
+                        :name_value,
+                        :content_value
+                    )
+                    ON CONFLICT (client_name, name_value)
+                    DO UPDATE SET content_value = EXCLUDED.content_value;
+                    """
+                ),
+                client_name=client_name,
+                name_value=name_value,
+                content_value=content_value
+            )
+        return
+
+    with engine.begin() as con:
+        count_result = con.execute(
+            sqlalchemy.text(
+                """
+                SELECT COUNT(*) as count_value
+                FROM public.gds_compiler_credentials_dat
+                WHERE client_name = :client_name
+                AND name_value = :name_value;
+                """
+            ),
+            client_name=client_name,
+            name_value=name_value
+        ).first()
+        if count_result['count_value'] == 0:
+            statement = """
+                INSERT INTO public.gds_compiler_credentials_dat
+                (
+                    client_name,
+                    name_value,
+                    content_value
+                )
+                VALUES
+                (
+                    :client_name,
+                    :name_value,
+                    :content_value
+                );
+                """
+        else:
+            statement = """
+                UPDATE public.gds_compiler_credentials_dat
+                SET content_value = :content_value
+                WHERE client_name = :client_name
+                AND name_value = :name_value;
+                """
+        con.execute(
+            sqlalchemy.text(statement),
+            client_name=client_name,
+            name_value=name_value,
+            content_value=content_value
+        )
+
+
+class SecretsDatWriter:
+    """
+    Write-back buffer for secrets_dat payloads
+
+    A payload equal to the last one read or written is ignored. A changed payload (a refreshed token) is
+    written straight away unless the same row was written less than flush_interval seconds ago, then it
+    is held (only the newest payload is kept) until the next write after the interval or flush()
+
+    Every payload written or held also replaces the credential cache entry, so a Customizer loading the
+    credentials afterwards starts from the newest token rather than the one last written
+    """
+
+    def __init__(self, flush_interval: float = 0, write=write_secrets_dat):
+        self.flush_interval = float(flush_interval)
+        self._write = write
+        self._persisted = {}
+        self._pending = {}
+        self._written_at = {}
+        self._lock = threading.Lock()
+
+    def record_loaded(self, client_name: str, name_value: str, content_value) -> None:
+        with self._lock:
+            self._persisted.setdefault((client_name, name_value), content_value)
+
+    def write(self, engine, client_name: str, name_value: str, content_value: str) -> bool:
+        """
+        Buffer content_value for the row and write it if it is due, returns True when written
+        ====================================================================================================
+        :param engine:
+        :param client_name:
+        :param name_value:
+        :param content_value:
+        :return:
+        """
+        key = (client_name, name_value)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and pending[1] == content_value:
+                return False
+            if self._persisted.get(key) == content_value:
+                # an older payload seen again (e.g. from a Customizer loaded before the refresh) never
+                # replaces a newer held one
+                return False
+            self._pending[key] = (engine, content_value)
+            if time.monotonic() - self._written_at.get(key, float('-inf')) < self.flush_interval:
+                get_credential_cache().set(key=get_secrets_dat_key(*key), value=content_value)
+                return False
+            return self._flush_key(key=key)
+
+    def flush(self) -> int:
+        """
+        Write every held payload, returns the number of rows written
+        ====================================================================================================
+        :return:
+        """
+        with self._lock:
+            return sum(self._flush_key(key=key) for key in list(self._pending.keys()))
+
+    def _flush_key(self, key: tuple) -> bool:
+        engine, content_value = self._pending.pop(key)
+        self._write(engine, key[0], key[1], content_value)
+        self._persisted[key] = content_value
+        self._written_at[key] = time.monotonic()
+        get_credential_cache().set(key=get_secrets_dat_key(*key), value=content_value)
+        return True
+
+
+_secrets_dat_writer = None
+_secrets_dat_writer_lock = threading.Lock()
+
+
+def get_secrets_dat_writer() -> SecretsDatWriter:
+    global _secrets_dat_writer
+    with _secrets_dat_writer_lock:
+        if _secrets_dat_writer is None:
+            _secrets_dat_writer = SecretsDatWriter(flush_interval=SECRETS_DAT['FLUSH_INTERVAL'])
+            # held tokens are still written if a script exits without flushing
+            atexit.register(_secrets_dat_writer.flush)
+        return _secrets_dat_writer
@@ -4,7 +4,8 @@ Custom
 This script is where all reporting configuration takes place
 """
 import os
-import inspect
+import re
+import ast
 from .stdlib import module_from_file
 from utils.cls.core import Customizer
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -14,33 +15,80 @@ USER_DEFINED_CLASS_PATH = os.path.join(BASE_DIR, 'cls', 'user')
 # NO EDITING BEYOND THIS POINT
 # ````````````````````````````````````````````````````````````````````````````````````````````````````
 # GRC UTILITY FUNCTIONS
-def get_customizers() -> list:
+# script name -> (file path, class name), built once per process by get_customizer_registry
+_customizer_registry = None
+
+
+def _get_class_prefix(class_name: str) -> str:
+    # mirrors Customizer.get_class_prefix without needing an instance
+    cls_name = class_name.replace('Customizer', '')
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', cls_name).lower()
+
+
+def _get_module_flag(tree: ast.Module, file_path: str):
     """
-    Return all custom.py Class objects in [(name, <class>)] format
+    Value of the module level IS_CLASS declaration every customizer module makes, None when the module
+    declares none (e.g. a shared base class module such as ga.py)
+    :param tree:
+    :param file_path:
     :return:
     """
-    cls_members = []
-    for script in os.listdir(USER_DEFINED_CLASS_PATH):
-        if script not in ('__pycache__', 'tests'):
-            mdle = module_from_file(script.replace('.py', ''), os.path.join(USER_DEFINED_CLASS_PATH, script))
-            cls_members.extend(inspect.getmembers(mdle, inspect.isclass))
-    return cls_members  # as list
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == 'IS_CLASS' for target in node.targets):
+            assert isinstance(node.value, ast.Constant) and isinstance(node.value.value, bool), \
+                f"IS_CLASS must be declared as True or False in {file_path}"
+            return node.value.value
+    return None
+
+
+def get_customizer_registry() -> dict:
+    """
+    Map each script name to the file and class of its Customizer by reading the user class sources,
+    so nothing is imported or initialized until the one needed is requested
+
+    A module is registered by its IS_CLASS = True declaration and must define exactly one class
+    :return:
+    """
+    global _customizer_registry
+    if _customizer_registry is None:
+        registry = {}
+        for script in sorted(os.listdir(USER_DEFINED_CLASS_PATH)):
+            if not script.endswith('.py'):
+                continue
+            file_path = os.path.join(USER_DEFINED_CLASS_PATH, script)
+            with open(file_path, 'r', encoding='utf-8') as file:
+                tree = ast.parse(file.read(), filename=file_path)
+            if not _get_module_flag(tree=tree, file_path=file_path):
+                continue
+            class_names = [node.name for node in tree.body if isinstance(node, ast.ClassDef)]
+            assert len(class_names) == 1, \
+                f"{file_path} declares IS_CLASS and must define exactly one class, found {len(class_names)}"
+            prefix = _get_class_prefix(class_names[0])
+            assert prefix not in registry, f"{prefix} is defined by more than one module, including {file_path}"
+            registry[prefix] = (file_path, class_names[0])
+        _customizer_registry = registry
+    return _customizer_registry
 
 
 def get_customizer(calling_file: str) -> Customizer:
     """
-    Loop through and initialize each class in custom.py
     Return the proper Customizer instance that will have the necessary attributes, methods and schema
     for the calling file
+
+    Only the module registered for the calling file is imported and only its class is initialized
     :param calling_file:
     :return:
     """
-    cls_members = get_customizers()
-    target_attribute = f'{calling_file}_class'
-    for cls in cls_members:
-        if issubclass(cls[1], Customizer):
-            ini_cls = cls[1]()  # initialize the class
-            if hasattr(ini_cls, target_attribute):
-                if getattr(ini_cls, target_attribute):
-                    return ini_cls
-    raise AssertionError("No configured classes for data source {}".format(calling_file))
+    registry = get_customizer_registry()
+    assert calling_file in registry, \
+        f"No configured classes for data source {calling_file}, " \
+        f"its module in {USER_DEFINED_CLASS_PATH} must declare IS_CLASS = True"
+    file_path, class_name = registry[calling_file]
+    mdle = module_from_file(os.path.basename(file_path).replace('.py', ''), file_path)
+    cls = getattr(mdle, class_name)
+    assert issubclass(cls, Customizer), f"{class_name} in {file_path} is not a Customizer"
+    ini_cls = cls()  # initialize the class
+    assert getattr(ini_cls, f'{calling_file}_class', False), \
+        f"{class_name} in {file_path} declares IS_CLASS but does not set its 'class' attribute"
+    return ini_cls
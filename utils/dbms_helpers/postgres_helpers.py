@@ -1,19 +1,142 @@
 """
 Platform Helpers File
 """
+import io
+import os
+import re
+import hashlib
+import time
+import threading
+
+import pandas as pd
 import sqlalchemy
+from sqlalchemy.pool import QueuePool
+
+from utils import instrumentation, stdlib
+from utils.refresh_cache import REFRESH_CACHE_TABLE, diff_rows
+from utils.type_coercion import compile_schema
+from conf.static import DB_POOL
+
+# process-wide engine registry keyed by connection parameters
+# the process id is part of the key since pooled connections must never be shared across a fork
+_engine_registry = {}
+_engine_registry_lock = threading.Lock()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool which keeps checkout, wait and reuse statistics for the engine registry
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._statistics_lock = threading.Lock()
+        self.statistics = {
+            'checkouts': 0,
+            'connections_opened': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0
+        }
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            with self._statistics_lock:
+                self.statistics['checkouts'] += 1
+                self.statistics['wait_seconds'] += waited
+                self.statistics['max_wait_seconds'] = max(self.statistics['max_wait_seconds'], waited)
 
-from utils import stdlib
+    def _create_connection(self):
+        with self._statistics_lock:
+            self.statistics['connections_opened'] += 1
+        return super()._create_connection()
 
 
 def build_postgresql_engine(customizer):
-    connection_string = 'postgresql+psycopg2://{username}:{password}@{server}/{database}'.format(
-        username=customizer.db['USERNAME'],
-        password=customizer.db['PASSWORD'],
-        server=customizer.db['SERVER'],
-        database=customizer.db['DATABASE']
+    """
+    Return the shared engine for the customizer's connection parameters, creating it on first use
+    ====================================================================================================
+    :param customizer:
+    :return:
+    """
+    registry_key = (
+        os.getpid(),
+        customizer.db['USERNAME'],
+        customizer.db['PASSWORD'],
+        customizer.db['SERVER'],
+        customizer.db['DATABASE']
     )
-    return sqlalchemy.create_engine(connection_string)
+    with _engine_registry_lock:
+        engine = _engine_registry.get(registry_key)
+        if engine is None:
+            connection_string = 'postgresql+psycopg2://{username}:{password}@{server}/{database}'.format(
+                username=customizer.db['USERNAME'],
+                password=customizer.db['PASSWORD'],
+                server=customizer.db['SERVER'],
+                database=customizer.db['DATABASE']
+            )
+            engine = sqlalchemy.create_engine(
+                connection_string,
+                poolclass=InstrumentedQueuePool,
+                pool_size=DB_POOL['POOL_SIZE'],
+                max_overflow=DB_POOL['MAX_OVERFLOW'],
+                pool_timeout=DB_POOL['POOL_TIMEOUT'],
+                pool_recycle=DB_POOL['POOL_RECYCLE'],
+                pool_pre_ping=True
+            )
+            _engine_registry[registry_key] = engine
+    return engine
+
+
+def get_postgresql_pool_statistics() -> list:
+    """
+    Checkout, wait and reuse statistics for each engine created by this process
+    ====================================================================================================
+    :return:
+    """
+    statistics = []
+    with _engine_registry_lock:
+        registry = [(key, engine) for key, engine in _engine_registry.items() if key[0] == os.getpid()]
+    for key, engine in registry:
+        pool = engine.pool
+        pool_statistics = dict(getattr(pool, 'statistics', {}))
+        checkouts = pool_statistics.get('checkouts', 0)
+        opened = pool_statistics.get('connections_opened', 0)
+        statistics.append({
+            'server': key[3],
+            'database': key[4],
+            'pool_size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checkouts': checkouts,
+            'connections_opened': opened,
+            'reused_checkouts': max(checkouts - opened, 0),
+            'wait_seconds': round(pool_statistics.get('wait_seconds', 0.0), 4),
+            'max_wait_seconds': round(pool_statistics.get('max_wait_seconds', 0.0), 4)
+        })
+    return statistics
+
+
+def print_postgresql_pool_statistics() -> None:
+    for stats in get_postgresql_pool_statistics():
+        print(
+            f"INFO: Pool {stats['database']} - {stats['checkouts']} checkouts, "
+            f"{stats['connections_opened']} connections opened, {stats['reused_checkouts']} reused, "
+            f"{stats['wait_seconds']}s waiting (max {stats['max_wait_seconds']}s)"
+        )
+
+
+def dispose_postgresql_engines() -> None:
+    """
+    Close every pooled connection held by this process and empty the registry
+    ====================================================================================================
+    :return:
+    """
+    with _engine_registry_lock:
+        for key in [key for key in _engine_registry.keys() if key[0] == os.getpid()]:
+            _engine_registry.pop(key).dispose()
 
 
 def clear_postgresql_non_golden_data(customizer, date_col, min_date, max_date, table):
@@ -44,33 +167,292 @@ def clear_postgresql_other_table(customizer, sheet):
         con.execute(sql)
 
 
-def insert_postgresql_data(customizer, df, table, if_exists='append', index=False, index_label=None):
+def insert_postgresql_data(customizer, df, table, schema='public'):
     engine = build_postgresql_engine(customizer=customizer)
-    with engine.connect() as con:
-        df.to_sql(
-            table,
+    table_columns = [
+        sheet['table']['columns'] for sheet in customizer.configuration_workbook['sheets']
+        if sheet['table']['name'] == table
+    ]
+    with engine.begin() as con:
+        copy_postgresql_data(
             con=con,
-            if_exists=if_exists,
-            index=index,
-            index_label=index_label
+            df=df,
+            table=table,
+            schema=schema,
+            columns=table_columns[0] if table_columns else None
         )
 
 
-def insert_postgresql_other_data(customizer, df, sheet, if_exists='append', index=False, index_label=None):
+def insert_postgresql_other_data(customizer, df, sheet):
     engine = build_postgresql_engine(customizer=customizer)
 
-    with engine.connect() as con:
-        df.to_sql(
-            sheet['table']['name'],
+    with engine.begin() as con:
+        copy_postgresql_data(
             con=con,
-            if_exists=if_exists,
-            index=index,
-            index_label=index_label
+            df=df,
+            table=sheet['table']['name'],
+            schema=sheet['table'].get('schema', 'public'),
+            columns=sheet['table']['columns']
         )
 
     return 0
 
 
+def create_postgresql_refresh_cache_table(customizer) -> None:
+    engine = build_postgresql_engine(customizer=customizer)
+    sql = sqlalchemy.text(
+        f"""
+        CREATE TABLE IF NOT EXISTS public.{REFRESH_CACHE_TABLE} (
+            table_name character varying(150) PRIMARY KEY,
+            content_hash character varying(64) NOT NULL,
+            table_hash character varying(64),
+            run_id character varying(64),
+            refreshed_at timestamp without time zone NOT NULL,
+            checked_at timestamp without time zone NOT NULL
+        );
+        ALTER TABLE public.{REFRESH_CACHE_TABLE} ADD COLUMN IF NOT EXISTS table_hash character varying(64);
+        """
+    )
+    with engine.connect() as con:
+        con.execute(sql)
+
+
+def get_postgresql_refresh_cache(customizer) -> dict:
+    engine = build_postgresql_engine(customizer=customizer)
+    sql = sqlalchemy.text(
+        f"""
+        SELECT table_name, content_hash, table_hash, run_id, refreshed_at, checked_at
+        FROM public.{REFRESH_CACHE_TABLE};
+        """
+    )
+    with engine.connect() as con:
+        results = con.execute(sql).fetchall()
+    return {row['table_name']: dict(row) for row in results}
+
+
+def get_postgresql_table_hash(con, table, schema='public') -> str:
+    """
+    MD5 of a table's rows in sorted order, so the refresh cache can tell when a table no longer holds what
+    the last refresh left in it (e.g. it was recreated empty, truncated or edited by hand)
+    ====================================================================================================
+    :param con:
+    :param table:
+    :param schema:
+    :return:
+    """
+    sql = sqlalchemy.text(
+        f"""
+        SELECT MD5(COALESCE(STRING_AGG(CAST(TARGET AS text), E'\\n' ORDER BY CAST(TARGET AS text)), ''))
+        FROM {schema}.{table} TARGET;
+        """
+    )
+    return con.execute(sql).scalar()
+
+
+def set_postgresql_refresh_cache(con, table, content_hash, table_hash, run_id, refreshed) -> None:
+    """
+    Record the content hash checked for a table and the hash of the table it was checked against,
+    refreshed_at only moves when the table was rewritten
+    ====================================================================================================
+    :param con:
+    :param table:
+    :param content_hash:
+    :param table_hash:
+    :param run_id:
+    :param refreshed:
+    :return:
+    """
+    sql = sqlalchemy.text(
+        f"""
+        INSERT INTO public.{REFRESH_CACHE_TABLE} (table_name, content_hash, table_hash, run_id, refreshed_at, checked_at)
+        VALUES (:table_name, :content_hash, :table_hash, :run_id, NOW(), NOW())
+        ON CONFLICT (table_name) DO UPDATE SET
+            content_hash = EXCLUDED.content_hash,
+            table_hash = EXCLUDED.table_hash,
+            run_id = EXCLUDED.run_id,
+            refreshed_at = CASE WHEN :refreshed
+                THEN EXCLUDED.refreshed_at
+                ELSE {REFRESH_CACHE_TABLE}.refreshed_at
+            END,
+            checked_at = EXCLUDED.checked_at;
+        """
+    )
+    con.execute(
+        sql, table_name=table, content_hash=content_hash, table_hash=table_hash, run_id=run_id, refreshed=refreshed
+    )
+
+
+def check_postgresql_refresh_cache(customizer, sheet, cached, content_hash, run_id) -> bool:
+    """
+    True when the sheet hashes as it did at the last refresh and the table still holds what that refresh
+    left in it, the check is then recorded against the run. False when the table needs refreshing
+    ====================================================================================================
+    :param customizer:
+    :param sheet:
+    :param cached: the table's refresh cache row, None when it was never refreshed
+    :param content_hash: hash of the sheet, as returned by refresh_cache.hash_frame
+    :param run_id:
+    :return:
+    """
+    if not cached or cached['content_hash'] != content_hash:
+        return False
+    engine = build_postgresql_engine(customizer=customizer)
+    table = sheet['table']['name']
+    schema = sheet['table'].get('schema', 'public')
+    with engine.begin() as con:
+        table_hash = get_postgresql_table_hash(con=con, table=table, schema=schema)
+        if table_hash != cached.get('table_hash'):
+            return False
+        set_postgresql_refresh_cache(
+            con=con, table=table, content_hash=content_hash, table_hash=table_hash, run_id=run_id, refreshed=False
+        )
+    return True
+
+
+def apply_postgresql_other_table_diff(customizer, df, sheet, content_hash=None, run_id=None) -> tuple:
+    """
+    Bring a lookup / source table in line with df by deleting only the stored rows which are no longer
+    present and copying in only the new rows, in one transaction
+
+    When content_hash is given, the refresh cache row is written in the same transaction, so the table
+    and its cached hashes are committed together
+
+    Returns the number of rows deleted and inserted
+    ====================================================================================================
+    :param customizer:
+    :param df:
+    :param sheet:
+    :param content_hash: hash of df, as returned by refresh_cache.hash_frame
+    :param run_id:
+    :return:
+    """
+    engine = build_postgresql_engine(customizer=customizer)
+    table = sheet['table']['name']
+    schema = sheet['table'].get('schema', 'public')
+    columns = sheet['table']['columns']
+    column_names = [column['name'] for column in columns]
+
+    with engine.begin() as con:
+        existing = pd.read_sql(
+            sqlalchemy.text(f"SELECT CAST(ctid AS text) AS row_ctid, * FROM {schema}.{table};"),
+            con
+        )
+        # stored values go through the same casts as the sheet so both sides compare alike
+        existing = compile_schema(columns=columns, bigint_domain=(0, 1))(existing)
+        delete_ctids, insert_df = diff_rows(existing=existing, df=df, columns=column_names, key='row_ctid')
+        if delete_ctids:
+            con.execute(
+                sqlalchemy.text(
+                    f"""
+                    DELETE
+                    FROM {schema}.{table}
+                    WHERE ctid = ANY(CAST(:ctids AS tid[]));
+                    """
+                ),
+                ctids=delete_ctids
+            )
+        copy_postgresql_data(con=con, df=insert_df, table=table, schema=schema, columns=columns)
+        if content_hash is not None:
+            set_postgresql_refresh_cache(
+                con=con,
+                table=table,
+                content_hash=content_hash,
+                table_hash=get_postgresql_table_hash(con=con, table=table, schema=schema),
+                run_id=run_id,
+                refreshed=True
+            )
+
+    return len(delete_ctids), insert_df.shape[0]
+
+
+RUN_METRICS_TABLE = 'grc_run_metrics'
+
+
+def insert_postgresql_run_metrics(customizer, records: list) -> None:
+    engine = build_postgresql_engine(customizer=customizer)
+    with engine.begin() as con:
+        con.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS public.{RUN_METRICS_TABLE} (
+                run_id character varying(64),
+                script_name character varying(150),
+                stage character varying(150),
+                entity character varying(250),
+                started_at timestamp without time zone,
+                wall_seconds double precision,
+                rows bigint,
+                bytes bigint,
+                api_calls bigint,
+                status character varying(25)
+            );
+            """
+        )
+        copy_postgresql_data(con=con, df=pd.DataFrame(records), table=RUN_METRICS_TABLE)
+
+
+# written for missing values so empty strings still load as empty strings
+COPY_NULL_MARKER = '\\N'
+
+
+def copy_postgresql_data(con, df, table, schema='public', columns=None) -> int:
+    """
+    Stream a DataFrame into a table with COPY ... FROM STDIN on the given connection, so the load
+    shares the transaction of whatever ran before it on that connection (e.g. the rolling DELETE)
+
+    Columns follow the workbook schema order when columns (workbook column dictionaries) are given
+    Returns the number of rows loaded
+    ====================================================================================================
+    :param con: sqlalchemy Connection
+    :param df:
+    :param table:
+    :param schema:
+    :param columns:
+    :return:
+    """
+    if not df.shape[0]:
+        return 0
+    frame = _prepare_postgresql_copy_frame(df=df, columns=columns)
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False, na_rep=COPY_NULL_MARKER)
+    buffer.seek(0)
+    # identifiers are quoted as to_sql quoted them, so reserved words, capitals and spaces load as named
+    quote = con.dialect.identifier_preparer.quote
+    column_list = ', '.join(quote(str(name)) for name in frame.columns)
+    statement = (
+        f"COPY {quote(schema)}.{quote(table)} ({column_list}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL_MARKER}')"
+    )
+    cursor = con.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+    instrumentation.record(rows=frame.shape[0], byte_count=buffer.tell())
+    return frame.shape[0]
+
+
+def _prepare_postgresql_copy_frame(df, columns=None):
+    """
+    Order columns by the workbook schema and make integral columns render without a decimal point
+    ====================================================================================================
+    :param df:
+    :param columns:
+    :return:
+    """
+    frame = df.loc[:, ~df.columns.duplicated()]
+    if columns:
+        schema_names = [column['name'] for column in columns]
+        ordered = [name for name in schema_names if name in frame.columns]
+        # unknown columns are kept so the database rejects them, as to_sql would have
+        ordered += [name for name in frame.columns if name not in schema_names]
+        frame = frame[ordered]
+        for column in columns:
+            name = column['name']
+            if column['type'] == 'bigint' and name in frame.columns and frame[name].dtype.kind == 'f':
+                frame = frame.assign(**{name: frame[name].round().astype('Int64')})
+    return frame
+
+
 def check_postgresql_table_exists(customizer, table, schema) -> bool:
     engine = build_postgresql_engine(customizer=customizer)
     sql = sqlalchemy.text(
@@ -99,7 +481,8 @@ def create_postgresql_table_from_schema(customizer, schema):
             index_sql = _generate_postgresql_create_index_statement(schema=schema, index=index)
             with engine.connect() as con:
                 con.execute(index_sql)
-            if index['clustered']:
+            # partitioned tables cannot be clustered, their partitions are much smaller to scan anyway
+            if index['clustered'] and not get_postgresql_partitioning(schema=schema):
                 cluster_sql = _generate_postgresql_cluster_statement(schema=schema, index=index)
                 with engine.connect() as con:
                     con.execute(cluster_sql)
@@ -133,10 +516,210 @@ def _generate_postgresql_create_table_statement(schema: dict) -> str:
         if idx == col_len:
             line = line.replace(',', '')
         stmt += line
-    stmt += ");"
+    stmt += ")"
+    stmt += _generate_postgresql_partition_clause(
+        partitioning=get_postgresql_partitioning(schema=schema)
+    )
+    stmt += ";"
     return stmt
 
 
+def get_postgresql_partitioning(schema: dict) -> dict:
+    """
+    The active 'partitioning' settings of a table schema, empty when the table is not partitioned
+        list_column: LIST partitions, one per value (e.g. data_source)
+        range_column: monthly RANGE partitions (e.g. report_date), beneath the list partitions if both are set
+    ====================================================================================================
+    :param schema:
+    :return:
+    """
+    partitioning = schema['table'].get('partitioning') or {}
+    if not partitioning.get('active'):
+        return {}
+    assert partitioning.get('list_column') or partitioning.get('range_column'), \
+        "Partitioning active without a list_column or range_column for table {}".format(schema['table']['name'])
+    return partitioning
+
+
+def _generate_postgresql_partition_clause(partitioning: dict, level: int = 0) -> str:
+    columns = [
+        (strategy, partitioning.get(key)) for strategy, key in (('LIST', 'list_column'), ('RANGE', 'range_column'))
+        if partitioning.get(key)
+    ]
+    if level >= len(columns):
+        return ''
+    strategy, column = columns[level]
+    return f"\nPARTITION BY {strategy} ({column})"
+
+
+def _get_postgresql_partition_name(parent: str, suffix: str) -> str:
+    suffix = re.sub(r'[^a-z0-9]+', '_', str(suffix).lower()).strip('_')
+    name = f"{parent}_{suffix}"
+    # keep within the 63 character identifier limit without two partitions truncating to the same name
+    if len(name) > 63:
+        name = f"{name[:54]}_{hashlib.md5(name.encode('utf-8')).hexdigest()[:8]}"
+    return name
+
+
+def create_postgresql_list_partition(con, schema: dict, value: str) -> str:
+    """
+    Create (if needed) the LIST partition holding value and return its name
+    ====================================================================================================
+    :param con:
+    :param schema:
+    :param value:
+    :return:
+    """
+    partitioning = get_postgresql_partitioning(schema=schema)
+    table_schema = schema['table']['schema']
+    parent = schema['table']['name']
+    partition = _get_postgresql_partition_name(parent=parent, suffix=value)
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table_schema}.{partition}
+        PARTITION OF {table_schema}.{parent}
+        FOR VALUES IN ('{str(value).replace("'", "''")}')
+        {_generate_postgresql_partition_clause(partitioning=partitioning, level=1)};
+        """
+    )
+    return partition
+
+
+def create_postgresql_default_partition(con, schema: dict, parent: str) -> str:
+    """
+    Create (if needed) the DEFAULT partition of parent, holding rows no other partition accepts
+    (e.g. a NULL report_date) so the ingest never fails on them, and return its name
+    ====================================================================================================
+    :param con:
+    :param schema:
+    :param parent: the partitioned table (the master table or one of its list partitions)
+    :return:
+    """
+    table_schema = schema['table']['schema']
+    partition = _get_postgresql_partition_name(parent=parent, suffix='default')
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table_schema}.{partition}
+        PARTITION OF {table_schema}.{parent}
+        DEFAULT;
+        """
+    )
+    return partition
+
+
+def create_postgresql_month_partitions(con, schema: dict, parent: str, start_date, end_date) -> dict:
+    """
+    Create (if needed) a monthly RANGE partition of parent for each month from start_date to end_date
+    Rows of those months held by the DEFAULT partition are moved into their month partition, since a
+    partition cannot be created while the DEFAULT partition holds rows belonging to it
+    Returns the partition names by the first day of their month
+    ====================================================================================================
+    :param con:
+    :param schema:
+    :param parent: the partitioned table (the master table or one of its list partitions)
+    :param start_date:
+    :param end_date:
+    :return:
+    """
+    table_schema = schema['table']['schema']
+    range_column = get_postgresql_partitioning(schema=schema)['range_column']
+    months = pd.period_range(start=start_date, end=end_date, freq='M')
+    default_partition = create_postgresql_default_partition(con=con, schema=schema, parent=parent)
+    moved_table = f"{default_partition}_moved"
+    if len(months):
+        moved_filter = f"""
+            WHERE {range_column} >= '{months[0].start_time.date()}'
+            AND {range_column} < '{(months[-1] + 1).start_time.date()}'"""
+        con.execute(
+            f"""
+            CREATE TEMPORARY TABLE {moved_table} AS
+            SELECT * FROM {table_schema}.{default_partition}{moved_filter};
+            DELETE FROM {table_schema}.{default_partition}{moved_filter};
+            """
+        )
+    partitions = {}
+    for month in months:
+        month_start = month.start_time.date()
+        month_end = (month + 1).start_time.date()
+        partition = _get_postgresql_partition_name(parent=parent, suffix=month.strftime('%Y%m'))
+        con.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table_schema}.{partition}
+            PARTITION OF {table_schema}.{parent}
+            FOR VALUES FROM ('{month_start}') TO ('{month_end}');
+            """
+        )
+        partitions[month_start] = partition
+    if len(months):
+        con.execute(
+            f"""
+            INSERT INTO {table_schema}.{parent}
+            SELECT * FROM {moved_table};
+            DROP TABLE {moved_table};
+            """
+        )
+    return partitions
+
+
+def get_postgresql_covered_partitions(partitions: dict, start_date, end_date) -> list:
+    """
+    The month partitions (by the first day of their month) lying entirely within start_date - end_date,
+    which a reload of that range may truncate instead of deleting from
+    ====================================================================================================
+    :param partitions: as returned by create_postgresql_month_partitions
+    :param start_date:
+    :param end_date: inclusive
+    :return:
+    """
+    return [
+        partition for month_start, partition in partitions.items()
+        if pd.Timestamp(month_start) >= pd.Timestamp(start_date) and
+        pd.Timestamp(month_start) + pd.DateOffset(months=1) <= pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    ]
+
+
+def check_postgresql_table_partitioned(con, table: str, schema: str = 'public') -> bool:
+    """
+    True when the table exists as a partitioned table, the workbook setting alone does not
+    change a table created before partitioning was switched on
+    ====================================================================================================
+    :param con:
+    :param table:
+    :param schema:
+    :return:
+    """
+    result = con.execute(
+        sqlalchemy.text(
+            """
+            SELECT EXISTS (
+                SELECT 1
+                FROM pg_catalog.pg_partitioned_table PT
+                JOIN pg_catalog.pg_class C ON C.oid = PT.partrelid
+                JOIN pg_catalog.pg_namespace N ON N.oid = C.relnamespace
+                WHERE N.nspname = :schema
+                AND C.relname = :table
+            );
+            """
+        ),
+        schema=schema,
+        table=table
+    ).scalar()
+    return bool(result)
+
+
+def truncate_postgresql_tables(con, tables: list, schema='public') -> None:
+    if tables:
+        con.execute(f"TRUNCATE TABLE {', '.join(f'{schema}.{table}' for table in tables)};")
+
+
+def get_postgresql_date_bounds(con, table, date_col, schema='public', start_date=None, end_date=None) -> tuple:
+    sql = f"SELECT MIN({date_col}) AS min_date, MAX({date_col}) AS max_date FROM {schema}.{table}"
+    if start_date is not None and end_date is not None:
+        sql += f" WHERE {date_col} BETWEEN :start_date AND :end_date"
+    result = con.execute(sqlalchemy.text(sql + ';'), start_date=start_date, end_date=end_date).first()
+    return result['min_date'], result['max_date']
+
+
 def _generate_postgresql_create_index_statement(index: dict, schema: dict) -> str:
     assert 'columns' in index.keys(), "'columns' attribute missing from index. {}".format(index)
     assert 'tablespace' in index.keys(), "'tablespace' attribute missing from index. {}".format(index)
@@ -6,15 +6,17 @@ import datetime
 import json
 import os
 import sys
+import threading
 
-import pandas as pd
 import sqlalchemy
 
-from utils import custom, stdlib
+from utils import custom, refresh_cache, stdlib
 from utils.cls.core import Customizer
+from utils.credential_cache import get_credential_cache, get_secrets_dat_key, get_secrets_dat_writer
 from utils.dbms_helpers import postgres_helpers
 from utils.dbms_helpers.postgres_helpers import build_postgresql_engine
 from utils.gs_manager import GoogleSheetsManager
+from utils.type_coercion import compile_schema
 
 APPLICATION_DATABASE = 'applications'
 
@@ -61,6 +63,11 @@ def create_sql_engine(customizer):
         raise ValueError(f"{customizer.__class__.__name__} specifies unsupported 'dbms' {customizer.dbms}")
 
 
+# built once per process, a Customizer is only needed for its connection settings
+_application_engine = None
+_application_engine_lock = threading.Lock()
+
+
 def create_application_sql_engine():
     """
     Use the static APPLICATION_DATABASE to alter existing Customizer setup to support interacting
@@ -68,9 +75,53 @@ def create_application_sql_engine():
     ====================================================================================================
     :return:
     """
-    return create_sql_engine(
-        customizer=Customizer(database=APPLICATION_DATABASE)
-    )
+    global _application_engine
+    with _application_engine_lock:
+        if _application_engine is None:
+            _application_engine = create_sql_engine(
+                customizer=Customizer(database=APPLICATION_DATABASE)
+            )
+    return _application_engine
+
+
+# one authorized sheets manager per process, shared by every lookup / source table refresh
+_sheets_manager = None
+_sheets_manager_lock = threading.Lock()
+
+
+def get_sheets_manager() -> GoogleSheetsManager:
+    global _sheets_manager
+    with _sheets_manager_lock:
+        if _sheets_manager is None:
+            # 2020-07-27: patch by jws to handle dynamic credential retrieval
+            _sheets_manager = get_customizer_secrets(GoogleSheetsManager(), include_dat=False)
+    return _sheets_manager
+
+
+def load_workbook_sheets(customizer, sheets: list) -> dict:
+    """
+    Raw frames for the given workbook sheets, {sheet name: DataFrame}, read in one batch request from
+    the configuration workbook opened by its key
+    ====================================================================================================
+    :param customizer:
+    :param sheets:
+    :return:
+    """
+    names = [sheet['sheet'] for sheet in sheets]
+    if not names:
+        return {}
+    gs = get_sheets_manager()
+    key = customizer.configuration_workbook.get('key')
+    if key:
+        return gs.get_worksheets_by_key(key=key, worksheet_names=names)
+    # workbook.json files generated without a key can only be opened by name, one sheet at a time
+    return {
+        name: gs.get_spreadsheet_by_name(
+            workbook_name=customizer.configuration_workbook['config_sheet_name'],
+            worksheet_name=name
+        )
+        for name in names
+    }
 
 
 def get_customizer_secrets(customizer: Customizer, include_dat: bool = True) -> Customizer:
@@ -87,55 +138,12 @@ def set_customizer_secrets_dat(customizer: Customizer) -> None:
     content_value = getattr(customizer, 'secrets_dat', '')
     assert content_value, f"Invalid content_value {content_value} provided"
     content_value = json.dumps(content_value) if type(content_value) == dict else content_value
-    with create_application_sql_engine().connect() as con:
-        count_result = con.execute(
-            sqlalchemy.text(
-                """
-                SELECT COUNT(*) as count_value
-                FROM public.gds_compiler_credentials_dat
-                WHERE client_name = :client_name
-                AND name_value = :name_value;
-                """
-            ),
-            client_name=client_name,
-            name_value=name_value
-        ).first()
-        if count_result['count_value'] == 0:
-            con.execute(
-                sqlalchemy.text(
-                    """
-                    INSERT INTO public.gds_compiler_credentials_dat
-                    (
-                        client_name,
-                        name_value,
-                        content_value
-                    )
-                    VALUES
-                    (
-                        :client_name, 
-                        :name_value,
-                        :content_value
-                    );
-                    """
-                ),
-                client_name=client_name,
-                name_value=name_value,
-                content_value=content_value
-            )
-        else:
-            con.execute(
-                sqlalchemy.text(
-                    """
-                    UPDATE public.gds_compiler_credentials_dat
-                    SET content_value = :content_value
-                    WHERE client_name = :client_name
-                    AND name_value = :name_value;
-                    """
-                ),
-                client_name=client_name,
-                name_value=name_value,
-                content_value=content_value
-            )
+    get_secrets_dat_writer().write(
+        engine=create_application_sql_engine(),
+        client_name=client_name,
+        name_value=name_value,
+        content_value=content_value
+    )
     return
 
 
@@ -147,6 +155,19 @@ def __get_customizer_secrets_dat(customizer: Customizer) -> Customizer:
     :return:
     """
     name_value = getattr(customizer, 'secrets_name')
+    customizer.secrets_dat = get_credential_cache().get_or_load(
+        key=get_secrets_dat_key(client_name=customizer.client, name_value=name_value),
+        load=lambda: __query_customizer_secrets_dat(client_name=customizer.client, name_value=name_value)
+    )
+    get_secrets_dat_writer().record_loaded(
+        client_name=customizer.client,
+        name_value=name_value,
+        content_value=customizer.secrets_dat
+    )
+    return customizer
+
+
+def __query_customizer_secrets_dat(client_name: str, name_value: str):
     with create_application_sql_engine().connect() as con:
         result = con.execute(
             sqlalchemy.text(
@@ -160,11 +181,10 @@ def __get_customizer_secrets_dat(customizer: Customizer) -> Customizer:
                 AND name_value = :name_value;
                 """
             ),
-            client_name=customizer.client,  # camel-case client name
+            client_name=client_name,  # camel-case client name
             name_value=name_value
         ).first()
-    customizer.secrets_dat = json.dumps(result['content_value']) if result else {}
-    return customizer
+    return json.dumps(result['content_value']) if result else {}
 
 
 def __get_customizer_secrets(customizer: Customizer) -> Customizer:
@@ -175,6 +195,14 @@ def __get_customizer_secrets(customizer: Customizer) -> Customizer:
     :return:
     """
     name_value = getattr(customizer, 'credential_name')
+    customizer.secrets = get_credential_cache().get_or_load(
+        key=('gds_compiler_credentials', name_value),
+        load=lambda: __query_customizer_secrets(name_value=name_value)
+    )
+    return customizer
+
+
+def __query_customizer_secrets(name_value: str):
     with create_application_sql_engine().connect() as con:
         result = con.execute(
             sqlalchemy.text(
@@ -186,8 +214,7 @@ def __get_customizer_secrets(customizer: Customizer) -> Customizer:
             ),
             name_value=name_value
         ).first()
-    customizer.secrets = result['content_value'] if result else {}
-    return customizer
+    return result['content_value'] if result else {}
 
 
 def clear_non_golden_data(customizer, date_col, min_date, max_date, table):
@@ -329,22 +356,8 @@ def reshape_lookup_data(customizer, df, sheet):
         if customizer.columns_to_drop['status']:
             df.drop(columns=customizer.columns_to_drop['columns'], inplace=True)
 
-    for column in sheet['table']['columns']:
-        if column['name'] in df.columns:
-            if column['type'] == 'character varying':
-                assert 'length' in column.keys()
-                df[column['name']] = df[column['name']].apply(lambda x: str(x)[:column['length']] if x else None)
-            elif column['type'] == 'bigint':
-                df[column['name']] = df[column['name']].apply(lambda x: int(x) if x == 0 or x == 1 else None)
-            elif column['type'] == 'double precision':
-                df[column['name']] = df[column['name']].apply(lambda x: float(x) if x else None)
-            elif column['type'] == 'date':
-                df[column['name']] = pd.to_datetime(df[column['name']])
-            elif column['type'] == 'timestamp without time zone':
-                df[column['name']] = pd.to_datetime(df[column['name']])
-            elif column['type'] == 'datetime with time zone':
-                # TODO(jschroeder) how better to interpret timezone data?
-                df[column['name']] = pd.to_datetime(df[column['name']], utc=True)
+    # sheet bigint columns are 0 / 1 flags (e.g. exact), anything else is stored as NULL
+    df = compile_schema(columns=sheet['table']['columns'], bigint_domain=(0, 1))(df)
 
     return df
 
@@ -358,45 +371,52 @@ def reshape_source_table_data(customizer, df, sheet):
         if customizer.columns_to_drop['status']:
             df.drop(columns=customizer.columns_to_drop['columns'], inplace=True)
 
-    for column in sheet['table']['columns']:
-        if column['name'] in df.columns:
-            if column['type'] == 'character varying':
-                assert 'length' in column.keys()
-                df[column['name']] = df[column['name']].apply(lambda x: str(x)[:column['length']] if x else None)
-            elif column['type'] == 'bigint':
-                df[column['name']] = df[column['name']].apply(lambda x: int(x) if x == 0 or x == 1 else None)
-            elif column['type'] == 'double precision':
-                df[column['name']] = df[column['name']].apply(lambda x: float(x) if x else None)
-            elif column['type'] == 'date':
-                df[column['name']] = pd.to_datetime(df[column['name']])
-            elif column['type'] == 'timestamp without time zone':
-                df[column['name']] = pd.to_datetime(df[column['name']])
-            elif column['type'] == 'datetime with time zone':
-                # TODO(jschroeder) how better to interpret timezone data?
-                df[column['name']] = pd.to_datetime(df[column['name']], utc=True)
+    # sheet bigint columns are 0 / 1 flags (e.g. exact), anything else is stored as NULL
+    df = compile_schema(columns=sheet['table']['columns'], bigint_domain=(0, 1))(df)
 
     return df
 
 
 def refresh_lookup_tables(customizer) -> int:
     if customizer.configuration_workbook['lookup_refresh_status'] is False:
+        run_id = refresh_cache.get_run_id()
+        create_refresh_cache_table(customizer=customizer)
+        cache = get_refresh_cache(customizer=customizer)
+        sheets = []
         for sheet in customizer.configuration_workbook['sheets']:
             if sheet['table']['type'] == 'lookup':
                 if sheet['table']['active']:
-                    # 2020-07-27: patch by jws to handle dynamic credential retrieval
-                    gs = get_customizer_secrets(GoogleSheetsManager(), include_dat=False)
-                    raw_lookup_data = gs.get_spreadsheet_by_name(
-
-                        workbook_name=customizer.configuration_workbook['config_sheet_name'],
-                        worksheet_name=sheet['sheet'],
+                    table = sheet['table']['name']
+                    cached = cache.get(table)
+
+                    # another script in this workflow run already brought the table up to date
+                    if run_id and cached and cached['run_id'] == run_id:
+                        print(f"INFO: {table} already refreshed this run, skipping.")
+                        continue
+                    sheets.append(sheet)
+
+        raw_lookup_data = load_workbook_sheets(customizer=customizer, sheets=sheets)
+        for sheet in sheets:
+            table = sheet['table']['name']
+            cached = cache.get(table)
+            df = reshape_lookup_data(df=raw_lookup_data[sheet['sheet']], customizer=customizer, sheet=sheet)
+            content_hash = refresh_cache.hash_frame(
+                df=df,
+                columns=[column['name'] for column in sheet['table']['columns']]
+            )
 
-                    )
+            # skipped only while both the sheet and the table are as the last refresh left them
+            if check_refresh_cache(
+                    customizer=customizer, sheet=sheet, cached=cached, content_hash=content_hash, run_id=run_id):
+                print(f"INFO: {table} unchanged since {cached['refreshed_at']}, skipping.")
+                continue
 
-                    clear_lookup_table_data(customizer=customizer, sheet=sheet)
-                    df = reshape_lookup_data(df=raw_lookup_data, customizer=customizer, sheet=sheet)
-                    insert_other_data(customizer, df=df, sheet=sheet)
+            # the table and its refresh cache row are written in one transaction
+            deleted, inserted = apply_other_table_diff(
+                customizer=customizer, df=df, sheet=sheet, content_hash=content_hash, run_id=run_id
+            )
 
-                    print(f"SUCCESS: {sheet['table']['name']} Refreshed.")
+            print(f"SUCCESS: {table} Refreshed ({deleted} rows removed, {inserted} rows added).")
 
     # Once one script refreshed lookup tables, set global status to True to bypass with following scripts
     customizer.configuration_workbook['lookup_refresh_status'] = True
@@ -406,6 +426,40 @@ def refresh_lookup_tables(customizer) -> int:
     return 0
 
 
+def create_refresh_cache_table(customizer) -> None:
+    assert hasattr(customizer, 'dbms'), "Invalid global Customizer configuration, missing 'dbms' attribute"
+    if customizer.dbms == 'postgresql':
+        return postgres_helpers.create_postgresql_refresh_cache_table(customizer=customizer)
+    else:
+        raise ValueError(f"{customizer.__class__.__name__} specifies unsupported 'dbms' {customizer.dbms}")
+
+
+def get_refresh_cache(customizer) -> dict:
+    assert hasattr(customizer, 'dbms'), "Invalid global Customizer configuration, missing 'dbms' attribute"
+    if customizer.dbms == 'postgresql':
+        return postgres_helpers.get_postgresql_refresh_cache(customizer=customizer)
+    else:
+        raise ValueError(f"{customizer.__class__.__name__} specifies unsupported 'dbms' {customizer.dbms}")
+
+
+def check_refresh_cache(customizer, sheet, cached, content_hash, run_id) -> bool:
+    assert hasattr(customizer, 'dbms'), "Invalid global Customizer configuration, missing 'dbms' attribute"
+    if customizer.dbms == 'postgresql':
+        return postgres_helpers.check_postgresql_refresh_cache(
+            customizer=customizer, sheet=sheet, cached=cached, content_hash=content_hash, run_id=run_id)
+    else:
+        raise ValueError(f"{customizer.__class__.__name__} specifies unsupported 'dbms' {customizer.dbms}")
+
+
+def apply_other_table_diff(customizer, df, sheet, content_hash=None, run_id=None) -> tuple:
+    assert hasattr(customizer, 'dbms'), "Invalid global Customizer configuration, missing 'dbms' attribute"
+    if customizer.dbms == 'postgresql':
+        return postgres_helpers.apply_postgresql_other_table_diff(
+            customizer=customizer, df=df, sheet=sheet, content_hash=content_hash, run_id=run_id)
+    else:
+        raise ValueError(f"{customizer.__class__.__name__} specifies unsupported 'dbms' {customizer.dbms}")
+
+
 def check_table_exists(customizer, schema) -> bool:
     assert hasattr(customizer, 'dbms'), "Invalid global Customizer configuration, missing 'dbms' attribute"
     schema_name = schema['table']['schema']
@@ -488,6 +542,11 @@ def get_debug_from_args(argv: list) -> int:
     return _get_value_from_args_by_flag(argv=argv, flag=flag, default=0)
 
 
+def get_replay_from_args(argv: list) -> int:
+    flag = '--replay='
+    return _get_value_from_args_by_flag(argv=argv, flag=flag, default=0)
+
+
 def get_args(argv: list) -> tuple:
     pull = get_pull_from_args(argv=argv)
     ingest_only = get_ingest_from_args(argv=argv)
@@ -574,21 +633,17 @@ def refresh_source_tables(customizer: custom.Customizer):
     today = datetime.date.today()
 
     if today.day in customizer.configuration_workbook['source_refresh_dates']:
-        for sheet in customizer.configuration_workbook['sheets']:
-            if sheet['table']['type'] == 'source':
-                if sheet['table']['active']:
-                    # 2020-07-27: patch by jws to handle dynamic credential retrieval
-                    gs = get_customizer_secrets(GoogleSheetsManager(), include_dat=False)
-                    raw_source_data = gs.get_spreadsheet_by_name(
-                        workbook_name=customizer.configuration_workbook['config_sheet_name'],
-                        worksheet_name=sheet['sheet']
-                    )
-
-                    clear_source_table_data(customizer=customizer, sheet=sheet)
-                    df = reshape_source_table_data(customizer=customizer, df=raw_source_data, sheet=sheet)
-                    insert_other_data(customizer, df=df, sheet=sheet)
-
-                    print(f"SUCCESS: {sheet['table']['name']} Refreshed.")
+        sheets = [
+            sheet for sheet in customizer.configuration_workbook['sheets']
+            if sheet['table']['type'] == 'source' and sheet['table']['active']
+        ]
+        raw_source_data = load_workbook_sheets(customizer=customizer, sheets=sheets)
+        for sheet in sheets:
+            clear_source_table_data(customizer=customizer, sheet=sheet)
+            df = reshape_source_table_data(customizer=customizer, df=raw_source_data[sheet['sheet']], sheet=sheet)
+            insert_other_data(customizer, df=df, sheet=sheet)
+
+            print(f"SUCCESS: {sheet['table']['name']} Refreshed.")
     else:
         print('Not listed refresh day.')
 
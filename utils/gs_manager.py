@@ -7,11 +7,17 @@
 """
 import os
 import pathlib
+import threading
 import gspread
 import pandas as pd
+from gspread.utils import numericise_all
 from utils.cls.core import Customizer
 from oauth2client.service_account import ServiceAccountCredentials
 
+# authorized clients by service account, shared by every GoogleSheetsManager in the process
+_clients = {}
+_clients_lock = threading.Lock()
+
 
 class GoogleSheetsManager(Customizer):
     """
@@ -30,8 +36,22 @@ class GoogleSheetsManager(Customizer):
         self.secrets = ''
 
     def create_client(self):
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(self.secrets, self.scope)
-        return gspread.authorize(creds)
+        """
+        Authorize once per service account, later calls reuse the client (refreshing an expired token)
+        ====================================================================================================
+        :return:
+        """
+        client_email = self.secrets.get('client_email') if isinstance(self.secrets, dict) else None
+        with _clients_lock:
+            client = _clients.get(client_email)
+            if client is None:
+                creds = ServiceAccountCredentials.from_json_keyfile_dict(self.secrets, self.scope)
+                client = gspread.authorize(creds)
+                _clients[client_email] = client
+            else:
+                # only requests a new access token when the current one has expired
+                client.login()
+        return client
 
     def get_spreadsheet_by_name(self, workbook_name: str, worksheet_name: str) -> pd.DataFrame:
         """
@@ -46,3 +66,41 @@ class GoogleSheetsManager(Customizer):
         ).get_all_records()
         df = pd.DataFrame(data_dict)
         return df
+
+    def get_worksheets_by_key(self, key: str, worksheet_names: list) -> dict:
+        """
+        Read several worksheets of one workbook, opened by its key, with a single batch values request
+        Returns {worksheet name: DataFrame}, parsed as get_all_records would
+        ====================================================================================================
+        :param key: the workbook key (in its url)
+        :param worksheet_names:
+        :return:
+        """
+        if not worksheet_names:
+            return {}
+        client = self.create_client()
+        ranges = ["'{}'".format(name.replace("'", "''")) for name in worksheet_names]
+        response = client.open_by_key(key).values_batch_get(ranges=ranges)
+        return {
+            name: values_to_frame(values=value_range.get('values', []))
+            for name, value_range in zip(worksheet_names, response['valueRanges'])
+        }
+
+
+def values_to_frame(values: list) -> pd.DataFrame:
+    """
+    Worksheet values (header row first) as a DataFrame, numbers parsed and short rows padded as
+    get_all_records does
+    ====================================================================================================
+    :param values:
+    :return:
+    """
+    if len(values) < 2:
+        return pd.DataFrame()
+    header = values[0]
+    width = len(header)
+    records = [
+        dict(zip(header, numericise_all(row[:width] + [''] * (width - len(row)), empty2zero=False, default_blank='')))
+        for row in values[1:]
+    ]
+    return pd.DataFrame(records)
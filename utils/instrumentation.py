@@ -0,0 +1,175 @@
+"""
+Instrumentation Module
+
+Records wall time, rows, bytes and API calls for each stage of a script run (and each entity within
+a stage, e.g. a view_id, account_id or listing_id) as JSON lines, and optionally in grc_run_metrics
+"""
+import os
+import json
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+
+from conf.static import INSTRUMENTATION
+from utils import refresh_cache, stdlib
+
+# stage stack, script name and finished records are kept per thread, so scripts run by the thread
+# workflow mode do not mix their metrics
+_local = threading.local()
+_file_lock = threading.Lock()
+
+
+class StageMetrics:
+    """
+    Counters for one stage, safe to update from the worker threads of that stage
+    """
+
+    def __init__(self, stage: str, entity: str = None):
+        self.script_name = getattr(_local, 'script_name', None)
+        self.stage = stage
+        self.entity = entity
+        self.started_at = datetime.datetime.utcnow()
+        self.started = time.perf_counter()
+        self.wall_seconds = None
+        self.rows = 0
+        self.bytes = 0
+        self.api_calls = 0
+        self.status = 'running'
+        self._lock = threading.Lock()
+
+    def add(self, rows: int = 0, byte_count: int = 0, api_calls: int = 0) -> None:
+        with self._lock:
+            self.rows += int(rows)
+            self.bytes += int(byte_count)
+            self.api_calls += int(api_calls)
+
+    def to_record(self) -> dict:
+        return {
+            'run_id': refresh_cache.get_run_id(),
+            'script_name': self.script_name,
+            'stage': self.stage,
+            'entity': self.entity,
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': round(self.wall_seconds, 6),
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'api_calls': self.api_calls,
+            'status': self.status
+        }
+
+
+def _get_stack() -> list:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def start_run(script_name: str) -> None:
+    _local.script_name = script_name
+    _local.records = []
+
+
+def current_stages() -> tuple:
+    """
+    The stages open on this thread, outermost first, for handing to worker threads (see activate)
+    ====================================================================================================
+    :return:
+    """
+    return tuple(_get_stack())
+
+
+@contextmanager
+def activate(stages: tuple):
+    """
+    Attribute counts made on this (worker) thread to stages opened on another thread
+    ====================================================================================================
+    :param stages:
+    :return:
+    """
+    stack = _get_stack()
+    depth = len(stack)
+    stack.extend(stages)
+    try:
+        yield
+    finally:
+        del stack[depth:]
+
+
+def record(rows: int = 0, byte_count: int = 0, api_calls: int = 0) -> None:
+    """
+    Add counts to every stage open on this thread, so a stage includes the counts of the entities in it
+    ====================================================================================================
+    :param rows:
+    :param byte_count:
+    :param api_calls:
+    :return:
+    """
+    for metrics in _get_stack():
+        metrics.add(rows=rows, byte_count=byte_count, api_calls=api_calls)
+
+
+@contextmanager
+def stage(name: str, entity: str = None):
+    """
+    Time a block as a stage (or an entity within the enclosing stage) and record it when it ends
+    ====================================================================================================
+    :param name:
+    :param entity:
+    :return:
+    """
+    metrics = StageMetrics(stage=name, entity=entity)
+    stack = _get_stack()
+    stack.append(metrics)
+    try:
+        yield metrics
+        metrics.status = 'success'
+    except BaseException:
+        metrics.status = 'failure'
+        raise
+    finally:
+        stack.remove(metrics)
+        metrics.wall_seconds = time.perf_counter() - metrics.started
+        if INSTRUMENTATION['ACTIVE']:
+            _write_record(record=metrics.to_record())
+
+
+def get_metrics_path() -> str:
+    path = INSTRUMENTATION['PATH']
+    return path if os.path.isabs(path) else os.path.join(stdlib.get_base_path(), path)
+
+
+def _write_record(record: dict) -> None:
+    if not hasattr(_local, 'records'):
+        _local.records = []
+    _local.records.append(record)
+    with _file_lock:
+        path = get_metrics_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+
+
+def finish_run(customizer=None) -> list:
+    """
+    Return the run's stage records, saving them to grc_run_metrics when configured
+    ====================================================================================================
+    :param customizer: used for the client database connection
+    :return:
+    """
+    records = getattr(_local, 'records', [])
+    _local.records = []
+    if INSTRUMENTATION['ACTIVE'] and INSTRUMENTATION['DATABASE_TABLE'] and customizer is not None and records:
+        # imported here as the database helpers record into this module
+        from utils.dbms_helpers import postgres_helpers
+        postgres_helpers.insert_postgresql_run_metrics(customizer=customizer, records=records)
+    return records
+
+
+def print_run_summary(records: list) -> None:
+    for item in records:
+        if item['entity'] is None:
+            print(
+                f"INFO: {item['stage']} took {item['wall_seconds']:.2f}s "
+                f"({item['rows']} rows, {item['bytes']} bytes, {item['api_calls']} api calls)"
+            )
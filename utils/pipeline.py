@@ -0,0 +1,57 @@
+"""
+Pipeline Module
+
+Chunked transform and load of large source frames, so the rename, typing and column copies of a
+pull are made one fixed-size batch at a time instead of for the whole frame at once
+"""
+import pandas as pd
+
+from conf.static import PIPELINE
+
+
+def iter_chunks(df: pd.DataFrame, chunk_size: int = None):
+    """
+    Yield df in batches of at most chunk_size rows, each its own frame so stages may modify it
+    ====================================================================================================
+    :param df:
+    :param chunk_size: defaults to PIPELINE['CHUNK_SIZE']
+    :return:
+    """
+    chunk_size = max(int(chunk_size or PIPELINE['CHUNK_SIZE']), 1)
+    for start in range(0, df.shape[0], chunk_size):
+        yield df.iloc[start:start + chunk_size].copy()
+
+
+def pipe(chunks, *stages):
+    """
+    Lazily run each chunk through the stages in order, each stage takes and returns a frame
+    Nothing is processed until the result is consumed (e.g. by Customizer.bulk_load)
+    ====================================================================================================
+    :param chunks: iterable of frames
+    :param stages:
+    :return:
+    """
+    for chunk in chunks:
+        for stage in stages:
+            chunk = stage(chunk)
+        yield chunk
+
+
+def assign(**values):
+    """
+    Stage setting constant columns, e.g. assign(data_source='Moz Pro - SERP', property=None)
+    ====================================================================================================
+    :param values:
+    :return:
+    """
+    def stage(chunk: pd.DataFrame) -> pd.DataFrame:
+        for name, value in values.items():
+            chunk[name] = value
+        return chunk
+    return stage
+
+
+def rename(columns: dict):
+    def stage(chunk: pd.DataFrame) -> pd.DataFrame:
+        return chunk.rename(columns=columns)
+    return stage
@@ -0,0 +1,176 @@
+"""
+Raw Cache Module
+
+Keeps each raw API response (before any renaming or typing) on disk as Parquet or Feather, keyed by
+data source, entity id and date range, so a pull can be replayed without any API calls (script.py --replay=1)
+
+Parquet and Feather are written with pyarrow, which is optional: without it the cache is disabled
+"""
+import os
+import datetime
+import threading
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+from conf.static import RAW_CACHE
+from utils import stdlib
+from utils import instrumentation
+
+try:
+    import pyarrow  # noqa: F401 (used by pandas for Parquet and Feather)
+except ImportError:
+    pyarrow = None
+
+FORMATS = {
+    'parquet': '.parquet',
+    'feather': '.feather'
+}
+
+_warned = set()
+_warn_lock = threading.Lock()
+
+
+def _warn_once(message: str) -> None:
+    with _warn_lock:
+        if message not in _warned:
+            _warned.add(message)
+            print(f'WARN: {message}')
+
+
+def get_cache_root() -> str:
+    path = RAW_CACHE['PATH']
+    return path if os.path.isabs(path) else os.path.join(stdlib.get_base_path(), path)
+
+
+def _format_date(value) -> str:
+    if value is None:
+        return 'none'
+    if isinstance(value, (datetime.date, datetime.datetime, pd.Timestamp)):
+        return value.strftime('%Y-%m-%d')
+    return str(value).split('T')[0].split(' ')[0]
+
+
+def get_cache_path(source: str, entity_id, start_date=None, end_date=None) -> str:
+    """
+    File for one raw response, the entity id is percent-encoded so any id is a safe, reversible file name
+    ====================================================================================================
+    :param source: the customizer prefix, e.g. google_analytics_traffic
+    :param entity_id: e.g. the view_id, account_id or listing_id
+    :param start_date:
+    :param end_date:
+    :return:
+    """
+    assert RAW_CACHE['FORMAT'] in FORMATS, f"Unsupported raw cache format {RAW_CACHE['FORMAT']}"
+    return os.path.join(
+        get_cache_root(),
+        source,
+        quote(str(entity_id), safe=''),
+        f'{_format_date(start_date)}_{_format_date(end_date)}{FORMATS[RAW_CACHE["FORMAT"]]}'
+    )
+
+
+def list_cached_entities(source: str) -> list:
+    """
+    Entity ids with at least one cached response for source
+    ====================================================================================================
+    :param source:
+    :return:
+    """
+    path = os.path.join(get_cache_root(), source)
+    if not os.path.isdir(path):
+        return []
+    return sorted(unquote(name) for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+
+def write_frame(df: pd.DataFrame, path: str) -> bool:
+    """
+    Write df to path (atomically, so a replay never reads a partial file), False if it cannot be cached
+    ====================================================================================================
+    :param df:
+    :param path:
+    :return:
+    """
+    if pyarrow is None:
+        _warn_once('pyarrow is not installed, raw API responses are not cached')
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    # both formats need string column names, Feather also needs a default index
+    frame = df.reset_index(drop=True)
+    frame.columns = [str(column) for column in frame.columns]
+    try:
+        if RAW_CACHE['FORMAT'] == 'feather':
+            frame.to_feather(temp_path)
+        else:
+            frame.to_parquet(temp_path, index=False)
+        os.replace(temp_path, path)
+    except (pyarrow.lib.ArrowException, ValueError, TypeError) as error:
+        # e.g. a column mixing types, the pull carries on without caching this response
+        print(f'WARN: Unable to cache {path}: {error.__class__.__name__}')
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+    return True
+
+
+def read_frame(path: str) -> pd.DataFrame:
+    if RAW_CACHE['FORMAT'] == 'feather':
+        return pd.read_feather(path)
+    return pd.read_parquet(path)
+
+
+def cached_frame(customizer, entity_id, fetch, start_date=None, end_date=None) -> pd.DataFrame:
+    """
+    Return fetch() (a raw response frame) and cache it when RAW_CACHE is active
+    When the customizer is replaying, return the cached frame instead and never call fetch
+    ====================================================================================================
+    :param customizer:
+    :param entity_id:
+    :param fetch: makes the API call
+    :param start_date:
+    :param end_date:
+    :return:
+    """
+    path = get_cache_path(source=customizer.prefix, entity_id=entity_id, start_date=start_date, end_date=end_date)
+    if customizer.replay:
+        assert pyarrow is not None, "pyarrow is required to replay cached API responses"
+        if not os.path.exists(path):
+            print(f'WARN: No cached response for {customizer.prefix} {entity_id} ({start_date} - {end_date})')
+            return pd.DataFrame()
+        return read_frame(path=path)
+
+    # counted here rather than around the retry, so a replay records no API calls
+    instrumentation.record(api_calls=1)
+    df = fetch()
+    if RAW_CACHE['ACTIVE'] and df is not None and df.shape[0]:
+        write_frame(df=df, path=path)
+    return df
+
+
+def cached_records(customizer, entity_id, fetch, start_date=None, end_date=None) -> list:
+    """
+    cached_frame for API calls returning a list of dictionaries (e.g. GMB reports and listings)
+    ====================================================================================================
+    :param customizer:
+    :param entity_id:
+    :param fetch:
+    :param start_date:
+    :param end_date:
+    :return:
+    """
+    records = []
+
+    def fetch_frame() -> pd.DataFrame:
+        records.extend(fetch() or [])
+        return pd.DataFrame(records)
+
+    df = cached_frame(
+        customizer=customizer,
+        entity_id=entity_id,
+        fetch=fetch_frame,
+        start_date=start_date,
+        end_date=end_date
+    )
+    # the live response is returned as is, a replayed one is rebuilt from its frame
+    return records if not customizer.replay else df.to_dict(orient='records')
@@ -0,0 +1,99 @@
+"""
+Refresh Cache Module
+
+Content hashing and row diffing for lookup tables, so an unchanged Google Sheet is not re-loaded and a
+changed one only touches the rows that differ
+"""
+import os
+import uuid
+import hashlib
+from collections import defaultdict
+
+import pandas as pd
+
+# set by main.py so every script in one workflow run shares the same run id
+RUN_ID_ENV = 'GRC_RUN_ID'
+
+REFRESH_CACHE_TABLE = 'grc_refresh_cache'
+
+
+def get_run_id() -> str:
+    """
+    Return the workflow run id, None when a script is run on its own
+    ====================================================================================================
+    :return:
+    """
+    return os.environ.get(RUN_ID_ENV) or None
+
+
+def start_run() -> str:
+    """
+    Assign a run id for this workflow run (inherited by every script it starts) unless one is already set
+    ====================================================================================================
+    :return:
+    """
+    if not get_run_id():
+        os.environ[RUN_ID_ENV] = uuid.uuid4().hex
+    return get_run_id()
+
+
+def _normalize_rows(df: pd.DataFrame, columns: list) -> list:
+    """
+    Row tuples with nulls as None and every other value as text, so database rows and sheet rows
+    which load to the same values compare equal
+    ====================================================================================================
+    :param df:
+    :param columns:
+    :return:
+    """
+    frame = pd.DataFrame(
+        {name: df[name] if name in df.columns else None for name in columns},
+        index=df.index
+    )
+    frame = frame.astype(object).where(frame.notna(), None)
+    return [
+        tuple(None if value is None else str(value) for value in row)
+        for row in frame.itertuples(index=False, name=None)
+    ]
+
+
+def hash_frame(df: pd.DataFrame, columns: list) -> str:
+    """
+    SHA-256 of the frame's rows (in order) for the given column names
+    ====================================================================================================
+    :param df:
+    :param columns:
+    :return:
+    """
+    digest = hashlib.sha256(repr(list(columns)).encode('utf-8'))
+    for row in _normalize_rows(df=df, columns=columns):
+        digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def diff_rows(existing: pd.DataFrame, df: pd.DataFrame, columns: list, key: str) -> tuple:
+    """
+    Minimal multiset diff between the stored rows and the new rows
+
+    Returns the key values (e.g. ctid) of the stored rows to delete and the new rows to insert,
+    duplicate rows are matched one for one
+    ====================================================================================================
+    :param existing: stored rows with a key column identifying each one
+    :param df: new rows
+    :param columns: column names to compare
+    :param key:
+    :return:
+    """
+    stored = defaultdict(list)
+    for row_key, row in zip(existing[key].tolist(), _normalize_rows(df=existing, columns=columns)):
+        stored[row].append(row_key)
+
+    insert_positions = []
+    for position, row in enumerate(_normalize_rows(df=df, columns=columns)):
+        if stored.get(row):
+            stored[row].pop()
+        else:
+            insert_positions.append(position)
+
+    delete_keys = [row_key for row_keys in stored.values() for row_key in row_keys]
+    return delete_keys, df.iloc[insert_positions]
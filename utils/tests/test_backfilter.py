@@ -0,0 +1,147 @@
+"""
+Test Backfilter
+
+Checks the SQL generated for the merged backfilter UPDATE
+"""
+import re
+import unittest
+
+from utils.cls.core import Customizer
+
+
+class Source(Customizer):
+    """
+    Configured in memory, without the stored configuration files or a database
+    """
+
+    def __init__(self, update_types: list, columns: list = None, window: tuple = None, historical: bool = False):
+        self.prefix = 'google_analytics_traffic'
+        self.set_attribute('historical', historical)
+        self.set_attribute('historical_start_date', '2020-01-01')
+        self.set_attribute('historical_end_date', '2020-06-30')
+        if window is not None:
+            self.set_attribute('start_date', window[0])
+            self.set_attribute('end_date', window[1])
+        self.table = {
+            'name': 'google_analytics_traffic',
+            'schema': 'public',
+            'columns': columns if columns is not None else [
+                {'name': 'report_date', 'type': 'date'},
+                {'name': 'url', 'type': 'character varying', 'backfilter': 'url'},
+                {'name': 'property', 'type': 'character varying', 'entity_col': True},
+                {'name': 'community', 'type': 'character varying', 'entity_col': True}
+            ]
+        }
+        self.lookup_table = {
+            'name': 'lookup_url_mapping',
+            'schema': 'public',
+            'update_types': update_types
+        }
+
+    def statement(self) -> str:
+        statement = self.create_merged_backfilter_statement(table=self.table, lookup_table=self.lookup_table)
+        return re.sub(r'\s+', ' ', statement).strip()
+
+
+class TestMergedBackfilter(unittest.TestCase):
+
+    def test_exact_only(self):
+        sql = Source(update_types=['exact']).statement()
+        self.assertIn('UPDATE public.google_analytics_traffic TARGET', sql)
+        self.assertIn(
+            'LEFT JOIN ( SELECT DISTINCT ON (url) * FROM public.lookup_url_mapping WHERE exact = 1 ORDER BY url ) '
+            'EXACT_URL ON TARGET.url = EXACT_URL.url', sql
+        )
+        self.assertIn('CASE WHEN EXACT_URL.url IS NOT NULL THEN EXACT_URL.property ELSE TARGET.property END AS property', sql)
+        self.assertNotIn('fuzzy_map', sql)
+        self.assertIn('SET property = RESOLVED.property, community = RESOLVED.community', sql)
+        self.assertIn(
+            'TARGET.property IS DISTINCT FROM RESOLVED.property OR TARGET.community IS DISTINCT FROM RESOLVED.community', sql
+        )
+
+    def test_fuzzy_only(self):
+        sql = Source(update_types=['fuzzy']).statement()
+        self.assertIn(
+            'LEFT JOIN google_analytics_traffic_url_fuzzy_map FUZZY_URL ON TARGET.url = FUZZY_URL.url', sql
+        )
+        self.assertIn('CASE WHEN FUZZY_URL.url IS NOT NULL THEN FUZZY_URL.community ELSE TARGET.community END', sql)
+        self.assertNotIn('EXACT_URL', sql)
+
+    def test_exact_match_wins_over_fuzzy(self):
+        sql = Source(update_types=['fuzzy', 'exact']).statement()
+        self.assertLess(sql.index('LEFT JOIN ( SELECT DISTINCT ON (url)'), sql.index('LEFT JOIN google_analytics_traffic_url_fuzzy_map'))
+        self.assertIn(
+            'CASE WHEN EXACT_URL.url IS NOT NULL THEN EXACT_URL.property '
+            'WHEN FUZZY_URL.url IS NOT NULL THEN FUZZY_URL.property '
+            'ELSE TARGET.property END AS property', sql
+        )
+
+    def test_fuzzy_mapping_table(self):
+        source = Source(update_types=['fuzzy'], window=('2020-03-01', '2020-03-07'))
+        sql = re.sub(r'\s+', ' ', source.create_fuzzy_mapping_statement(
+            table=source.table,
+            lookup_table=source.lookup_table,
+            backfilter_column=source.table['columns'][1],
+            entity_columns=source.table['columns'][2:]
+        )).strip()
+        self.assertIn('CREATE TEMPORARY TABLE google_analytics_traffic_url_fuzzy_map ON COMMIT DROP AS', sql)
+        self.assertIn("ON TARGET.url ILIKE CONCAT('%', LOOKUP.url, '%') WHERE LOOKUP.exact = 0", sql)
+        self.assertIn("AND TARGET.report_date BETWEEN '2020-03-01' AND '2020-03-07'", sql)
+        self.assertIn('ORDER BY TARGET.url, LENGTH(LOOKUP.url) DESC NULLS LAST, LOOKUP.url', sql)
+
+    def test_default_columns(self):
+        columns = [
+            {'name': 'url', 'type': 'character varying', 'backfilter': 'url'},
+            {'name': 'property', 'type': 'character varying', 'entity_col': True, 'default': "Non-Location's Pages"},
+            {'name': 'community', 'type': 'character varying', 'entity_col': True},
+            {'name': 'medium', 'type': 'character varying', 'default': 'Organic'},
+            {'name': 'campaign', 'type': 'character varying', 'default': None}
+        ]
+        sql = Source(update_types=['exact'], columns=columns).statement()
+        # entity columns are resolved, then defaulted
+        self.assertIn(
+            "COALESCE(CASE WHEN EXACT_URL.url IS NOT NULL THEN EXACT_URL.property ELSE TARGET.property END, "
+            "'Non-Location''s Pages') AS property", sql
+        )
+        self.assertNotIn('COALESCE(CASE WHEN EXACT_URL.url IS NOT NULL THEN EXACT_URL.community', sql)
+        # other columns are only defaulted
+        self.assertIn("COALESCE(TARGET.medium, 'Organic') AS medium", sql)
+        self.assertIn("COALESCE(TARGET.campaign, 'NULL') AS campaign", sql)
+        self.assertIn('SET property = RESOLVED.property, community = RESOLVED.community, '
+                      'medium = RESOLVED.medium, campaign = RESOLVED.campaign', sql)
+
+    def test_defaults_without_lookup_matches(self):
+        columns = [
+            {'name': 'url', 'type': 'character varying'},
+            {'name': 'medium', 'type': 'character varying', 'default': 'Organic'}
+        ]
+        sql = Source(update_types=['exact'], columns=columns).statement()
+        self.assertNotIn('LEFT JOIN', sql)
+        self.assertIn("COALESCE(TARGET.medium, 'Organic') AS medium", sql)
+
+    def test_nothing_to_update(self):
+        columns = [{'name': 'url', 'type': 'character varying'}]
+        self.assertEqual(Source(update_types=['exact'], columns=columns).statement(), '')
+
+    def test_no_window(self):
+        sql = Source(update_types=['exact']).statement()
+        self.assertIn('WHERE TRUE ) RESOLVED', sql)
+        self.assertNotIn('report_date', sql)
+
+    def test_closed_window(self):
+        sql = Source(update_types=['exact'], window=('2020-03-01', '2020-03-07')).statement()
+        self.assertIn("WHERE TRUE AND TARGET.report_date BETWEEN '2020-03-01' AND '2020-03-07' ) RESOLVED", sql)
+
+    def test_open_ended_windows(self):
+        sql = Source(update_types=['exact'], window=('2020-03-01', None)).statement()
+        self.assertIn("WHERE TRUE AND TARGET.report_date >= '2020-03-01' ) RESOLVED", sql)
+        sql = Source(update_types=['exact'], window=(None, '2020-03-07')).statement()
+        self.assertIn("WHERE TRUE AND TARGET.report_date <= '2020-03-07' ) RESOLVED", sql)
+
+    def test_historical_window(self):
+        sql = Source(update_types=['exact'], window=('2020-03-01', '2020-03-07'), historical=True).statement()
+        self.assertIn("AND TARGET.report_date BETWEEN '2020-01-01' AND '2020-06-30'", sql)
+
+
+if __name__ == '__main__':
+    unittest.main()
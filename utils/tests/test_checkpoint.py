@@ -0,0 +1,46 @@
+"""
+Test Checkpoint
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils import checkpoint
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patcher = mock.patch.dict(checkpoint.BACKFILL, {'PATH': self.directory.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_completed_items_survive_a_restart(self):
+        first_run = checkpoint.Checkpoint(name='moz_pro_rankings', key='2020-01-01_2020-06-01')
+        first_run.add('123')
+        first_run.add(456)
+        resumed = checkpoint.Checkpoint(name='moz_pro_rankings', key='2020-01-01_2020-06-01')
+        self.assertIn('123', resumed)
+        self.assertIn('456', resumed)
+        self.assertNotIn('789', resumed)
+        self.assertEqual(len(resumed), 2)
+
+    def test_other_key_starts_over(self):
+        checkpoint.Checkpoint(name='moz_pro_rankings', key='2020-01-01_2020-06-01').add('123')
+        other_range = checkpoint.Checkpoint(name='moz_pro_rankings', key='2019-01-01_2019-12-01')
+        self.assertNotIn('123', other_range)
+
+    def test_clear_removes_the_file(self):
+        completed = checkpoint.Checkpoint(name='moz_pro_serp', key='2020-01-01_2020-06-01')
+        completed.add('123')
+        self.assertTrue(os.path.exists(completed.path))
+        completed.clear()
+        self.assertFalse(os.path.exists(completed.path))
+        self.assertEqual(len(checkpoint.Checkpoint(name='moz_pro_serp', key='2020-01-01_2020-06-01')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+Test Concurrency
+"""
+import time
+import threading
+import unittest
+from unittest import mock
+
+from utils import concurrency
+
+
+class FakeClock:
+    """
+    Stands in for the time module: sleeping advances monotonic time instantly
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Resp:
+
+    def __init__(self, status: int):
+        self.status = status
+
+
+class HttpError(Exception):
+    """
+    Shaped like googleapiclient.errors.HttpError
+    """
+
+    def __init__(self, status: int, content: bytes = b''):
+        super().__init__(status)
+        self.resp = Resp(status=status)
+        self.content = content
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(concurrency, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_up_to_capacity(self):
+        bucket = concurrency.TokenBucket(rate=2, capacity=3)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(self.clock.now, 0)
+
+    def test_refill_at_rate(self):
+        bucket = concurrency.TokenBucket(rate=2, capacity=1)
+        bucket.acquire()
+        bucket.acquire()
+        bucket.acquire()
+        # each token after the first takes 1 / rate seconds to refill
+        self.assertAlmostEqual(self.clock.now, 1.0)
+        self.assertEqual(self.clock.sleeps, [0.5, 0.5])
+
+    def test_idle_time_does_not_exceed_capacity(self):
+        bucket = concurrency.TokenBucket(rate=1, capacity=2)
+        self.clock.now = 100
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [1.0])
+
+
+class TestCallWithRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(concurrency, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def failing(times: int, error: Exception):
+        calls = []
+
+        def func(item):
+            calls.append(item)
+            if len(calls) <= times:
+                raise error
+            return item * 2
+
+        return func, calls
+
+    def test_retries_with_exponential_backoff(self):
+        func, calls = self.failing(times=3, error=HttpError(status=503))
+        result = concurrency.call_with_retry(
+            func, 21, retries=3, retry_exceptions=(HttpError,), backoff=2, retry_if=concurrency.is_retryable_http_error
+        )
+        self.assertEqual(result, 42)
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(self.clock.sleeps, [2, 4, 8])
+
+    def test_gives_up_after_retries(self):
+        func, calls = self.failing(times=5, error=HttpError(status=429))
+        with self.assertRaises(HttpError):
+            concurrency.call_with_retry(func, 1, retries=2, retry_exceptions=(HttpError,), backoff=1)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.clock.sleeps, [1, 2])
+
+    def test_other_exceptions_are_not_retried(self):
+        func, calls = self.failing(times=1, error=KeyError('view_id'))
+        with self.assertRaises(KeyError):
+            concurrency.call_with_retry(func, 1, retries=3, retry_exceptions=(HttpError,))
+        self.assertEqual(len(calls), 1)
+
+    def test_client_errors_are_not_retried(self):
+        for status in (400, 401, 404):
+            func, calls = self.failing(times=1, error=HttpError(status=status))
+            with self.assertRaises(HttpError):
+                concurrency.call_with_retry(
+                    func, 1, retries=3, retry_exceptions=(HttpError,), retry_if=concurrency.is_retryable_http_error
+                )
+            self.assertEqual(len(calls), 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_retryable_http_errors(self):
+        self.assertTrue(concurrency.is_retryable_http_error(HttpError(status=429)))
+        self.assertTrue(concurrency.is_retryable_http_error(HttpError(status=500)))
+        self.assertTrue(concurrency.is_retryable_http_error(HttpError(status=503)))
+        self.assertTrue(concurrency.is_retryable_http_error(
+            HttpError(status=403, content=b'{"error": {"errors": [{"reason": "userRateLimitExceeded"}]}}')
+        ))
+        self.assertFalse(concurrency.is_retryable_http_error(
+            HttpError(status=403, content=b'{"error": {"errors": [{"reason": "insufficientPermissions"}]}}')
+        ))
+        self.assertFalse(concurrency.is_retryable_http_error(HttpError(status=404)))
+        self.assertFalse(concurrency.is_retryable_http_error(KeyError('resp')))
+
+
+class TestFetchConcurrently(unittest.TestCase):
+
+    def test_yields_every_result(self):
+        results = dict(concurrency.fetch_concurrently(func=lambda item: item * 2, items=[1, 2, 3], max_workers=2))
+        self.assertEqual(results, {1: 2, 2: 4, 3: 6})
+
+    def test_yields_results_as_they_complete(self):
+        fast_received = threading.Event()
+
+        def func(item):
+            if item == 'slow':
+                # only finishes once the fast result has reached the caller
+                fast_received.wait(timeout=5)
+            return item
+
+        order = []
+        for item, _ in concurrency.fetch_concurrently(func=func, items=['slow', 'fast'], max_workers=2):
+            order.append(item)
+            if item == 'fast':
+                fast_received.set()
+        self.assertEqual(order, ['fast', 'slow'])
+
+    def test_error_cancels_outstanding_work(self):
+        called = []
+
+        def func(item):
+            called.append(item)
+            if item == 'fail':
+                raise ValueError(item)
+            # keeps the only worker busy while the error cancels the queued items
+            time.sleep(0.1)
+            return item
+
+        with self.assertRaises(ValueError):
+            list(concurrency.fetch_concurrently(func=func, items=['fail', 'busy', 'queued_1', 'queued_2'], max_workers=1))
+        self.assertNotIn('queued_1', called)
+        self.assertNotIn('queued_2', called)
+
+
+if __name__ == '__main__':
+    unittest.main()
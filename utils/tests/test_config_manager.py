@@ -26,3 +26,17 @@ class TestConfigManager(unittest.TestCase):
         self.cm.initialize_workbook()
         # TODO: write quality assertions here
         self.assertTrue(True)
+
+    def test_build_worksheet_requests(self):
+        sheets = [
+            {'sheet': 'GA Views', 'table': {'columns': [{'name': 'view_id'}, {'name': 'property'}]}},
+            {'sheet': 'DT Mapping', 'table': {'columns': [{'name': 'phone_label'}], 'max_rows': 500}}
+        ]
+        requests = ConfigManager().build_worksheet_requests(sheets=sheets, first_sheet_id=10)
+        self.assertEqual(len(requests), 6)
+        self.assertEqual(requests[0]['addSheet']['properties']['sheetId'], 10)
+        self.assertEqual(requests[3]['addSheet']['properties']['sheetId'], 11)
+        self.assertEqual(requests[3]['addSheet']['properties']['gridProperties']['rowCount'], 500)
+        header = requests[1]['updateCells']['rows'][0]['values']
+        self.assertEqual([cell['userEnteredValue']['stringValue'] for cell in header], ['view_id', 'property'])
+        self.assertEqual(requests[2]['updateDimensionProperties']['range']['endIndex'], 2)
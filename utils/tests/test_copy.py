@@ -0,0 +1,79 @@
+"""
+Test Copy
+
+Checks the COPY statement and CSV payload streamed by copy_postgresql_data
+"""
+import unittest
+
+import pandas as pd
+from sqlalchemy.dialects import postgresql
+
+from utils.dbms_helpers import postgres_helpers
+
+
+class Cursor:
+
+    def __init__(self):
+        self.statements = []
+        self.payloads = []
+
+    def copy_expert(self, statement, buffer):
+        self.statements.append(statement)
+        self.payloads.append(buffer.read())
+
+    def close(self):
+        pass
+
+
+class DBAPIConnection:
+
+    def __init__(self, cursor: Cursor):
+        self._cursor = cursor
+
+    def cursor(self) -> Cursor:
+        return self._cursor
+
+
+class Connection:
+    """
+    Shaped like a sqlalchemy Connection on the PostgreSQL dialect
+    """
+
+    def __init__(self):
+        self.dialect = postgresql.dialect()
+        self.cursor = Cursor()
+        self.connection = DBAPIConnection(cursor=self.cursor)
+
+
+class TestCopy(unittest.TestCase):
+
+    def test_identifiers_are_quoted(self):
+        con = Connection()
+        df = pd.DataFrame({'order': [1], 'Report Date': ['2020-01-01'], 'medium': ['cpc']})
+        postgres_helpers.copy_postgresql_data(con=con, df=df, table='Lookup Table', schema='public')
+        self.assertEqual(
+            con.cursor.statements,
+            ['COPY public."Lookup Table" ("order", "Report Date", medium) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')']
+        )
+
+    def test_columns_follow_the_workbook_schema(self):
+        con = Connection()
+        df = pd.DataFrame({'exact': [1.0, None], 'url': ['/a', '']})
+        loaded = postgres_helpers.copy_postgresql_data(
+            con=con,
+            df=df,
+            table='lookup_url_mapping',
+            columns=[{'name': 'url', 'type': 'character varying'}, {'name': 'exact', 'type': 'bigint'}]
+        )
+        self.assertEqual(loaded, 2)
+        self.assertIn('(url, exact)', con.cursor.statements[0])
+        self.assertEqual(con.cursor.payloads, ['/a,1\n,\\N\n'])
+
+    def test_empty_frame_is_not_copied(self):
+        con = Connection()
+        self.assertEqual(postgres_helpers.copy_postgresql_data(con=con, df=pd.DataFrame(), table='marketing_data'), 0)
+        self.assertEqual(con.cursor.statements, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+"""
+Test Credential Cache
+"""
+import os
+import unittest
+from unittest import mock
+
+from utils import credential_cache
+from utils.credential_cache import CredentialCache, SecretsDatWriter, get_secrets_dat_key
+
+
+class TestCredentialCache(unittest.TestCase):
+
+    def setUp(self):
+        self.loads = 0
+
+    def _load(self):
+        self.loads += 1
+        return {'token': f'token {self.loads}'}
+
+    def test_loads_once_within_ttl(self):
+        cache = CredentialCache(ttl=60)
+        for _ in range(50):
+            value = cache.get_or_load(key=('gds_compiler_credentials', 'GoogleAds'), load=self._load)
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(value, {'token': 'token 1'})
+
+    def test_expired_entries_reload(self):
+        cache = CredentialCache(ttl=0)
+        cache.get_or_load(key=('a',), load=self._load)
+        cache.get_or_load(key=('a',), load=self._load)
+        self.assertEqual(self.loads, 2)
+
+    def test_invalidate(self):
+        cache = CredentialCache(ttl=60)
+        cache.get_or_load(key=('a',), load=self._load)
+        cache.invalidate(key=('a',))
+        self.assertEqual(cache.get_or_load(key=('a',), load=self._load), {'token': 'token 2'})
+
+    def test_set_replaces_value(self):
+        cache = CredentialCache(ttl=60)
+        cache.get_or_load(key=('a',), load=self._load)
+        cache.set(key=('a',), value={'token': 'refreshed'})
+        self.assertEqual(cache.get_or_load(key=('a',), load=self._load), {'token': 'refreshed'})
+        self.assertEqual(self.loads, 1)
+
+    def test_returns_copies(self):
+        cache = CredentialCache(ttl=60)
+        cache.get_or_load(key=('a',), load=self._load)['token'] = 'changed'
+        self.assertEqual(cache.get_or_load(key=('a',), load=self._load), {'token': 'token 1'})
+
+    def test_shared_between_caches(self):
+        shared = {}
+        CredentialCache(ttl=60, shared=shared).get_or_load(key=('a',), load=self._load)
+        CredentialCache(ttl=60, shared=shared).get_or_load(key=('a',), load=self._load)
+        self.assertEqual(self.loads, 1)
+
+    def test_shared_in_memory_for_the_run(self):
+        with mock.patch.dict(credential_cache.CREDENTIAL_CACHE, {'SHARED': True}), \
+                mock.patch.dict(os.environ), \
+                mock.patch.object(credential_cache, '_credential_cache', None):
+            credential_cache.start_shared_cache()
+            try:
+                address = credential_cache.get_shared_cache_address()
+                self.assertIsNotNone(address)
+                for _ in range(2):
+                    # a fresh connection, as made by each script of the run
+                    CredentialCache(ttl=60, shared=credential_cache.connect_shared_cache(address=address)).get_or_load(
+                        key=('a',), load=self._load
+                    )
+                self.assertEqual(self.loads, 1)
+                self.assertEqual(credential_cache.get_credential_cache().get_or_load(key=('a',), load=self._load),
+                                 {'token': 'token 1'})
+            finally:
+                credential_cache.stop_shared_cache()
+            self.assertIsNone(credential_cache.get_shared_cache_address())
+
+    def test_unreachable_shared_cache_is_a_miss(self):
+        shared = mock.MagicMock()
+        shared.get.side_effect = EOFError
+        shared.__setitem__.side_effect = EOFError
+        cache = CredentialCache(ttl=60, shared=shared)
+        self.assertEqual(cache.get_or_load(key=('a',), load=self._load), {'token': 'token 1'})
+        self.assertEqual(cache.get_or_load(key=('a',), load=self._load), {'token': 'token 1'})
+        self.assertEqual(self.loads, 1)
+
+
+class TestSecretsDatWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.writes = []
+        self.cache = CredentialCache(ttl=60)
+        patcher = mock.patch.object(credential_cache, 'get_credential_cache', return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _cached(self, name_value: str):
+        return self.cache.get_or_load(
+            key=get_secrets_dat_key(client_name='Client', name_value=name_value),
+            load=lambda: 'loaded from the database'
+        )
+
+    def _write(self, engine, client_name, name_value, content_value):
+        self.writes.append(content_value)
+
+    def test_unchanged_payload_is_not_written(self):
+        writer = SecretsDatWriter(write=self._write)
+        writer.record_loaded('Client', 'GoogleMyBusiness', '{"token": "a"}')
+        for _ in range(1000):
+            writer.write(None, 'Client', 'GoogleMyBusiness', '{"token": "a"}')
+        self.assertEqual(self.writes, [])
+
+    def test_refreshed_token_is_written_once(self):
+        writer = SecretsDatWriter(write=self._write)
+        writer.record_loaded('Client', 'GoogleMyBusiness', '{"token": "a"}')
+        for _ in range(10):
+            writer.write(None, 'Client', 'GoogleMyBusiness', '{"token": "b"}')
+        self.assertEqual(self.writes, ['{"token": "b"}'])
+
+    def test_held_payloads_are_flushed(self):
+        writer = SecretsDatWriter(flush_interval=3600, write=self._write)
+        writer.write(None, 'Client', 'GoogleAnalytics', '{"token": "a"}')
+        writer.write(None, 'Client', 'GoogleAnalytics', '{"token": "b"}')
+        writer.write(None, 'Client', 'GoogleAnalytics', '{"token": "c"}')
+        self.assertEqual(self.writes, ['{"token": "a"}'])
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(self.writes, ['{"token": "a"}', '{"token": "c"}'])
+        self.assertEqual(writer.flush(), 0)
+
+    def test_held_token_survives_stale_write(self):
+        writer = SecretsDatWriter(flush_interval=3600, write=self._write)
+        writer.record_loaded('Client', 'GoogleMyBusiness', '{"token": "a"}')
+        # refreshed and written
+        writer.write(None, 'Client', 'GoogleMyBusiness', '{"token": "b"}')
+        # refreshed again within the interval, held
+        writer.write(None, 'Client', 'GoogleMyBusiness', '{"token": "c"}')
+        self.assertEqual(self.writes, ['{"token": "b"}'])
+        # a Customizer loading the credentials now gets the held token
+        self.assertEqual(self._cached('GoogleMyBusiness'), '{"token": "c"}')
+        # a stale Customizer writes back the payload it loaded before the second refresh
+        writer.write(None, 'Client', 'GoogleMyBusiness', '{"token": "b"}')
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(self.writes, ['{"token": "b"}', '{"token": "c"}'])
+        self.assertEqual(self._cached('GoogleMyBusiness'), '{"token": "c"}')
+
+    def test_written_token_replaces_cached_value(self):
+        writer = SecretsDatWriter(write=self._write)
+        writer.record_loaded('Client', 'GoogleAnalytics', '{"token": "a"}')
+        writer.write(None, 'Client', 'GoogleAnalytics', '{"token": "b"}')
+        self.assertEqual(self._cached('GoogleAnalytics'), '{"token": "b"}')
+
+
+class Engine:
+    """
+    Answers the pg_indexes check and records every statement executed
+    """
+
+    url = 'postgresql://applications'
+
+    def __init__(self, indexed: bool):
+        self.indexed = indexed
+        self.statements = []
+
+    def connect(self):
+        return self
+
+    begin = connect
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, statement, **params):
+        self.statements.append(str(statement))
+        return mock.Mock(scalar=lambda: self.indexed, first=lambda: {'count_value': 0})
+
+
+class TestSecretsDatUpsert(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(credential_cache._upsert_support, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_writes_never_create_the_index(self):
+        for indexed in (True, False):
+            credential_cache._upsert_support.clear()
+            engine = Engine(indexed=indexed)
+            credential_cache.write_secrets_dat(engine, 'Client', 'GoogleAds', '{}')
+            self.assertIn('pg_indexes', engine.statements[0])
+            self.assertFalse(any('CREATE UNIQUE INDEX IF NOT EXISTS' in statement for statement in engine.statements))
+
+    def test_upsert_only_with_the_index(self):
+        engine = Engine(indexed=False)
+        credential_cache.write_secrets_dat(engine, 'Client', 'GoogleAds', '{}')
+        self.assertFalse(any('ON CONFLICT' in statement for statement in engine.statements))
+        self.assertIn('SELECT COUNT(*)', engine.statements[1])
+
+        credential_cache._upsert_support.clear()
+        engine = Engine(indexed=True)
+        credential_cache.write_secrets_dat(engine, 'Client', 'GoogleAds', '{}')
+        self.assertEqual(len(engine.statements), 2)
+        self.assertIn('ON CONFLICT (client_name, name_value)', engine.statements[-1])
+
+    def test_index_setup_step(self):
+        engine = Engine(indexed=False)
+        credential_cache._upsert_support[engine.url] = False
+        credential_cache.create_secrets_dat_unique_index(engine=engine)
+        self.assertIn('CREATE UNIQUE INDEX IF NOT EXISTS', engine.statements[0])
+        self.assertNotIn(engine.url, credential_cache._upsert_support)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Test Custom
+
+Checks the customizer registry resolves every workflow item without importing the user classes
+"""
+import os
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+
+from utils import custom
+from utils.queue_manager import QueueManager
+
+
+class TestCustom(unittest.TestCase):
+
+    def test_registry_covers_workflow(self):
+        registry = custom.get_customizer_registry()
+        for work_item in QueueManager().get():
+            self.assertIn(work_item['name'], registry)
+
+    def test_registry_matches_class_prefix(self):
+        file_path, class_name = custom.get_customizer_registry()['google_analytics_traffic']
+        self.assertTrue(file_path.endswith('ga_traffic.py'))
+        self.assertEqual(class_name, 'GoogleAnalyticsTrafficCustomizer')
+
+    def test_registry_does_not_import(self):
+        with mock.patch.object(custom, '_customizer_registry', None), \
+                mock.patch.object(custom, 'module_from_file') as module_from_file, \
+                mock.patch.object(custom.Customizer, '__init__') as customizer_init:
+            registry = custom.get_customizer_registry()
+        self.assertIn('google_analytics_traffic', registry)
+        module_from_file.assert_not_called()
+        customizer_init.assert_not_called()
+
+
+class TestCustomDeclarations(unittest.TestCase):
+    """
+    Registers user class modules written to a temporary directory
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        for patcher in (
+            mock.patch.object(custom, 'USER_DEFINED_CLASS_PATH', self.directory.name),
+            mock.patch.object(custom, '_customizer_registry', None)
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _write(self, script: str, source: str) -> None:
+        with open(os.path.join(self.directory.name, script), 'w') as file:
+            file.write(textwrap.dedent(source))
+
+    def test_flag_set_through_a_helper_is_registered(self):
+        self._write('ga_traffic.py', """
+            from utils.cls.user.ga import GoogleAnalytics
+            IS_CLASS = True
+
+
+            class GoogleAnalyticsTrafficCustomizer(GoogleAnalytics):
+                def __init__(self):
+                    super().__init__()
+                    self.configure(flag=IS_CLASS)
+        """)
+        self._write('ga.py', """
+            class GoogleAnalytics:
+                pass
+        """)
+        self.assertEqual(
+            custom.get_customizer_registry(),
+            {'google_analytics_traffic': (os.path.join(self.directory.name, 'ga_traffic.py'), 'GoogleAnalyticsTrafficCustomizer')}
+        )
+
+    def test_inactive_module_is_not_registered(self):
+        self._write('ga_events.py', """
+            IS_CLASS = False
+
+
+            class GoogleAnalyticsEventsCustomizer:
+                pass
+        """)
+        self.assertEqual(custom.get_customizer_registry(), {})
+
+    def test_invalid_declarations_raise(self):
+        self._write('ga_events.py', """
+            IS_CLASS = bool(1)
+
+
+            class GoogleAnalyticsEventsCustomizer:
+                pass
+        """)
+        with self.assertRaises(AssertionError):
+            custom.get_customizer_registry()
+
+    def test_module_with_several_classes_raises(self):
+        self._write('ga_events.py', """
+            IS_CLASS = True
+
+
+            class GoogleAnalyticsEventsCustomizer:
+                pass
+
+
+            class GoogleAnalyticsGoalsCustomizer:
+                pass
+        """)
+        with self.assertRaises(AssertionError):
+            custom.get_customizer_registry()
+
+    def test_unregistered_script_raises_without_scanning(self):
+        with mock.patch.object(custom, 'module_from_file') as module_from_file:
+            with self.assertRaises(AssertionError):
+                custom.get_customizer('google_analytics_traffic')
+        module_from_file.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
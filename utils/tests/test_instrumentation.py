@@ -0,0 +1,101 @@
+"""
+Test Instrumentation
+"""
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from utils import instrumentation
+from utils import raw_cache
+from utils.concurrency import call_with_retry, fetch_concurrently
+
+
+class Source:
+    prefix = 'google_analytics_traffic'
+    replay = False
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'logs', 'run_metrics.jsonl')
+        patcher = mock.patch.dict(
+            instrumentation.INSTRUMENTATION,
+            {'ACTIVE': True, 'PATH': self.path, 'DATABASE_TABLE': False}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.directory.cleanup)
+        instrumentation.start_run(script_name='google_analytics_traffic')
+
+    def _read_lines(self) -> list:
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_entity_counts_roll_up_to_stage(self):
+        with instrumentation.stage('pull'):
+            instrumentation.record(api_calls=1)
+            for view_id in ('1', '2'):
+                with instrumentation.stage('load', entity=f'view_id={view_id}'):
+                    instrumentation.record(rows=10, byte_count=100)
+        records = instrumentation.finish_run()
+        self.assertEqual([item['entity'] for item in records], ['view_id=1', 'view_id=2', None])
+        self.assertEqual(records[0]['rows'], 10)
+        self.assertEqual(records[-1]['rows'], 20)
+        self.assertEqual(records[-1]['bytes'], 200)
+        self.assertEqual(records[-1]['api_calls'], 1)
+        self.assertEqual(records[-1]['script_name'], 'google_analytics_traffic')
+        self.assertEqual(self._read_lines(), records)
+
+    def test_failed_stage_is_recorded(self):
+        with self.assertRaises(ValueError):
+            with instrumentation.stage('ingest'):
+                raise ValueError('bad data')
+        records = instrumentation.finish_run()
+        self.assertEqual(records[0]['status'], 'failure')
+        self.assertEqual(instrumentation.current_stages(), ())
+
+    def test_worker_threads_count_toward_open_stage(self):
+        def func(item):
+            instrumentation.record(api_calls=1)
+            return item
+
+        with instrumentation.stage('pull'):
+            results = list(fetch_concurrently(func, items=list(range(8)), max_workers=4))
+        records = instrumentation.finish_run()
+        self.assertEqual(len(results), 8)
+        self.assertEqual(records[0]['api_calls'], 8)
+
+    def test_api_calls_are_counted_per_live_fetch(self):
+        customizer = Source()
+        with mock.patch.dict(raw_cache.RAW_CACHE, {'ACTIVE': False, 'PATH': self.directory.name}):
+            with instrumentation.stage('pull'):
+                raw_cache.cached_frame(customizer=customizer, entity_id='1', fetch=pd.DataFrame)
+                if raw_cache.pyarrow is not None:
+                    # a replay never reaches the API
+                    customizer.replay = True
+                    raw_cache.cached_frame(customizer=customizer, entity_id='2', fetch=pd.DataFrame)
+        records = instrumentation.finish_run()
+        self.assertEqual(records[0]['api_calls'], 1)
+
+    def test_retry_wrapper_does_not_count_api_calls(self):
+        with instrumentation.stage('pull'):
+            call_with_retry(lambda item: item, 1)
+        records = instrumentation.finish_run()
+        self.assertEqual(records[0]['api_calls'], 0)
+
+    def test_inactive_writes_nothing(self):
+        with mock.patch.dict(instrumentation.INSTRUMENTATION, {'ACTIVE': False}):
+            with instrumentation.stage('audit'):
+                pass
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(instrumentation.finish_run(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Test Moz Backfill
+
+Checks which report dates a Moz Pro backfill replaces and that each worker keeps its own SEOReporting client
+"""
+import re
+import datetime
+import tempfile
+import threading
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+import pandas as pd
+
+from utils import checkpoint, raw_cache
+from utils.cls.core import Customizer
+from utils.cls.user import moz
+
+
+class Connection:
+    """
+    Records every statement executed, as whitespace-normalized text
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.params = []
+
+    def execute(self, statement, **params):
+        self.statements.append(re.sub(r'\s+', ' ', str(statement)).strip())
+        self.params.append(params)
+
+
+class Engine:
+
+    def __init__(self, con: Connection):
+        self.con = con
+
+    @contextmanager
+    def begin(self):
+        yield self.con
+
+
+class Source(moz.Moz):
+    """
+    Configured in memory, loading into a list in place of the database
+    """
+
+    prefix = 'moz_pro_rankings'
+    replay = False
+
+    def __init__(self):
+        with mock.patch.object(Customizer, '__init__', return_value=None):
+            super().__init__()
+        self.set_attribute('table', 'moz_pro_rankings')
+        self.con = Connection()
+        self.engine = Engine(con=self.con)
+        self.loaded = []
+
+    def type(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df
+
+    def bulk_load(self, con, df, table: str = None) -> int:
+        frames = [df] if isinstance(df, pd.DataFrame) else list(df)
+        self.loaded.extend(frames)
+        return sum(frame.shape[0] for frame in frames)
+
+
+class Client:
+    """
+    Stands in for SEOReporting, recording the thread of every call
+    """
+
+    def __init__(self, empty: set):
+        self.empty = empty
+        self.threads = set()
+
+    def get_ranking_performance(self, report_date, campaign_id) -> pd.DataFrame:
+        self.threads.add(threading.get_ident())
+        if (campaign_id, report_date) in self.empty:
+            return pd.DataFrame()
+        return pd.DataFrame({'campaign_id': [campaign_id], 'report_date': [report_date]})
+
+
+class TestMozProBackfill(unittest.TestCase):
+
+    date_range = [datetime.date(2020, 1, 31), datetime.date(2020, 2, 29), datetime.date(2020, 3, 31)]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        for patcher in (
+            mock.patch.dict(checkpoint.BACKFILL, {'PATH': self.directory.name}),
+            mock.patch.dict(moz.BACKFILL, {'MAX_WORKERS': 3}),
+            mock.patch.dict(raw_cache.RAW_CACHE, {'ACTIVE': False})
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.clients = []
+
+    def _backfill(self, empty: set = frozenset()) -> Source:
+        def build_client():
+            client = Client(empty=empty)
+            self.clients.append(client)
+            return client
+
+        source = Source()
+        with mock.patch.object(moz, 'SEOReporting', side_effect=build_client):
+            source.backfill_moz_pro(
+                report='get_ranking_performance',
+                campaign_ids=[{'campaign_id': '1'}, {'campaign_id': '2'}],
+                date_range=self.date_range,
+                values={'data_source': 'Moz Pro - Rankings'}
+            )
+        return source
+
+    def test_only_months_with_data_are_replaced(self):
+        source = self._backfill(empty={('1', datetime.date(2020, 2, 1))})
+        deletes = {params['campaign_id']: params['report_dates'] for params in source.con.params}
+        self.assertEqual(sorted(deletes['1']), [datetime.date(2020, 1, 1), datetime.date(2020, 3, 1)])
+        self.assertEqual(
+            sorted(deletes['2']),
+            [datetime.date(2020, 1, 1), datetime.date(2020, 2, 1), datetime.date(2020, 3, 1)]
+        )
+        self.assertIn('WHERE report_date = ANY(:report_dates) AND campaign_id = :campaign_id;', source.con.statements[0])
+        self.assertEqual(len(source.loaded), 5)
+
+    def test_campaign_without_data_is_not_deleted(self):
+        empty = {('1', datetime.date(2020, month, 1)) for month in (1, 2, 3)}
+        source = self._backfill(empty=empty)
+        self.assertEqual([params['campaign_id'] for params in source.con.params], ['2'])
+
+    def test_each_worker_has_its_own_client(self):
+        self._backfill()
+        self.assertTrue(self.clients)
+        self.assertLessEqual(len(self.clients), moz.BACKFILL['MAX_WORKERS'])
+        for client in self.clients:
+            self.assertEqual(len(client.threads), 1)
+        self.assertEqual(len({thread for client in self.clients for thread in client.threads}), len(self.clients))
+
+
+if __name__ == '__main__':
+    unittest.main()
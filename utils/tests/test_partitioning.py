@@ -0,0 +1,236 @@
+"""
+Test Partitioning
+
+Checks the partition DDL and truncation choices made for a partitioned marketing_data table
+"""
+import re
+import datetime
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+from utils.cls.core import Customizer
+from utils.dbms_helpers import postgres_helpers
+
+
+class Result:
+
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class Connection:
+    """
+    Records every statement executed, as whitespace-normalized text
+    """
+
+    def __init__(self, scalar=None):
+        self.statements = []
+        self.params = []
+        self.scalar = scalar
+
+    def execute(self, statement, **params):
+        self.statements.append(re.sub(r'\s+', ' ', str(statement)).strip())
+        self.params.append(params)
+        return Result(self.scalar)
+
+
+class Engine:
+
+    def __init__(self, con: Connection):
+        self.con = con
+
+    @contextmanager
+    def connect(self):
+        yield self.con
+
+    begin = connect
+
+
+def build_schema(list_column: str = 'data_source', range_column: str = 'report_date') -> dict:
+    return {
+        'table': {
+            'name': 'marketing_data',
+            'schema': 'public',
+            'columns': [
+                {'name': 'report_date', 'type': 'date'},
+                {'name': 'data_source', 'type': 'character varying', 'length': 100}
+            ],
+            'partitioning': {
+                'active': True,
+                'list_column': list_column,
+                'range_column': range_column
+            }
+        }
+    }
+
+
+class TestPartitionStatements(unittest.TestCase):
+
+    def test_create_table_is_partitioned_by_list(self):
+        stmt = postgres_helpers._generate_postgresql_create_table_statement(schema=build_schema())
+        self.assertTrue(stmt.endswith('\nPARTITION BY LIST (data_source);'))
+
+    def test_create_table_range_only(self):
+        stmt = postgres_helpers._generate_postgresql_create_table_statement(schema=build_schema(list_column=None))
+        self.assertTrue(stmt.endswith('\nPARTITION BY RANGE (report_date);'))
+
+    def test_inactive_partitioning(self):
+        schema = build_schema()
+        schema['table']['partitioning']['active'] = False
+        self.assertEqual(postgres_helpers.get_postgresql_partitioning(schema=schema), {})
+        stmt = postgres_helpers._generate_postgresql_create_table_statement(schema=schema)
+        self.assertNotIn('PARTITION BY', stmt)
+
+    def test_list_partition(self):
+        con = Connection()
+        partition = postgres_helpers.create_postgresql_list_partition(
+            con=con, schema=build_schema(), value="Google My Business - Insights"
+        )
+        self.assertEqual(partition, 'marketing_data_google_my_business_insights')
+        self.assertEqual(con.statements, [
+            'CREATE TABLE IF NOT EXISTS public.marketing_data_google_my_business_insights '
+            'PARTITION OF public.marketing_data '
+            "FOR VALUES IN ('Google My Business - Insights') "
+            'PARTITION BY RANGE (report_date);'
+        ])
+
+    def test_long_partition_names_stay_unique(self):
+        first = postgres_helpers._get_postgresql_partition_name(parent='marketing_data', suffix='x' * 60 + 'a')
+        second = postgres_helpers._get_postgresql_partition_name(parent='marketing_data', suffix='x' * 60 + 'b')
+        self.assertLessEqual(len(first), 63)
+        self.assertNotEqual(first, second)
+
+    def test_default_partition(self):
+        con = Connection()
+        partition = postgres_helpers.create_postgresql_default_partition(
+            con=con, schema=build_schema(), parent='marketing_data_dialogtech'
+        )
+        self.assertEqual(partition, 'marketing_data_dialogtech_default')
+        self.assertEqual(con.statements, [
+            'CREATE TABLE IF NOT EXISTS public.marketing_data_dialogtech_default '
+            'PARTITION OF public.marketing_data_dialogtech DEFAULT;'
+        ])
+
+    def test_month_partitions(self):
+        con = Connection()
+        partitions = postgres_helpers.create_postgresql_month_partitions(
+            con=con,
+            schema=build_schema(),
+            parent='marketing_data_dialogtech',
+            start_date=datetime.date(2019, 12, 15),
+            end_date=datetime.date(2020, 2, 3)
+        )
+        self.assertEqual(partitions, {
+            datetime.date(2019, 12, 1): 'marketing_data_dialogtech_201912',
+            datetime.date(2020, 1, 1): 'marketing_data_dialogtech_202001',
+            datetime.date(2020, 2, 1): 'marketing_data_dialogtech_202002'
+        })
+        statements = con.statements
+        # the DEFAULT partition exists before any month partition
+        self.assertIn('PARTITION OF public.marketing_data_dialogtech DEFAULT;', statements[0])
+        # its rows for the new months are set aside ...
+        self.assertEqual(
+            statements[1],
+            'CREATE TEMPORARY TABLE marketing_data_dialogtech_default_moved AS '
+            'SELECT * FROM public.marketing_data_dialogtech_default '
+            "WHERE report_date >= '2019-12-01' AND report_date < '2020-03-01'; "
+            'DELETE FROM public.marketing_data_dialogtech_default '
+            "WHERE report_date >= '2019-12-01' AND report_date < '2020-03-01';"
+        )
+        self.assertEqual(statements[2:5], [
+            'CREATE TABLE IF NOT EXISTS public.marketing_data_dialogtech_201912 '
+            "PARTITION OF public.marketing_data_dialogtech FOR VALUES FROM ('2019-12-01') TO ('2020-01-01');",
+            'CREATE TABLE IF NOT EXISTS public.marketing_data_dialogtech_202001 '
+            "PARTITION OF public.marketing_data_dialogtech FOR VALUES FROM ('2020-01-01') TO ('2020-02-01');",
+            'CREATE TABLE IF NOT EXISTS public.marketing_data_dialogtech_202002 '
+            "PARTITION OF public.marketing_data_dialogtech FOR VALUES FROM ('2020-02-01') TO ('2020-03-01');"
+        ])
+        # ... and routed to their month partitions once those exist
+        self.assertEqual(
+            statements[5],
+            'INSERT INTO public.marketing_data_dialogtech SELECT * FROM marketing_data_dialogtech_default_moved; '
+            'DROP TABLE marketing_data_dialogtech_default_moved;'
+        )
+
+    def test_partitioned_table_check(self):
+        con = Connection(scalar=True)
+        self.assertTrue(postgres_helpers.check_postgresql_table_partitioned(con=con, table='marketing_data'))
+        self.assertIn('pg_catalog.pg_partitioned_table', con.statements[0])
+        self.assertEqual(con.params[0], {'schema': 'public', 'table': 'marketing_data'})
+        self.assertFalse(postgres_helpers.check_postgresql_table_partitioned(con=Connection(scalar=False), table='marketing_data'))
+
+
+class TestCoveredPartitions(unittest.TestCase):
+
+    partitions = {
+        datetime.date(2019, 12, 1): 'p_201912',
+        datetime.date(2020, 1, 1): 'p_202001',
+        datetime.date(2020, 2, 1): 'p_202002',
+        datetime.date(2020, 3, 1): 'p_202003'
+    }
+
+    def test_whole_months(self):
+        self.assertEqual(
+            postgres_helpers.get_postgresql_covered_partitions(
+                partitions=self.partitions, start_date='2020-01-01', end_date='2020-02-29'
+            ),
+            ['p_202001', 'p_202002']
+        )
+
+    def test_partial_months_are_not_truncated(self):
+        self.assertEqual(
+            postgres_helpers.get_postgresql_covered_partitions(
+                partitions=self.partitions, start_date='2020-01-02', end_date='2020-03-30'
+            ),
+            ['p_202002']
+        )
+
+    def test_range_within_one_month(self):
+        self.assertEqual(
+            postgres_helpers.get_postgresql_covered_partitions(
+                partitions=self.partitions, start_date='2020-01-05', end_date='2020-01-20'
+            ),
+            []
+        )
+
+
+class Source(Customizer):
+    """
+    Configured in memory, with a recording connection in place of the database
+    """
+
+    def __init__(self, partitioned: bool):
+        self.prefix = 'dialogtech_call_detail'
+        self.set_attribute('table', 'dialogtech_call_detail')
+        self.configuration_workbook = {'sheets': []}
+        self.marketing_data = build_schema()
+        self.con = Connection(scalar=partitioned)
+        self.engine = Engine(con=self.con)
+
+
+class TestPartitionedIngest(unittest.TestCase):
+
+    def _ingest(self, partitioned: bool) -> Source:
+        source = Source(partitioned=partitioned)
+        with mock.patch.object(Source, 'create_ingest_statement', return_value=['DELETE', 'INSERT']), \
+                mock.patch.object(Source, 'partitioned_ingest') as partitioned_ingest:
+            source.ingest_statement()
+        source.partitioned_ingest_called = partitioned_ingest.called
+        return source
+
+    def test_partitioned_table(self):
+        source = self._ingest(partitioned=True)
+        self.assertTrue(source.partitioned_ingest_called)
+
+    def test_existing_table_is_not_partitioned(self):
+        source = self._ingest(partitioned=False)
+        self.assertFalse(source.partitioned_ingest_called)
+        self.assertEqual(source.con.statements[-2:], ['DELETE', 'INSERT'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Test Pipeline
+"""
+import unittest
+
+import pandas as pd
+
+from utils import pipeline
+from utils.type_coercion import compile_schema
+
+COLUMNS = [
+    {'name': 'report_date', 'type': 'date'},
+    {'name': 'url', 'type': 'character varying', 'length': 10},
+    {'name': 'sessions', 'type': 'bigint'}
+]
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'date': ['2020-01-01', '2020-01-02', '2020-01-03', '2020-01-04', '2020-01-05'],
+            'pagePath': ['/a', '/b', '/a-very-long-page', '', '/c'],
+            'sessions': ['1', '2', '0', '4', '5']
+        })
+
+    def test_iter_chunks(self):
+        chunks = list(pipeline.iter_chunks(df=self.df, chunk_size=2))
+        self.assertEqual([chunk.shape[0] for chunk in chunks], [2, 2, 1])
+        pd.testing.assert_frame_equal(pd.concat(chunks), self.df)
+
+    def test_empty_frame_has_no_chunks(self):
+        self.assertEqual(list(pipeline.iter_chunks(df=self.df.iloc[0:0], chunk_size=2)), [])
+
+    def test_chunked_matches_whole_frame(self):
+        coerce = compile_schema(columns=COLUMNS)
+        rename_map = {'date': 'report_date', 'pagePath': 'url'}
+        expected = coerce(self.df.rename(columns=rename_map))
+        expected['data_source'] = 'Google Analytics - Traffic'
+        chunks = pipeline.pipe(
+            pipeline.iter_chunks(df=self.df, chunk_size=2),
+            pipeline.rename(columns=rename_map),
+            coerce,
+            pipeline.assign(data_source='Google Analytics - Traffic')
+        )
+        pd.testing.assert_frame_equal(pd.concat(list(chunks)), expected)
+
+    def test_stages_leave_source_frame_unchanged(self):
+        original = self.df.copy()
+        list(pipeline.pipe(pipeline.iter_chunks(df=self.df, chunk_size=2), pipeline.assign(property=None)))
+        pd.testing.assert_frame_equal(self.df, original)
+
+
+if __name__ == '__main__':
+    unittest.main()
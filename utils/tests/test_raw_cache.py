@@ -0,0 +1,85 @@
+"""
+Test Raw Cache
+"""
+import os
+import datetime
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from utils import raw_cache
+
+
+class Source:
+    prefix = 'google_analytics_traffic'
+    replay = False
+
+
+class TestRawCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patcher = mock.patch.dict(
+            raw_cache.RAW_CACHE,
+            {'ACTIVE': True, 'PATH': self.directory.name, 'FORMAT': 'parquet'}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.customizer = Source()
+        self.calls = 0
+
+    def _fetch(self) -> pd.DataFrame:
+        self.calls += 1
+        return pd.DataFrame({'date': ['20200101', '20200102'], 'sessions': ['1', '2']})
+
+    def test_cache_path_is_keyed_and_reversible(self):
+        path = raw_cache.get_cache_path(
+            source='google_my_business_insights',
+            entity_id='listings:accounts/123',
+            start_date=datetime.date(2020, 1, 1),
+            end_date='2020-01-31'
+        )
+        self.assertTrue(path.endswith(os.path.join(
+            'google_my_business_insights', 'listings%3Aaccounts%2F123', '2020-01-01_2020-01-31.parquet'
+        )))
+        os.makedirs(os.path.dirname(path))
+        self.assertEqual(raw_cache.list_cached_entities('google_my_business_insights'), ['listings:accounts/123'])
+
+    def test_live_pull_returns_the_response(self):
+        df = raw_cache.cached_frame(customizer=self.customizer, entity_id='1', fetch=self._fetch)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(df.shape, (2, 2))
+
+    def test_replay_without_cache_returns_empty_frame(self):
+        if raw_cache.pyarrow is None:
+            self.skipTest('pyarrow is not installed')
+        self.customizer.replay = True
+        df = raw_cache.cached_frame(customizer=self.customizer, entity_id='1', fetch=self._fetch)
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(df.shape[0], 0)
+
+    def test_replay_reads_cached_response(self):
+        if raw_cache.pyarrow is None:
+            self.skipTest('pyarrow is not installed')
+        expected = raw_cache.cached_frame(customizer=self.customizer, entity_id='1', fetch=self._fetch,
+                                          start_date='2020-01-01', end_date='2020-01-02')
+        self.customizer.replay = True
+        df = raw_cache.cached_frame(customizer=self.customizer, entity_id='1', fetch=self._fetch,
+                                    start_date='2020-01-01', end_date='2020-01-02')
+        self.assertEqual(self.calls, 1)
+        pd.testing.assert_frame_equal(df, expected)
+
+    def test_replay_records(self):
+        if raw_cache.pyarrow is None:
+            self.skipTest('pyarrow is not installed')
+        records = [{'store_code': '1', 'location_name': 'Main St'}]
+        self.assertEqual(raw_cache.cached_records(customizer=self.customizer, entity_id='listings', fetch=lambda: records), records)
+        self.customizer.replay = True
+        self.assertEqual(raw_cache.cached_records(customizer=self.customizer, entity_id='listings', fetch=list), records)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+"""
+Test Refresh Cache
+
+Checks lookup table hashing and the minimal row diff used for incremental refreshes
+"""
+import re
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+import pandas as pd
+
+from utils.dbms_helpers import postgres_helpers
+from utils.refresh_cache import diff_rows, hash_frame
+
+
+class TestRefreshCache(unittest.TestCase):
+
+    columns = ['medium', 'exact']
+
+    def _frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'medium': ['cpc', 'organic', 'organic', None],
+            'exact': pd.array([1, 0, 0, None], dtype='Int64')
+        })
+
+    def test_hash_is_stable(self):
+        self.assertEqual(hash_frame(self._frame(), self.columns), hash_frame(self._frame(), self.columns))
+
+    def test_hash_detects_changes(self):
+        changed = self._frame()
+        changed.loc[1, 'medium'] = 'referral'
+        self.assertNotEqual(hash_frame(self._frame(), self.columns), hash_frame(changed, self.columns))
+
+    def test_diff_unchanged(self):
+        existing = self._frame().assign(row_ctid=['(0,1)', '(0,2)', '(0,3)', '(0,4)'])
+        delete_keys, insert_df = diff_rows(existing, self._frame(), self.columns, key='row_ctid')
+        self.assertEqual(delete_keys, [])
+        self.assertTrue(insert_df.empty)
+
+    def test_diff_matches_duplicates_one_for_one(self):
+        existing = self._frame().assign(row_ctid=['(0,1)', '(0,2)', '(0,3)', '(0,4)'])
+        df = pd.DataFrame({
+            'medium': ['cpc', 'organic', 'email'],
+            'exact': pd.array([1, 0, 1], dtype='Int64')
+        })
+        delete_keys, insert_df = diff_rows(existing, df, self.columns, key='row_ctid')
+        self.assertEqual(len(delete_keys), 2)
+        self.assertIn('(0,4)', delete_keys)
+        self.assertEqual(insert_df['medium'].tolist(), ['email'])
+
+
+class Result:
+
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class Connection:
+    """
+    Records every statement executed and the transaction it ran in, the table hash query returns table_hash
+    """
+
+    def __init__(self, table_hash: str):
+        self.table_hash = table_hash
+        self.transaction = None
+        self.statements = []
+
+    def execute(self, statement, **params):
+        self.statements.append((self.transaction, re.sub(r'\s+', ' ', str(statement)).strip(), params))
+        return Result(self.table_hash if 'MD5(' in str(statement) else None)
+
+
+class Engine:
+
+    def __init__(self, con: Connection):
+        self.con = con
+        self.transactions = 0
+
+    @contextmanager
+    def begin(self):
+        self.transactions += 1
+        self.con.transaction = self.transactions
+        yield self.con
+        self.con.transaction = None
+
+
+class TestRefreshCacheTable(unittest.TestCase):
+
+    sheet = {
+        'sheet': 'URL Mapping',
+        'table': {
+            'name': 'lookup_url_mapping',
+            'schema': 'public',
+            'columns': [
+                {'name': 'medium', 'type': 'character varying', 'length': 100},
+                {'name': 'exact', 'type': 'bigint'}
+            ]
+        }
+    }
+    cached = {'content_hash': 'sheet', 'table_hash': 'loaded', 'refreshed_at': '2020-01-01'}
+
+    def _engine(self, table_hash: str) -> Engine:
+        engine = Engine(con=Connection(table_hash=table_hash))
+        patcher = mock.patch.object(postgres_helpers, 'build_postgresql_engine', return_value=engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return engine
+
+    def _check(self, cached: dict, content_hash: str = 'sheet') -> bool:
+        return postgres_helpers.check_postgresql_refresh_cache(
+            customizer=None, sheet=self.sheet, cached=cached, content_hash=content_hash, run_id='run'
+        )
+
+    def test_unchanged_sheet_and_table_are_skipped(self):
+        engine = self._engine(table_hash='loaded')
+        self.assertTrue(self._check(cached=self.cached))
+        _, statement, params = engine.con.statements[-1]
+        self.assertIn('INSERT INTO public.grc_refresh_cache', statement)
+        self.assertEqual((params['table_hash'], params['refreshed']), ('loaded', False))
+
+    def test_emptied_table_is_refreshed_although_the_sheet_is_unchanged(self):
+        # e.g. setup recreated the table or it was truncated, MD5 of no rows
+        engine = self._engine(table_hash='d41d8cd98f00b204e9800998ecf8427e')
+        self.assertFalse(self._check(cached=self.cached))
+        self.assertEqual(len(engine.con.statements), 1)
+        self.assertIn('FROM public.lookup_url_mapping TARGET', engine.con.statements[0][1])
+
+    def test_changed_sheet_or_missing_cache_is_refreshed(self):
+        engine = self._engine(table_hash='loaded')
+        self.assertFalse(self._check(cached=self.cached, content_hash='edited'))
+        self.assertFalse(self._check(cached=None))
+        # cache rows written before table hashes were stored are refreshed once
+        self.assertFalse(self._check(cached=dict(self.cached, table_hash=None)))
+        self.assertEqual(len(engine.con.statements), 1)
+
+    def test_diff_and_cache_row_share_one_transaction(self):
+        engine = self._engine(table_hash='refreshed')
+        existing = pd.DataFrame({'row_ctid': ['(0,1)'], 'medium': ['cpc'], 'exact': [1]})
+        df = pd.DataFrame({'medium': ['organic'], 'exact': pd.array([0], dtype='Int64')})
+        with mock.patch.object(postgres_helpers.pd, 'read_sql', return_value=existing), \
+                mock.patch.object(postgres_helpers, 'copy_postgresql_data') as copy_data:
+            deleted, inserted = postgres_helpers.apply_postgresql_other_table_diff(
+                customizer=None, df=df, sheet=self.sheet, content_hash='sheet', run_id='run'
+            )
+        self.assertEqual((deleted, inserted), (1, 1))
+        self.assertEqual(copy_data.call_count, 1)
+        self.assertEqual({transaction for transaction, _, _ in engine.con.statements}, {1})
+        self.assertEqual(
+            engine.con.statements[0][1],
+            'DELETE FROM public.lookup_url_mapping WHERE ctid = ANY(CAST(:ctids AS tid[]));'
+        )
+        _, statement, params = engine.con.statements[-1]
+        self.assertIn('INSERT INTO public.grc_refresh_cache', statement)
+        self.assertEqual(
+            (params['content_hash'], params['table_hash'], params['run_id'], params['refreshed']),
+            ('sheet', 'refreshed', 'run', True)
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Test Transforms
+
+Checks the vectorized transforms against the loops they replaced
+"""
+import calendar
+import datetime
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.benchmarks.bench_average_rating import (
+    assign_average_rating,
+    generate_reviews,
+    legacy_assign_average_rating
+)
+from utils.transforms import cumulative_average, spread_over_dates
+
+
+class TestCumulativeAverage(unittest.TestCase):
+
+    def test_matches_legacy_loop(self):
+        for seed in range(5):
+            frame = generate_reviews(reviews=400, seed=seed)
+            expected = legacy_assign_average_rating(frame.copy())
+            result = assign_average_rating(frame.copy())
+            self.assertEqual(list(result.index), list(expected.index))
+            self.assertEqual(
+                result['Average_Rating'].astype(float).tolist(),
+                expected['Average_Rating'].astype(float).tolist()
+            )
+
+    def test_first_date_falls_back_to_star_rating(self):
+        frame = pd.DataFrame({
+            'star_rating': [3, 5, 4, 1],
+            'create_time': pd.to_datetime(['2020-01-01', '2020-01-01', '2020-01-02', '2020-01-03'])
+        })
+        result = assign_average_rating(frame.copy()).sort_index()
+        self.assertEqual(result['Average_Rating'].tolist(), [3, 5, 4.0, 2.5])
+
+    def test_single_date(self):
+        frame = pd.DataFrame({
+            'star_rating': [2, 4],
+            'create_time': pd.to_datetime(['2020-01-01', '2020-01-01'])
+        })
+        averages = cumulative_average(frame, date_col='create_time', value_col='star_rating')
+        self.assertTrue(averages.isna().all())
+
+    def test_missing_rating_propagates(self):
+        frame = pd.DataFrame({
+            'star_rating': [5, 4, np.nan, 2],
+            'create_time': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-03', '2020-01-04'])
+        })
+        averages = cumulative_average(frame, date_col='create_time', value_col='star_rating')
+        self.assertEqual(averages[1], 4.0)
+        self.assertTrue(np.isnan(averages[2]) and np.isnan(averages[3]))
+
+
+class TestSpreadOverDates(unittest.TestCase):
+
+    def _frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'start': ['2020-01-30', '2020-02-27', '2021-12-31'],
+            'end': ['2020-02-02', '', '2022-01-01'],
+            'location': ['Location A', 'Location B', 'Location C'],
+            'cost': ['$1,240.00', '290', '$31']
+        })
+
+    def test_per_month_matches_legacy_loop(self):
+        frame = self._frame()
+        expected = []
+        for _, row in frame.iterrows():
+            end_date = row['end'] or '2020-03-02'
+            for iter_date in pd.date_range(row['start'], end_date):
+                max_days = calendar.monthrange(year=iter_date.year, month=iter_date.month)[1]
+                expected.append((iter_date, row['location'], float(row['cost'].replace('$', '').replace(',', '')) / max_days))
+
+        result = spread_over_dates(
+            df=frame,
+            start_col='start',
+            end_col='end',
+            amount_col='cost',
+            columns={'location': 'Property'},
+            per='month',
+            default_end_date=datetime.date(2020, 3, 2)
+        )
+        self.assertEqual(list(result.columns), ['Date', 'Property', 'Daily_Cost'])
+        self.assertEqual(list(result.itertuples(index=False, name=None)), expected)
+
+    def test_per_range(self):
+        frame = pd.DataFrame({
+            'start': pd.to_datetime(['2020-01-01']),
+            'end': pd.to_datetime(['2020-01-05']),
+            'goal': [100.0]
+        })
+        result = spread_over_dates(frame, 'start', 'end', 'goal', columns={}, per='range')
+        self.assertEqual(result.shape[0], 5)
+        self.assertTrue((result['Daily_Cost'] == 25.0).all())
+
+    def test_per_range_same_day(self):
+        frame = pd.DataFrame({'start': ['2020-01-01'], 'end': ['2020-01-01'], 'goal': [10]})
+        with self.assertRaises(ZeroDivisionError):
+            spread_over_dates(frame, 'start', 'end', 'goal', columns={}, per='range')
+
+    def test_end_before_start(self):
+        frame = pd.DataFrame({'start': ['2020-01-05'], 'end': ['2020-01-01'], 'goal': [10]})
+        result = spread_over_dates(frame, 'start', 'end', 'goal', columns={}, per='month')
+        self.assertTrue(result.empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
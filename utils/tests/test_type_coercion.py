@@ -0,0 +1,60 @@
+"""
+Test Type Coercion
+
+Checks the compiled casts against the behaviour of the per-cell casts they replaced
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.type_coercion import compile_schema
+
+
+class TestTypeCoercion(unittest.TestCase):
+
+    columns = [
+        {'name': 'name', 'type': 'character varying', 'length': 3},
+        {'name': 'count', 'type': 'bigint'},
+        {'name': 'rate', 'type': 'double precision'},
+        {'name': 'report_date', 'type': 'date'}
+    ]
+
+    def _frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'name': ['abcdef', '', None, 12345],
+            'count': ['7', 0, None, 3.9],
+            'rate': ['0.5', '', 2, None],
+            'report_date': ['2020-01-01', '2020-01-02', '2020-01-03', '2020-01-04'],
+            'untyped': [1, 2, 3, 4]
+        })
+
+    def test_character_varying(self):
+        df = compile_schema(columns=self.columns)(self._frame())
+        self.assertEqual(list(df['name']), ['abc', None, None, '123'])
+
+    def test_bigint(self):
+        df = compile_schema(columns=self.columns)(self._frame())
+        self.assertEqual(str(df['count'].dtype), 'Int64')
+        self.assertEqual(df['count'].tolist()[0], 7)
+        self.assertTrue(pd.isna(df['count'][1]))
+        self.assertTrue(pd.isna(df['count'][2]))
+        self.assertEqual(df['count'].tolist()[3], 3)
+
+    def test_bigint_domain(self):
+        df = pd.DataFrame({'count': [0, 1, 2, None]})
+        df = compile_schema(columns=self.columns, bigint_domain=(0, 1))(df)
+        self.assertEqual(df['count'].tolist()[:2], [0, 1])
+        self.assertTrue(df['count'][2:].isna().all())
+
+    def test_double_precision(self):
+        df = compile_schema(columns=self.columns)(self._frame())
+        np.testing.assert_array_equal(df['rate'].to_numpy(), np.array([0.5, np.nan, 2.0, np.nan]))
+
+    def test_date(self):
+        df = compile_schema(columns=self.columns)(self._frame())
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['report_date']))
+        self.assertEqual(df['untyped'].tolist(), [1, 2, 3, 4])
+
+    def test_compiled_once(self):
+        self.assertIs(compile_schema(columns=self.columns), compile_schema(columns=list(self.columns)))
@@ -0,0 +1,117 @@
+"""
+Test Workflow Executor
+"""
+import time
+import threading
+import unittest
+
+from utils import stdlib
+from utils.workflow_executor import WorkflowExecutor
+
+
+class StubExecutor(WorkflowExecutor):
+    """
+    Runs each item as a short sleep returning its configured exit code, recording start / finish order
+    """
+
+    def __init__(self, exit_codes: dict = None, duration: float = 0.01, **kwargs):
+        super().__init__(**kwargs)
+        self.exit_codes = exit_codes or {}
+        self.duration = duration
+        self.started = []
+        self.finished = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def _run_item(self, name: str) -> int:
+        with self._lock:
+            self.started.append(name)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.duration)
+        with self._lock:
+            self.running -= 1
+            self.finished.append(name)
+        return self.exit_codes.get(name, stdlib.EXIT_SUCCESS)
+
+    def _submit(self, pool, item: dict):
+        return pool.submit(self._run_item, item['name'])
+
+
+def build_item(name: str, expedited: bool = True, depends_on: list = None) -> dict:
+    return {
+        'name': name,
+        'call_args': [],
+        'script_args': [],
+        'expedited': expedited,
+        'depends_on': depends_on or []
+    }
+
+
+class TestWorkflowExecutor(unittest.TestCase):
+
+    def test_dependencies_finish_first(self):
+        executor = StubExecutor(mode='thread', max_workers=4)
+        results = executor.run(work_items=[
+            build_item('ga_traffic', depends_on=['gmb_insights']),
+            build_item('gmb_insights', depends_on=['moz_local_visibility']),
+            build_item('moz_local_visibility')
+        ])
+        self.assertEqual(set(results.values()), {stdlib.EXIT_SUCCESS})
+        self.assertEqual(executor.started, ['moz_local_visibility', 'gmb_insights', 'ga_traffic'])
+
+    def test_setup_items_block_expedited_items(self):
+        executor = StubExecutor(mode='thread', max_workers=4)
+        executor.run(work_items=[
+            build_item('ga_traffic'),
+            build_item('google_ads_campaign', expedited=False),
+            build_item('gmb_insights', expedited=False),
+            build_item('dialogtech_call_detail')
+        ])
+        # setup items run one after another, in workflow.json order, before any expedited item
+        self.assertEqual(executor.started[:2], ['google_ads_campaign', 'gmb_insights'])
+        self.assertEqual(executor.finished[:2], ['google_ads_campaign', 'gmb_insights'])
+        self.assertEqual(set(executor.started[2:]), {'ga_traffic', 'dialogtech_call_detail'})
+
+    def test_failed_dependency_skips_dependents(self):
+        executor = StubExecutor(mode='thread', max_workers=2, exit_codes={'gmb_insights': stdlib.EXIT_FAILURE})
+        results = executor.run(work_items=[
+            build_item('gmb_insights'),
+            build_item('gmb_reviews', depends_on=['gmb_insights']),
+            build_item('ga_traffic')
+        ])
+        self.assertEqual(results['gmb_insights'], stdlib.EXIT_FAILURE)
+        self.assertEqual(results['gmb_reviews'], stdlib.EXIT_FAILURE)
+        self.assertEqual(results['ga_traffic'], stdlib.EXIT_SUCCESS)
+        self.assertNotIn('gmb_reviews', executor.started)
+
+    def test_unresolvable_dependencies_raise(self):
+        executor = StubExecutor(mode='thread', max_workers=2)
+        with self.assertRaises(AssertionError):
+            executor.run(work_items=[
+                build_item('gmb_insights', depends_on=['gmb_reviews']),
+                build_item('gmb_reviews', depends_on=['gmb_insights'])
+            ])
+        self.assertEqual(executor.started, [])
+
+    def test_inactive_dependencies_are_ignored(self):
+        executor = StubExecutor(mode='thread', max_workers=2)
+        results = executor.run(work_items=[build_item('gmb_reviews', depends_on=['gmb_insights'])])
+        self.assertEqual(results, {'gmb_reviews': stdlib.EXIT_SUCCESS})
+
+    def test_max_workers_limits_running_items(self):
+        executor = StubExecutor(mode='thread', max_workers=2, duration=0.05)
+        executor.run(work_items=[build_item(f'item_{idx}') for idx in range(6)])
+        self.assertEqual(len(executor.finished), 6)
+        self.assertEqual(executor.max_running, 2)
+
+    def test_serial_mode_runs_one_item_at_a_time(self):
+        executor = StubExecutor(mode='serial', max_workers=4)
+        executor.run(work_items=[build_item(f'item_{idx}') for idx in range(3)])
+        self.assertEqual(executor.max_running, 1)
+        self.assertEqual(executor.started, ['item_0', 'item_1', 'item_2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
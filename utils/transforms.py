@@ -0,0 +1,86 @@
+"""
+Transforms Module
+
+Vectorized frame transformations shared by the Customizer classes
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+
+def cumulative_average(df: pd.DataFrame, date_col: str, value_col: str) -> pd.Series:
+    """
+    Average of value_col over every row dated after the first date and up to and including each
+    row's date, aligned to df's index
+
+    Rows on the first date have no prior history and get NaN, a missing value makes every later
+    average NaN, as np.mean would
+    ====================================================================================================
+    :param df:
+    :param date_col:
+    :param value_col:
+    :return:
+    """
+    first_date = df[date_col].min()
+    history = df.loc[df[date_col] > first_date, [date_col, value_col]].sort_values(by=date_col, kind='mergesort')
+    totals = np.cumsum(history[value_col].to_numpy(dtype=float))
+    counts = np.arange(1, len(totals) + 1)
+    # the running average as of the last review on each date
+    last_of_date = ~history[date_col].duplicated(keep='last').to_numpy()
+    averages = pd.Series(
+        (totals / counts)[last_of_date],
+        index=history[date_col].to_numpy()[last_of_date]
+    )
+    return df[date_col].map(averages)
+
+
+def spread_over_dates(df: pd.DataFrame, start_col: str, end_col: str, amount_col: str, columns: dict,
+                      per: str = 'month', date_name: str = 'Date', amount_name: str = 'Daily_Cost',
+                      default_end_date=None) -> pd.DataFrame:
+    """
+    Expand each row into one row per day from its start date to its end date (inclusive) and split
+    its amount across those days
+        per='month': amount / the number of days in each day's month (a monthly amount)
+        per='range': amount / (end date - start date) in days (an amount for the whole range)
+    ====================================================================================================
+    :param df:
+    :param start_col:
+    :param end_col: missing or empty end dates run to default_end_date (today by default)
+    :param amount_col: numeric, or text such as '$1,250.00'
+    :param columns: columns to carry onto each day, {column: output name}
+    :param per:
+    :param date_name:
+    :param amount_name:
+    :param default_end_date:
+    :return:
+    """
+    assert per in ('month', 'range'), f"Unsupported spread per {per}"
+    default_end_date = pd.Timestamp(default_end_date or datetime.date.today())
+    starts = pd.to_datetime(df[start_col]).to_numpy(dtype='datetime64[D]')
+    ends = pd.to_datetime(df[end_col].mask(df[end_col].eq(''))).fillna(default_end_date)
+    ends = ends.to_numpy(dtype='datetime64[D]')
+    amounts = df[amount_col]
+    if not pd.api.types.is_numeric_dtype(amounts):
+        amounts = amounts.astype(str).str.replace('$', '', regex=False).str.replace(',', '', regex=False)
+    amounts = amounts.astype(float).to_numpy()
+
+    range_days = (ends - starts).astype(int)
+    lengths = np.clip(range_days + 1, 0, None)
+    rows = np.repeat(np.arange(len(df)), lengths)
+    # day offset of each expanded row from its own start date
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    dates = starts[rows] + offsets.astype('timedelta64[D]')
+
+    if per == 'month':
+        months = dates.astype('datetime64[M]')
+        divisors = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(int)
+    else:
+        divisors = range_days[rows]
+        if (divisors == 0).any():
+            raise ZeroDivisionError(f"{start_col} equals {end_col}, unable to spread {amount_col}")
+
+    spread = df.iloc[rows][list(columns.keys())].rename(columns=columns).reset_index(drop=True)
+    spread.insert(0, date_name, dates.astype('datetime64[ns]'))
+    spread[amount_name] = amounts[rows] / divisors
+    return spread
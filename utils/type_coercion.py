@@ -0,0 +1,145 @@
+"""
+Type Coercion Module
+
+Compiles a workbook column schema into vectorized column casts, once per table, which are then reused
+for every frame loaded into that table
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+# compiled coercers keyed by the (name, type, length) signature of the schema they were built from
+_compiled_coercers = {}
+_compiled_coercers_lock = threading.Lock()
+
+
+def compile_schema(columns: list, bigint_domain: tuple = None):
+    """
+    Return the TypeCoercer for the given workbook columns, compiling it on first use
+    ====================================================================================================
+    :param columns: workbook column dictionaries (name, type and length for character varying)
+    :param bigint_domain: if provided, bigint values outside of this domain are stored as NULL
+    :return:
+    """
+    signature = (
+        tuple((column['name'], column['type'], column.get('length')) for column in columns),
+        bigint_domain
+    )
+    with _compiled_coercers_lock:
+        coercer = _compiled_coercers.get(signature)
+        if coercer is None:
+            coercer = TypeCoercer(columns=columns, bigint_domain=bigint_domain)
+            _compiled_coercers[signature] = coercer
+    return coercer
+
+
+def _empty_mask(series: pd.Series) -> pd.Series:
+    # values the original per-cell casts treated as empty (falsy) and stored as NULL
+    return series.isna() | series.isin(['', 0, False])
+
+
+def _cast_character_varying(series: pd.Series, length: int) -> pd.Series:
+    empty = _empty_mask(series)
+    values = series.astype(str).str.slice(0, length).astype(object)
+    return values.where(~empty, None)
+
+
+def _cast_bigint(series: pd.Series, domain: tuple = None) -> pd.Series:
+    if domain is not None:
+        keep = series.isin(domain)
+    else:
+        keep = ~_empty_mask(series)
+    values = pd.to_numeric(series.where(keep), errors='raise')
+    if values.dtype.kind == 'f':
+        values = np.trunc(values)
+    return values.astype('Int64')
+
+
+def _cast_double_precision(series: pd.Series) -> pd.Series:
+    values = pd.to_numeric(series.where(~_empty_mask(series)), errors='raise')
+    return values.astype(float)
+
+
+def _cast_timestamp(series: pd.Series) -> pd.Series:
+    return pd.to_datetime(series)
+
+
+def _cast_timestamp_utc(series: pd.Series) -> pd.Series:
+    # TODO(jschroeder) how better to interpret timezone data?
+    return pd.to_datetime(series, utc=True)
+
+
+class TypeCoercer:
+    """
+    Vectorized casts for each typed column of a table, built once from the workbook schema
+
+    Empty values ('', 0, None, NaN) are stored as NULL for character varying, bigint and double
+    precision columns, matching the per-cell casts this replaces.
+    """
+
+    def __init__(self, columns: list, bigint_domain: tuple = None):
+        self.casts = []
+        for column in columns:
+            cast = self._compile_column(column=column, bigint_domain=bigint_domain)
+            if cast:
+                self.casts.append((column['name'], cast))
+
+    @staticmethod
+    def _compile_column(column: dict, bigint_domain: tuple = None):
+        if column['type'] == 'character varying':
+            assert 'length' in column.keys()
+            length = column['length']
+            return lambda series: _cast_character_varying(series, length=length)
+        elif column['type'] == 'bigint':
+            return lambda series: _cast_bigint(series, domain=bigint_domain)
+        elif column['type'] == 'double precision':
+            return _cast_double_precision
+        elif column['type'] in ('date', 'timestamp without time zone'):
+            return _cast_timestamp
+        elif column['type'] == 'datetime with time zone':
+            return _cast_timestamp_utc
+        return None
+
+    def __call__(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Type columns for safe storage (respecting data type and if needed, length)
+        ====================================================================================================
+        :param df:
+        :return:
+        """
+        for name, cast in self.casts:
+            if name in df.columns:
+                df[name] = _cast_by_unique_values(series=df[name], cast=cast)
+        return df
+
+
+# homogeneous value kinds where equal hashes always mean equal casts (unlike 1, 1.0 and True)
+FACTORIZABLE_KINDS = (
+    'string',
+    'integer',
+    'floating',
+    'date',
+    'datetime',
+    'datetime64'
+)
+
+
+def _cast_by_unique_values(series: pd.Series, cast) -> pd.Series:
+    """
+    API frames repeat the same few values (dates, mediums, urls), so cast each distinct value once
+    and broadcast the result back with the factorized codes
+    ====================================================================================================
+    :param series:
+    :param cast:
+    :return:
+    """
+    if pd.api.types.infer_dtype(series, skipna=True) not in FACTORIZABLE_KINDS:
+        return cast(series)
+    codes, uniques = pd.factorize(series)
+    # nulls are factorized to -1, give them a slot of their own at the end
+    uniques = pd.Series(np.append(np.asarray(uniques, dtype=object), None), dtype=object)
+    codes[codes == -1] = len(uniques) - 1
+    values = cast(uniques).take(codes)
+    values.index = series.index
+    return values
@@ -0,0 +1,146 @@
+"""
+Workflow Executor Module
+
+Schedules the active items from workflow.json, optionally running independent items at the same time
+"""
+import subprocess
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from utils import stdlib
+
+SUPPORTED_MODES = (
+    'serial',
+    'subprocess',
+    'process',
+    'thread'
+)
+
+
+def run_script_subprocess(call_args: list) -> int:
+    """
+    Run script.py in a fresh interpreter, the original workflow behaviour
+    ====================================================================================================
+    :param call_args:
+    :return:
+    """
+    return subprocess.call(call_args)
+
+
+def run_script_in_process(script_args: list) -> int:
+    """
+    Run script.main inside the current (worker) interpreter so imports and startup are paid once per worker
+    ====================================================================================================
+    :param script_args:
+    :return:
+    """
+    # imported lazily so process pool workers only import the script module when first used
+    import script
+    try:
+        return script.main(argv=script_args)
+    except Exception:
+        print(f'ERROR: {script_args[1]} failed')
+        print(traceback.format_exc())
+        return stdlib.EXIT_FAILURE
+
+
+class WorkflowExecutor:
+    """
+    Runs workflow items honoring declared dependencies and a concurrency limit
+
+    Each work item is a dict with the keys 'name', 'call_args' (full subprocess command), 'script_args'
+    (argv for script.main), 'expedited' and 'depends_on'.
+
+    Items that are not expedited perform the table checks and lookup refresh, so every expedited item
+    implicitly waits on them. Explicit 'depends_on' entries are also honored and an item is skipped when
+    one of its explicit dependencies fails.
+    """
+
+    def __init__(self, mode: str = 'serial', max_workers: int = 1):
+        assert mode in SUPPORTED_MODES, f"Unsupported workflow mode {mode}, expected one of {SUPPORTED_MODES}"
+        self.mode = mode
+        self.max_workers = 1 if mode == 'serial' else max(int(max_workers), 1)
+
+    def run(self, work_items: list) -> dict:
+        """
+        Execute each work item and return the exit code for each by name
+        ====================================================================================================
+        :param work_items:
+        :return:
+        """
+        pending = self._resolve_dependencies(work_items=work_items)
+        results = {}
+        running = {}
+        with self._create_pool() as pool:
+            while pending or running:
+                for name in list(pending.keys()):
+                    if len(running) >= self.max_workers:
+                        break
+                    item = pending[name]
+                    failed = [
+                        dep for dep in item['depends_on']
+                        if dep in results and results[dep] != stdlib.EXIT_SUCCESS
+                    ]
+                    if failed:
+                        print(f'WARN: Skipping {name}, dependencies failed: {failed}')
+                        results[name] = stdlib.EXIT_FAILURE
+                        del pending[name]
+                        continue
+                    if not all(dep in results for dep in item['implicit_depends_on'] | item['depends_on']):
+                        continue
+                    print(f'INFO: Starting {name}')
+                    running[self._submit(pool=pool, item=item)] = name
+                    del pending[name]
+
+                if not running:
+                    # every remaining item is waiting on something which will never finish
+                    assert not pending, f"Unresolvable workflow dependencies for {list(pending.keys())}"
+                    break
+
+                finished, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    print(f'INFO: Finished {name} with exit code {results[name]}')
+        return results
+
+    def _create_pool(self):
+        if self.mode == 'process':
+            return ProcessPoolExecutor(max_workers=self.max_workers)
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def _submit(self, pool, item: dict):
+        # serial and subprocess modes keep the fresh interpreter per item, the pool only waits on it
+        if self.mode in ('serial', 'subprocess'):
+            return pool.submit(run_script_subprocess, item['call_args'])
+        return pool.submit(run_script_in_process, item['script_args'])
+
+    @staticmethod
+    def _resolve_dependencies(work_items: list) -> dict:
+        """
+        Normalize dependencies into sets, keeping the workflow.json order for scheduling
+        ====================================================================================================
+        :param work_items:
+        :return:
+        """
+        names = [item['name'] for item in work_items]
+        setup_names = [item['name'] for item in work_items if not item['expedited']]
+        pending = {}
+        for item in work_items:
+            depends_on = set(item.get('depends_on') or [])
+            unknown = depends_on.difference(names)
+            if unknown:
+                print(f"INFO: {item['name']} depends on inactive items {sorted(unknown)}, ignoring")
+                depends_on -= unknown
+            assert item['name'] not in depends_on, f"{item['name']} cannot depend on itself"
+            if item['expedited']:
+                implicit_depends_on = set(setup_names)
+            else:
+                # setup items run one after another in workflow.json order
+                implicit_depends_on = set(setup_names[:setup_names.index(item['name'])])
+            pending[item['name']] = dict(
+                item,
+                depends_on=depends_on,
+                implicit_depends_on=implicit_depends_on
+            )
+        return pending